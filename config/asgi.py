@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Los settings ajustan las conexiones a la base cuando se sirve con ASGI
+os.environ.setdefault('DJANGO_ASGI', 'True')
 
 application = get_asgi_application()
@@ -52,8 +52,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'trivia.replicas.ReplicaPinningMiddleware',
 ]
 
+# Instrumentación por request (Server-Timing y log de requests lentos), opcional
+if os.getenv('REQUEST_INSTRUMENTATION') == 'True':
+    MIDDLEWARE.insert(0, 'trivia.middleware.RequestInstrumentationMiddleware')
+
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -85,22 +92,91 @@ SIMPLE_JWT = {
     'AUTH_HEADER_NAME': 'HTTP_AUTHORIZATION',
     'USER_AUTHENTICATION_RULE': 'rest_framework_simplejwt.authentication.default_user_authentication_rule',
     'SIGNING_KEY': SECRET_KEY,
+    'TOKEN_USER_CLASS': 'trivia.authentication.ClaimsUser',
 }
 
+# Autenticación sin consultar el usuario en cada request: request.user se arma con los claims del token
+JWT_STATELESS = os.getenv('JWT_STATELESS') == 'True'
+# En modo stateless, rechazar tokens de usuarios desactivados (cacheando is_active por JWT_ACTIVE_CACHE_TTL segundos)
+JWT_CHECK_ACTIVE = os.getenv('JWT_CHECK_ACTIVE') == 'True'
+JWT_ACTIVE_CACHE_TTL = int(os.getenv('JWT_ACTIVE_CACHE_TTL', 30))
+
+# Renderer JSON de la API: 'orjson' (por defecto) o 'drf' para el JSONRenderer de DRF
+JSON_RENDERER = os.getenv('JSON_RENDERER', 'orjson')
+
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'trivia.renderers.ORJSONRenderer' if JSON_RENDERER == 'orjson'
+        else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'trivia.authentication.StatelessJWTAuthentication' if JWT_STATELESS
+        else 'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'trivia.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.getenv('PAGE_SIZE', 50)),
 }
 
+# Filas por tanda en los listados con ?stream=1 (lo que se lee del cursor en cada viaje)
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 2000))
+
+# Motor de ranking en memoria; si se define, se usa un ZSET de Redis compartido entre procesos
+RANKING_REDIS_URL = os.getenv('RANKING_REDIS_URL')
+# Sin Redis: cada cuántos segundos, como mucho, se compara la copia del proceso con la base
+RANKING_SYNC_SECONDS = float(os.getenv('RANKING_SYNC_SECONDS', 1))
+# Milisegundos que se juntan puntajes antes de subir la revisión del ranking (una escritura
+# por trivia y por intervalo en vez de una por respuesta); 0: al confirmar cada puntaje
+RANKING_REVISION_DELAY_MS = int(os.getenv('RANKING_REVISION_DELAY_MS', 500))
+
+# Ranking en vivo (SSE): cada cuánto se empujan cambios, cuántos mensajes se encolan por
+# cliente y cuántas veces se resincroniza a un cliente lento antes de cortarlo
+LIVE_RANKING_TICK_MS = int(os.getenv('LIVE_RANKING_TICK_MS', 250))
+LIVE_RANKING_QUEUE_SIZE = int(os.getenv('LIVE_RANKING_QUEUE_SIZE', 16))
+LIVE_RANKING_MAX_RESYNCS = int(os.getenv('LIVE_RANKING_MAX_RESYNCS', 3))
+LIVE_RANKING_HEARTBEAT_S = int(os.getenv('LIVE_RANKING_HEARTBEAT_S', 15))
+
+# Partidas en vivo: segundos para responder cada pregunta, pausa entre preguntas, cuánto se
+# conserva una partida terminada y filas por lote al guardar cada ronda
+LIVE_GAME_ANSWER_SECONDS = float(os.getenv('LIVE_GAME_ANSWER_SECONDS', 10))
+LIVE_GAME_INTERMISSION_SECONDS = float(os.getenv('LIVE_GAME_INTERMISSION_SECONDS', 5))
+LIVE_GAME_RETENTION_S = int(os.getenv('LIVE_GAME_RETENTION_S', 3600))
+LIVE_GAME_BATCH_SIZE = int(os.getenv('LIVE_GAME_BATCH_SIZE', 1000))
+
+# Segundos que se conserva en cache el JSON de una trivia para jugadores (se invalida al cambiar)
+TRIVIA_PAYLOAD_TTL = int(os.getenv('TRIVIA_PAYLOAD_TTL', 3600))
+
+# Cómo se guardan las respuestas: 'rows' (una fila de USER_ANSWER por respuesta), 'packed'
+# (un registro compacto por participación en PARTICIPATION_ANSWERS) o 'both'
+ANSWER_STORAGE = os.getenv('ANSWER_STORAGE', 'rows')
+
+# Archivado de respuestas: directorio de los NDJSON comprimidos y días sin respuestas nuevas
+# tras los cuales una trivia terminada se archiva
+ANSWER_ARCHIVE_DIR = os.getenv('ANSWER_ARCHIVE_DIR', BASE_DIR / 'archive')
+ANSWER_ARCHIVE_AFTER_DAYS = int(os.getenv('ANSWER_ARCHIVE_AFTER_DAYS', 7))
+
+# Cantidad máxima de preguntas en la cache de claves de respuesta usada al puntuar
+ANSWER_KEY_CACHE_SIZE = int(os.getenv('ANSWER_KEY_CACHE_SIZE', 10000))
+
+# Procesos usados para hashear contraseñas en el alta masiva de usuarios (por defecto, uno por CPU)
+PROVISIONING_WORKERS = int(os.getenv('PROVISIONING_WORKERS', 0)) or None
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
 
+# Con DATABASE_POOL=True cada proceso mantiene un pool de psycopg 3; si no, las conexiones
+# se reutilizan entre requests hasta DATABASE_CONN_MAX_AGE segundos (0: una por request).
+# En ambos casos se verifica que la conexión siga viva antes de reutilizarla.
+DATABASE_POOL = os.getenv('DATABASE_POOL') == 'True'
+# Bajo ASGI (config/asgi.py lo marca) cada request sync corre en un hilo distinto y las conexiones
+# persistentes quedarían abiertas en hilos que no vuelven a usarse: ahí el default es 0 y conviene el pool
+DJANGO_ASGI = os.getenv('DJANGO_ASGI') == 'True'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -109,9 +185,43 @@ DATABASES = {
         'PASSWORD': os.getenv('DATABASE_PASSWORD'),
         'HOST': os.getenv('DATABASE_HOST'),
         'PORT': os.getenv('DATABASE_PORT'),
+        # El pool de Django no admite conexiones persistentes además del pool
+        'CONN_MAX_AGE': 0 if DATABASE_POOL else int(os.getenv('DATABASE_CONN_MAX_AGE', 0 if DJANGO_ASGI else 60)),
+        'CONN_HEALTH_CHECKS': os.getenv('DATABASE_CONN_HEALTH_CHECKS', 'True') == 'True',
+        # Necesario detrás de PgBouncer en modo transacción (los cursores del servidor no sobreviven)
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DATABASE_DISABLE_SERVER_SIDE_CURSORS') == 'True',
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.getenv('DATABASE_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.getenv('DATABASE_POOL_MAX_SIZE', 10)),
+                # Segundos que un request espera una conexión libre antes de fallar
+                'timeout': float(os.getenv('DATABASE_POOL_TIMEOUT', 10)),
+            },
+        } if DATABASE_POOL else {},
     }
 }
 
+# Réplicas de lectura (host o host:puerto, separadas por coma), con las mismas credenciales
+# que la primaria. En los tests son un espejo de la primaria.
+DATABASE_REPLICAS = []
+for number, replica_host in enumerate(filter(None, os.getenv('DATABASE_REPLICA_HOSTS', '').split(',')), 1):
+    replica_host, _, replica_port = replica_host.strip().partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['trivia.replicas.ReplicaRouter']
+
+# Segundos que un usuario lee de la primaria después de escribir, retraso máximo tolerado en
+# una réplica antes de dejar de usarla y cada cuánto se vuelve a medir
+REPLICA_PIN_SECONDS = float(os.getenv('REPLICA_PIN_SECONDS', 5))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 2))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv('REPLICA_LAG_CHECK_SECONDS', 1))
+
 # DATABASES = {
 #     'default': {
 #         'ENGINE': 'django.db.backends.sqlite3',
@@ -15,6 +15,7 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
+from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.urls import path, include
 from config import settings
 from rest_framework import permissions
@@ -28,3 +29,6 @@ urlpatterns = [
     path('api/token/', MyTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh')
 ]
+
+# uvicorn no sirve archivos estáticos como runserver: en DEBUG los sirve Django (admin, Swagger)
+urlpatterns += staticfiles_urlpatterns()
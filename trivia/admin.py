@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import AnswerOption, Player, Question, User, Trivia, Participation, UserAnswer, Entity
+from .models import AnswerOption, Player, Question, User, Trivia, Participation, UserAnswer, Entity, TriviaScore, UserScore
 
 
 admin.site.register(User)
@@ -10,3 +10,5 @@ admin.site.register(AnswerOption)
 admin.site.register(Player)
 admin.site.register(Entity)
 admin.site.register(UserAnswer)
+admin.site.register(TriviaScore)
+admin.site.register(UserScore)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TriviaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'trivia'
+
+    def ready(self):
+        from trivia import signals  # noqa: F401
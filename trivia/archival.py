@@ -0,0 +1,116 @@
+import gzip
+import hashlib
+import json
+import os
+from array import array
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from trivia.models import AnswerArchive, Trivia, UserAnswer
+
+ARCHIVE_FIELDS = ('id', 'user_id', 'question_id', 'selected_option_id', 'answered_at')
+
+
+def archivable_trivias(older_than=None):
+    """Trivias sin respuestas nuevas hace más de ``older_than``."""
+    if older_than is None:
+        older_than = timedelta(days=settings.ANSWER_ARCHIVE_AFTER_DAYS)
+    return (
+        Trivia.objects.annotate(last_answer=Max('answers__answered_at'))
+        .filter(last_answer__lt=timezone.now() - older_than)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as archive_file:
+        for chunk in iter(lambda: archive_file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def archive_trivia(trivia_id, directory=None, batch_size=5000):
+    """Mueve las respuestas de una trivia de USER_ANSWER a un NDJSON comprimido con gzip.
+
+    Primero se escribe y sincroniza el archivo; luego, en una sola transacción, se registra
+    en ANSWER_ARCHIVE y se borran de la tabla exactamente las filas exportadas, por id. Las
+    respuestas que se confirman durante la exportación (aunque tengan un id menor) quedan en
+    la tabla para el próximo archivado. Devuelve el
+    ``AnswerArchive`` creado, o ``None`` si no había nada que archivar.
+    """
+    directory = Path(directory or settings.ANSWER_ARCHIVE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    rows = UserAnswer.objects.filter(trivia_id=trivia_id).order_by('id').values_list(*ARCHIVE_FIELDS)
+
+    path = directory / f"trivia-{trivia_id}-{timezone.now():%Y%m%d%H%M%S}.ndjson.gz"
+    partial_path = path.with_name(path.name + '.partial')
+    # Ids exportados, como enteros de 8 bytes para no guardar un objeto por fila
+    exported = array('q')
+    with gzip.open(partial_path, 'wt', encoding='utf-8') as archive_file:
+        for row in rows.iterator(chunk_size=batch_size):
+            answer = dict(zip(ARCHIVE_FIELDS, row))
+            answer['user_id'] = str(answer['user_id'])
+            answer['answered_at'] = answer['answered_at'].isoformat()
+            archive_file.write(json.dumps(answer) + '\n')
+            exported.append(answer['id'])
+    if not exported:
+        partial_path.unlink()
+        return None
+    with open(partial_path, 'rb') as archive_file:
+        os.fsync(archive_file.fileno())
+    os.replace(partial_path, path)
+
+    with transaction.atomic():
+        archive = AnswerArchive.objects.create(
+            trivia_id=trivia_id, path=str(path), rows=len(exported), sha256=_sha256(path)
+        )
+        for start in range(0, len(exported), batch_size):
+            UserAnswer.objects.filter(id__in=exported[start:start + batch_size].tolist()).delete()
+    return archive
+
+
+def is_archived(trivia_id):
+    """Si la trivia tiene respuestas archivadas sin restaurar (ya no están en USER_ANSWER)."""
+    return AnswerArchive.objects.filter(trivia_id=trivia_id, restored_at__isnull=True).exists()
+
+
+def iter_archive(archive):
+    """Respuestas de un archivo, como dicts, verificando antes su checksum."""
+    if _sha256(archive.path) != archive.sha256:
+        raise ValueError(f'Checksum mismatch for {archive.path}')
+    with gzip.open(archive.path, 'rt', encoding='utf-8') as archive_file:
+        for line in archive_file:
+            answer = json.loads(line)
+            answer['answered_at'] = parse_datetime(answer['answered_at'])
+            yield answer
+
+
+def restore_archive(archive, batch_size=5000):
+    """Devuelve a USER_ANSWER las respuestas de un archivo (con sus ids originales)."""
+    batch = []
+    restored = 0
+    with transaction.atomic():
+        for answer in iter_archive(archive):
+            batch.append(UserAnswer(trivia_id=archive.trivia_id, **answer))
+            if len(batch) >= batch_size:
+                restored += len(UserAnswer.objects.bulk_create(batch, ignore_conflicts=True))
+                batch = []
+        restored += len(UserAnswer.objects.bulk_create(batch, ignore_conflicts=True))
+        archive.restored_at = timezone.now()
+        archive.save(update_fields=['restored_at'])
+    return restored
+
+
+def vacuum_answers():
+    # Tras borrar en masa, recupera el espacio y actualiza estadísticas (solo Postgres)
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f'VACUUM (ANALYZE) "{UserAnswer._meta.db_table}"')
+    return True
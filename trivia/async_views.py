@@ -0,0 +1,151 @@
+import json
+import uuid
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from trivia import leaderboard, live, packed, ranking, scoring
+from trivia.authentication import aauthenticate
+from trivia.models import AnswerOption, Participation, Question, Trivia, User, UserAnswer
+from trivia.serializers import TriviaCreateSerializer
+from trivia.views import ARCHIVED_TRIVIA, AnswerConflict
+
+# Versiones async de las rutas más usadas durante un evento en vivo. Bajo un servidor ASGI
+# no ocupan un worker mientras esperan a la base. DRF no soporta vistas async, así que
+# autenticación y permisos se resuelven aquí con las mismas reglas que las vistas sync.
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncAPIView(View):
+    # None: cualquier usuario autenticado
+    allowed_roles = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await aauthenticate(request)
+        if request.user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        if self.allowed_roles is not None and getattr(request.user, 'role', None) not in self.allowed_roles:
+            return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=403)
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncRankingView(AsyncAPIView):
+    async def get(self, request, trivia_id=None, user_id=None):
+        rows = [row async for row in leaderboard.ranking_queryset(trivia_id=trivia_id, user_id=user_id)]
+        return JsonResponse(leaderboard.build_ranking(rows), safe=False)
+
+
+class AsyncRankingTopView(AsyncAPIView):
+    max_k = 100
+
+    async def get(self, request, trivia_id=None):
+        try:
+            k = min(int(request.GET.get('k', 10)), self.max_k)
+        except ValueError:
+            return JsonResponse({'error': 'k must be an integer'}, status=400)
+        # La primera lectura construye el motor desde la base; luego es memoria o Redis
+        engine = await sync_to_async(ranking.registry.engine)(trivia_id)
+        entries = await sync_to_async(engine.top)(k)
+        usernames = {
+            user_id: username
+            async for user_id, username in User.objects.filter(
+                id__in=[entry['user_id'] for entry in entries]
+            ).values_list('id', 'username')
+        }
+        for entry in entries:
+            entry['user'] = usernames.get(uuid.UUID(entry['user_id']))
+        return JsonResponse(entries, safe=False)
+
+
+class LiveRankingView(AsyncAPIView):
+    max_k = 100
+
+    async def get(self, request, trivia_id):
+        try:
+            k = min(int(request.GET.get('k', 10)), self.max_k)
+        except ValueError:
+            return JsonResponse({'error': 'k must be an integer'}, status=400)
+        if not await Trivia.objects.filter(pk=trivia_id).aexists():
+            return JsonResponse({'error': 'Trivia not found'}, status=404)
+        response = StreamingHttpResponse(live.hub.subscribe(trivia_id, k), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Evita que nginx acumule el stream antes de enviarlo
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class AsyncTriviaDetailView(AsyncAPIView):
+    allowed_roles = ('admin',)
+
+    async def get(self, request, pk):
+        queryset = TriviaCreateSerializer.setup_eager_loading(Trivia.objects.all())
+        try:
+            trivia = await queryset.aget(pk=pk)
+        except Trivia.DoesNotExist:
+            return JsonResponse({'error': 'Trivia not found'}, status=404)
+        # Todo quedó precargado: serializar no toca la base
+        return JsonResponse(TriviaCreateSerializer(trivia).data)
+
+
+class AsyncUserAnswerCreateView(AsyncAPIView):
+    allowed_roles = ('player',)
+
+    async def post(self, request):
+        try:
+            data = json.loads(request.body)
+            question_id = int(data['question'])
+            option_id = int(data['selected_option'])
+        except (ValueError, TypeError, KeyError):
+            return JsonResponse({'error': 'question and selected_option must be integers'}, status=400)
+
+        if not await Question.objects.filter(pk=question_id).aexists():
+            return JsonResponse({'question': ["La pregunta no existe"]}, status=400)
+        option_question = await AnswerOption.objects.filter(pk=option_id).values_list('question_id', flat=True).afirst()
+        if option_question is None:
+            return JsonResponse({'selected_option': ["La opción no existe"]}, status=400)
+        if option_question != question_id:
+            return JsonResponse({'selected_option': ["La opción no pertenece a la pregunta"]}, status=400)
+
+        answer_key = await scoring.answer_keys.aget(question_id)
+        score = scoring.score_answer(answer_key, option_id)
+        trivia_id = min(answer_key.trivia_ids) if answer_key and answer_key.trivia_ids else None
+        try:
+            participation = await Participation.objects.filter(
+                user_id=request.user.id, trivia_id=trivia_id
+            ).alatest('id')
+        except Participation.DoesNotExist:
+            return JsonResponse({'error': 'No participation for this question'}, status=400)
+
+        try:
+            answer = await sync_to_async(self.record_answer)(participation, score, request.user.id, question_id, option_id)
+        except AnswerConflict as exc:
+            return JsonResponse(exc.errors, status=409)
+        if answer is not None:
+            body = {'id': answer.id}
+        else:
+            # Solo formato compacto: no hay fila de UserAnswer, la respuesta queda en la participación
+            body = {'participation': participation.id}
+        body.update({'user': str(request.user.id), 'question': question_id, 'selected_option': option_id})
+        return JsonResponse(body, status=201)
+
+    @staticmethod
+    def record_answer(participation, score, user_id, question_id, option_id):
+        # El ORM async no maneja transacciones: la escritura va en un solo hilo y bloque atómico
+        with transaction.atomic():
+            # Con la participación bloqueada, un reintento de la misma respuesta no puede colarse en paralelo
+            Participation.objects.select_for_update().get(pk=participation.pk)
+            answered = packed.answered_in(participation, user_id, [question_id])
+            if answered is None:
+                raise AnswerConflict({'participation': ARCHIVED_TRIVIA})
+            if answered:
+                raise AnswerConflict({'question': ["La pregunta ya fue respondida"]})
+            scoring.add_participation_score(participation, score)
+            if packed.stores_packed():
+                packed.append_answers(participation.id, [(question_id, option_id, score > 0)])
+            if not packed.stores_rows():
+                return None
+            return UserAnswer.objects.create(
+                user_id=user_id, trivia_id=participation.trivia_id, question_id=question_id, selected_option_id=option_id
+            )
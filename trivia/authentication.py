@@ -0,0 +1,84 @@
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from trivia.models import User
+
+
+class ClaimsUser(TokenUser):
+    """Usuario construido solo con los claims del token (``user_id``, ``username``, ``role``)."""
+
+    @cached_property
+    def id(self):
+        return uuid.UUID(str(self.token[api_settings.USER_ID_CLAIM]))
+
+    @cached_property
+    def role(self):
+        return self.token.get('role')
+
+
+def active_cache_key(user_id):
+    return f'trivia:user-active:{user_id}'
+
+
+def is_user_active(user_id):
+    """``is_active`` del usuario, cacheado ``JWT_ACTIVE_CACHE_TTL`` segundos."""
+    key = active_cache_key(user_id)
+    active = cache.get(key)
+    if active is None:
+        active = User.objects.filter(pk=user_id, is_active=True).exists()
+        cache.set(key, active, getattr(settings, 'JWT_ACTIVE_CACHE_TTL', 30))
+    return active
+
+
+async def ais_user_active(user_id):
+    key = active_cache_key(user_id)
+    active = await cache.aget(key)
+    if active is None:
+        active = await User.objects.filter(pk=user_id, is_active=True).aexists()
+        await cache.aset(key, active, getattr(settings, 'JWT_ACTIVE_CACHE_TTL', 30))
+    return active
+
+
+async def aauthenticate(request):
+    """Versión async de la autenticación JWT para las vistas async (DRF no las soporta).
+
+    Devuelve el usuario o ``None`` si no hay token válido. Respeta ``JWT_STATELESS`` y
+    ``JWT_CHECK_ACTIVE`` igual que las clases de autenticación de DRF.
+    """
+    backend = JWTAuthentication()
+    header = backend.get_header(request)
+    raw_token = backend.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return None
+    try:
+        validated_token = backend.get_validated_token(raw_token)
+    except InvalidToken:
+        return None
+
+    if getattr(settings, 'JWT_STATELESS', False):
+        user = ClaimsUser(validated_token)
+        if getattr(settings, 'JWT_CHECK_ACTIVE', False) and not await ais_user_active(user.id):
+            return None
+        return user
+    user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+    return await User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}, is_active=True).afirst()
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """JWT sin consultar la tabla de usuarios en cada request.
+
+    Con ``JWT_CHECK_ACTIVE`` se rechazan los tokens de usuarios desactivados, consultando
+    la base a lo sumo una vez por usuario cada ``JWT_ACTIVE_CACHE_TTL`` segundos.
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if getattr(settings, 'JWT_CHECK_ACTIVE', False) and not is_user_active(user.id):
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
@@ -0,0 +1,336 @@
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import django
+from asgiref.sync import async_to_sync
+from django.db import close_old_connections, connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from trivia import dbpool, scoring
+from trivia.models import AnswerOption, Participation, Question, Trivia, User
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Scenario:
+    """Un endpoint a medir: método, ruta y (opcionalmente) cuerpo y usuario autenticado.
+
+    ``data`` puede ser una función: se llama antes de cada request, fuera del tiempo medido.
+    """
+
+    def __init__(self, name, method, path, data=None, username=None, password='password'):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.username = username
+        self.password = password
+
+
+class BenchmarkRunner:
+    """Ejecuta escenarios en proceso contra las rutas reales con el cliente de pruebas de DRF."""
+
+    def __init__(self, requests=200, warmup=10):
+        self.requests = requests
+        self.warmup = warmup
+        self._clients = {}
+        self._tokens = {}
+
+    def token_for(self, scenario):
+        if scenario.username not in self._tokens:
+            response = APIClient().post(
+                '/api/token/', {'username': scenario.username, 'password': scenario.password}, format='json'
+            )
+            self._tokens[scenario.username] = response.data['access']
+        return self._tokens[scenario.username]
+
+    def client_for(self, scenario):
+        if scenario.username is None:
+            return APIClient()
+        if scenario.username not in self._clients:
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token_for(scenario)}')
+            self._clients[scenario.username] = client
+        return self._clients[scenario.username]
+
+    @staticmethod
+    def payload(scenario):
+        return scenario.data() if callable(scenario.data) else scenario.data
+
+    def call(self, client, scenario, data):
+        return getattr(client, scenario.method.lower())(scenario.path, data, format='json')
+
+    def run(self, scenario):
+        client = self.client_for(scenario)
+        for _ in range(self.warmup):
+            self.call(client, scenario, self.payload(scenario))
+
+        latencies = []
+        queries = []
+        statuses = set()
+        elapsed = 0
+        for _ in range(self.requests):
+            data = self.payload(scenario)
+            with CaptureQueriesContext(connection) as context:
+                begin = time.perf_counter()
+                response = self.call(client, scenario, data)
+                latencies.append((time.perf_counter() - begin) * 1000)
+            elapsed += latencies[-1] / 1000
+            queries.append(len(context.captured_queries))
+            statuses.add(response.status_code)
+
+        # La memoria se mide aparte: tracemalloc distorsiona los tiempos
+        data = self.payload(scenario)
+        tracemalloc.start()
+        self.call(client, scenario, data)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'method': scenario.method,
+            'path': scenario.path,
+            'requests': self.requests,
+            'statuses': sorted(statuses),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'mean_ms': round(statistics.fmean(latencies), 3),
+            'rps': round(self.requests / elapsed, 1),
+            'queries': max(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+
+class ConcurrentRunner:
+    """Mide un escenario con ``concurrency`` requests en vuelo a la vez a través del handler ASGI.
+
+    Sirve para comparar las vistas sync con sus versiones async bajo carga: el handler ASGI
+    ejecuta las vistas sync en un hilo, igual que un worker de un servidor ASGI.
+    """
+
+    def __init__(self, runner, requests=200, concurrency=50, warmup=10):
+        self.runner = runner
+        self.requests = requests
+        self.concurrency = concurrency
+        self.warmup = warmup
+
+    def headers_for(self, scenario):
+        if scenario.username is None:
+            return {}
+        return {'Authorization': f'Bearer {self.runner.token_for(scenario)}'}
+
+    async def call(self, client, scenario, headers, data):
+        if scenario.method == 'GET':
+            return await client.get(scenario.path, data, headers=headers)
+        return await getattr(client, scenario.method.lower())(
+            scenario.path, json.dumps(data), content_type='application/json', headers=headers
+        )
+
+    async def _run(self, scenario, headers, payloads):
+        client = AsyncClient()
+        for data in payloads[:self.warmup]:
+            await self.call(client, scenario, headers, data)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        latencies = []
+        statuses = set()
+
+        async def timed_call(data):
+            async with semaphore:
+                begin = time.perf_counter()
+                response = await self.call(client, scenario, headers, data)
+                latencies.append((time.perf_counter() - begin) * 1000)
+                statuses.add(response.status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(timed_call(data) for data in payloads[self.warmup:]))
+        elapsed = time.perf_counter() - started
+        return latencies, statuses, elapsed
+
+    def run(self, scenario):
+        # Los cuerpos se arman antes: cada request en vuelo lleva el suyo
+        payloads = [self.runner.payload(scenario) for _ in range(self.warmup + self.requests)]
+        latencies, statuses, elapsed = async_to_sync(self._run)(scenario, self.headers_for(scenario), payloads)
+        return {
+            'method': scenario.method,
+            'path': scenario.path,
+            'requests': self.requests,
+            'concurrency': self.concurrency,
+            'statuses': sorted(statuses),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'mean_ms': round(statistics.fmean(latencies), 3),
+            'rps': round(self.requests / elapsed, 1),
+        }
+
+
+def _latency_summary(latencies):
+    return {
+        'samples': len(latencies),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+    }
+
+
+def connection_setup(samples=100):
+    """Costo de la conexión a la base en el camino de un request corto (un ``SELECT 1``).
+
+    - ``new_connection``: abrir una conexión nueva con el driver, consultar y cerrarla; es lo que
+      paga cada request sin conexiones persistentes ni pool.
+    - ``request_cycle``: lo que hace Django entre requests con la configuración actual
+      (``close_old_connections``, verificación de salud, tomar del pool) más la consulta.
+    - ``reused``: la consulta sobre una conexión ya abierta, como referencia.
+    """
+    def timed(before_each=None):
+        latencies = []
+        for _ in range(samples):
+            begin = time.perf_counter()
+            if before_each:
+                before_each()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            latencies.append((time.perf_counter() - begin) * 1000)
+        return _latency_summary(latencies)
+
+    def new_connection():
+        latencies = []
+        params = connection.get_connection_params()
+        for _ in range(samples):
+            begin = time.perf_counter()
+            raw = connection.Database.connect(**params)
+            cursor = raw.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+            raw.close()
+            latencies.append((time.perf_counter() - begin) * 1000)
+        return _latency_summary(latencies)
+
+    connection.ensure_connection()
+    return {
+        'mode': dbpool.mode(connection),
+        'new_connection': new_connection(),
+        # close_old_connections es lo que corre Django al empezar y terminar cada request
+        'request_cycle': timed(close_old_connections),
+        'reused': timed(),
+    }
+
+
+def fresh_questions(player, count):
+    """Trivia nueva con ``count`` preguntas nuevas y una participación de ``player``.
+
+    Responder dos veces la misma pregunta devuelve 409, así que los escenarios de respuestas
+    arman una por request. Deja las claves de respuesta en cache, como en una partida en
+    curso. Devuelve la participación y los pares ``(pregunta, opción correcta)``.
+    """
+    trivia = Trivia.objects.create(name='Benchmark', description='')
+    questions = Question.objects.bulk_create(
+        [Question(question_text=f'Benchmark {i}', difficulty='easy') for i in range(count)]
+    )
+    options = AnswerOption.objects.bulk_create([
+        AnswerOption(question=question, option_text=f'Option {j}', is_correct=(j == 0))
+        for question in questions
+        for j in range(4)
+    ])
+    trivia.questions.set(questions)
+    participation = Participation.objects.create(user=player, trivia=trivia)
+    scoring.get_answer_keys([question.id for question in questions])
+    return participation, [(question.id, option.id) for question, option in zip(questions, options[::4])]
+
+
+def default_scenarios():
+    player = User.objects.filter(role='player', participation__isnull=False).order_by('username').first()
+    participation = Participation.objects.filter(user=player).order_by('id').first()
+    trivia = participation.trivia
+
+    def answer():
+        _, [(question_id, option_id)] = fresh_questions(player, 1)
+        return {'user': str(player.id), 'question': question_id, 'selected_option': option_id}
+
+    def batch():
+        fresh, answers = fresh_questions(player, 20)
+        return {
+            'participation': fresh.id,
+            'answers': [{'question': question_id, 'selected_option': option_id} for question_id, option_id in answers],
+        }
+
+    return [
+        Scenario('token_obtain', 'POST', '/api/token/', {'username': player.username, 'password': 'password'}),
+        Scenario('rankings_global', 'GET', '/api/rankings/', username=player.username),
+        Scenario('rankings_trivia', 'GET', f'/api/rankings/{trivia.id}/', username=player.username),
+        Scenario('rankings_top', 'GET', f'/api/rankings/{trivia.id}/top/?k=10', username=player.username),
+        Scenario('rankings_position', 'GET', f'/api/rankings/position/{player.id}/', username=player.username),
+        Scenario('trivia_list', 'GET', '/api/trivias/', username='admin', password='adminpassword'),
+        Scenario('trivia_detail', 'GET', f'/api/trivias/{trivia.id}/', username='admin', password='adminpassword'),
+        Scenario('answers_list', 'GET', '/api/answers/', username=player.username),
+        Scenario('answer_create', 'POST', '/api/answers/', answer, username=player.username),
+        Scenario('async_rankings_global', 'GET', '/api/async/rankings/', username=player.username),
+        Scenario('async_rankings_trivia', 'GET', f'/api/async/rankings/{trivia.id}/', username=player.username),
+        Scenario('async_rankings_top', 'GET', f'/api/async/rankings/{trivia.id}/top/?k=10', username=player.username),
+        Scenario('async_trivia_detail', 'GET', f'/api/async/trivias/{trivia.id}/', username='admin', password='adminpassword'),
+        Scenario('async_answer_create', 'POST', '/api/async/answers/', answer, username=player.username),
+        Scenario('answer_batch_create', 'POST', '/api/answers/batch/', batch, username=player.username),
+    ]
+
+
+def metadata(dataset):
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'dataset': dataset,
+        'trivias': Trivia.objects.count(),
+        'users': User.objects.count(),
+    }
+
+
+def failures(report):
+    """Escenarios con alguna respuesta que no fue 2xx: sus números no miden lo que dicen medir."""
+    failed = []
+    for section in ('results', 'concurrency'):
+        for name, result in report.get(section, {}).items():
+            statuses = [status for status in result['statuses'] if not 200 <= status < 300]
+            if statuses:
+                failed.append(f"{name}: {section} got status {', '.join(map(str, statuses))}")
+    return failed
+
+
+def compare(baseline, current, max_regression):
+    """Endpoints cuya p95 o cantidad de consultas empeoró más que ``max_regression`` (fracción),
+    más los que no respondieron siempre 2xx."""
+    regressions = failures(current)
+    for name, result in current['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        if previous['p95_ms'] and result['p95_ms'] > previous['p95_ms'] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {result['p95_ms']}ms")
+        if result['queries'] > previous['queries']:
+            regressions.append(f"{name}: queries {previous['queries']} -> {result['queries']}")
+    return regressions
+
+
+def write_report(path, report):
+    with open(path, 'w') as output:
+        json.dump(report, output, indent=2)
@@ -0,0 +1,86 @@
+import threading
+from collections import OrderedDict
+from asgiref.sync import sync_to_async
+
+
+class LRUCache:
+    """Cache en memoria acotada con desalojo LRU y contadores de aciertos/fallos.
+
+    ``loader`` recibe las claves que faltan y devuelve un dict con sus valores;
+    las claves que no devuelve no se guardan.
+    """
+
+    def __init__(self, loader, maxsize=10000):
+        self.loader = loader
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Cambia con cada invalidación para no guardar valores leídos antes de ella
+        self._generation = 0
+
+    def get_many(self, keys):
+        found = {}
+        missing = []
+        with self._lock:
+            for key in set(keys):
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    found[key] = self._data[key]
+                else:
+                    missing.append(key)
+            self.hits += len(found)
+            self.misses += len(missing)
+            generation = self._generation
+        if missing:
+            loaded = self.loader(missing)
+            with self._lock:
+                if generation == self._generation:
+                    for key, value in loaded.items():
+                        self._data[key] = value
+                    while len(self._data) > self.maxsize:
+                        self._data.popitem(last=False)
+                        self.evictions += 1
+            found.update(loaded)
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    async def aget_many(self, keys):
+        # Los aciertos se resuelven en el event loop; solo los fallos van a un hilo a consultar la base
+        with self._lock:
+            if all(key in self._data for key in keys):
+                self.hits += len(set(keys))
+                found = {}
+                for key in set(keys):
+                    self._data.move_to_end(key)
+                    found[key] = self._data[key]
+                return found
+        return await sync_to_async(self.get_many)(keys)
+
+    async def aget(self, key):
+        return (await self.aget_many([key])).get(key)
+
+    def invalidate(self, *keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+            }
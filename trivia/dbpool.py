@@ -0,0 +1,55 @@
+import threading
+from collections import Counter
+from django.db import connections
+
+# Conexiones abiertas por alias en este proceso (con pool, cuenta cada vez que se toma una del pool)
+_opened = Counter()
+_opened_lock = threading.Lock()
+
+
+def connection_opened(alias):
+    with _opened_lock:
+        _opened[alias] += 1
+
+
+def mode(connection):
+    if getattr(connection, 'pool', None) is not None:
+        return 'pool'
+    # None: la conexión no se cierra nunca; 0: una conexión nueva por request
+    return 'per-request' if connection.settings_dict['CONN_MAX_AGE'] == 0 else 'persistent'
+
+
+def stats(alias):
+    """Estado de las conexiones de un alias: modo, conexiones abiertas y, con pool, uso y esperas."""
+    connection = connections[alias]
+    result = {
+        'alias': alias,
+        'vendor': connection.vendor,
+        'mode': mode(connection),
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+        'connections_opened': _opened[alias],
+    }
+    if result['mode'] == 'pool':
+        pool_stats = connection.pool.get_stats()
+        requests = pool_stats.get('requests_num', 0)
+        connects = pool_stats.get('connections_num', 0)
+        result.update({
+            'pool_min': pool_stats.get('pool_min'),
+            'pool_max': pool_stats.get('pool_max'),
+            'pool_size': pool_stats.get('pool_size', 0),
+            'in_use': pool_stats.get('pool_size', 0) - pool_stats.get('pool_available', 0),
+            'available': pool_stats.get('pool_available', 0),
+            'waiting': pool_stats.get('requests_waiting', 0),
+            'requests': requests,
+            # Tiempo medio para obtener una conexión del pool, y para abrir una nueva contra la base
+            'acquire_ms': round(pool_stats.get('requests_wait_ms', 0) / requests, 3) if requests else 0,
+            'connect_ms': round(pool_stats.get('connections_ms', 0) / connects, 3) if connects else 0,
+            'connections_errors': pool_stats.get('connections_errors', 0),
+            'timeouts': pool_stats.get('requests_errors', 0),
+        })
+    return result
+
+
+def all_stats():
+    return [stats(alias) for alias in connections]
@@ -0,0 +1,353 @@
+import logging
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from trivia import leaderboard, packed, scoring
+from trivia.models import Participation, Question, UserAnswer
+from trivia.serializers import PlayerQuestionSerializer
+
+logger = logging.getLogger('trivia.games')
+
+LOBBY = 'lobby'
+QUESTION = 'question'
+INTERMISSION = 'intermission'
+FINISHED = 'finished'
+
+
+# Espera máxima entre reintentos de un guardado fallido
+RETRY_MAX_SECONDS = 60
+
+
+class GameError(Exception):
+    """Acción no válida en el estado actual de la partida."""
+
+
+class GameNotFound(GameError):
+    pass
+
+
+class Round:
+    def __init__(self, number, question, opens_at, deadline):
+        self.number = number
+        self.question = question
+        self.opens_at = opens_at
+        self.deadline = deadline
+        # user_id -> (option_id, puntos, answered_at)
+        self.answers = {}
+
+    @property
+    def question_id(self):
+        return self.question['id']
+
+
+class Game:
+    """Partida en vivo: todos ven la misma pregunta a la vez y responden antes del plazo.
+
+    El estado vive en memoria y el servidor es quien decide qué pregunta está abierta y
+    hasta cuándo. Las respuestas se puntúan al llegar y se guardan en la base por ronda,
+    todas juntas, cuando la ronda cierra (ver :meth:`GameRegistry.flush`).
+    """
+
+    def __init__(self, trivia_id, questions, answer_keys, answer_seconds, intermission_seconds, now):
+        self.id = uuid.uuid4()
+        self.trivia_id = trivia_id
+        self.questions = questions
+        self.answer_keys = answer_keys
+        self.options = {question['id']: {option['id'] for option in question['options']} for question in questions}
+        self.answer_seconds = answer_seconds
+        self.intermission_seconds = intermission_seconds
+        self.status = LOBBY
+        self.created_at = now
+        self.finished_at = None
+        self.round = None
+        self.next_round_at = None
+        # user_id -> participation_id (None hasta que se guarda la primera ronda)
+        self.players = {}
+        self.scores = {}
+        # Rondas cerradas que todavía no se guardaron
+        self.pending = []
+        self.completed_saved = False
+        # Guardados fallidos seguidos, para espaciar los reintentos
+        self.failures = 0
+        self.lock = threading.Lock()
+        # Solo un guardado a la vez por partida; no bloquea a quienes responden
+        self.flush_lock = threading.Lock()
+        self.timer = None
+
+    def join(self, user_id):
+        with self.lock:
+            if self.status == FINISHED:
+                raise GameError('The game is over')
+            self.players.setdefault(user_id, None)
+            self.scores.setdefault(user_id, 0)
+
+    def start(self, now):
+        with self.lock:
+            if self.status != LOBBY:
+                raise GameError('The game already started')
+            if not self.questions:
+                raise GameError('The trivia has no questions')
+            self._open(0, now)
+
+    def _open(self, index, now):
+        self.round = Round(index + 1, self.questions[index], now, now + self.answer_seconds)
+        self.status = QUESTION
+        self.next_round_at = None
+
+    def submit(self, user_id, option_id, now):
+        """Registra y puntúa la respuesta de un jugador a la pregunta abierta. Devuelve la ronda."""
+        with self.lock:
+            self._sync(now)
+            if user_id not in self.players:
+                raise GameError('Join the game first')
+            if self.status != QUESTION:
+                raise GameError('No question is open')
+            current = self.round
+            if user_id in current.answers:
+                raise GameError('Already answered this round')
+            if option_id not in self.options[current.question_id]:
+                raise GameError('The option does not belong to the open question')
+            points = scoring.score_answer(self.answer_keys.get(current.question_id), option_id)
+            current.answers[user_id] = (option_id, points, timezone.now())
+            self.scores[user_id] += points
+            return current.number
+
+    def sync(self, now):
+        with self.lock:
+            self._sync(now)
+
+    def _sync(self, now):
+        # Cierra la ronda vencida y abre la siguiente cuando termina el intermedio
+        if self.status == QUESTION and now >= self.round.deadline:
+            self.pending.append(self.round)
+            if self.round.number == len(self.questions):
+                self.status = FINISHED
+                self.finished_at = now
+            else:
+                self.status = INTERMISSION
+                self.next_round_at = self.round.deadline + self.intermission_seconds
+        if self.status == INTERMISSION and now >= self.next_round_at:
+            self._open(self.round.number, self.next_round_at)
+            # Si el intermedio ya pasó hace rato, la nueva ronda también puede estar vencida
+            self._sync(now)
+
+    def next_wakeup(self):
+        with self.lock:
+            if self.status == QUESTION:
+                return self.round.deadline
+            if self.status == INTERMISSION:
+                return self.next_round_at
+            return None
+
+    def unsaved(self):
+        with self.lock:
+            return bool(self.pending) or (self.status == FINISHED and not self.completed_saved)
+
+    def state(self, user_id, now):
+        with self.lock:
+            self._sync(now)
+            current = self.round
+            state = {
+                'id': str(self.id),
+                'trivia': self.trivia_id,
+                'status': self.status,
+                'server_time': now,
+                'players': len(self.players),
+                'rounds': len(self.questions),
+                'round': current.number if current else None,
+                # La pregunta solo se muestra mientras está abierta, igual para todos
+                'question': current.question if self.status == QUESTION else None,
+                'deadline': current.deadline if self.status == QUESTION else None,
+                'next_round_at': self.next_round_at if self.status == INTERMISSION else None,
+                'last_round': None,
+            }
+            closed = current if current is not None and self.status != QUESTION else None
+            if closed is not None:
+                key = self.answer_keys.get(closed.question_id)
+                state['last_round'] = {
+                    'round': closed.number,
+                    'question': closed.question_id,
+                    'correct_options': sorted(key.correct_option_ids) if key else [],
+                    'answered': len(closed.answers),
+                    'correct': sum(1 for _, points, _ in closed.answers.values() if points > 0),
+                }
+            if user_id in self.players:
+                answer = current.answers.get(user_id) if current else None
+                state['you'] = {
+                    'score': self.scores[user_id],
+                    'answered': answer is not None,
+                    # Los puntos de la ronda se revelan al cerrarla
+                    'points': answer[1] if answer is not None and closed is not None else None,
+                }
+            return state
+
+
+class GameRegistry:
+    """Partidas en vivo de este proceso.
+
+    Un temporizador por partida cierra cada ronda en su plazo, guarda sus respuestas y abre
+    la siguiente. El estado no se comparte entre procesos: todos los requests de una partida
+    deben llegar al proceso que la creó.
+    """
+
+    def __init__(self, clock=time.time, timers=True):
+        self.clock = clock
+        self.timers = timers
+        self._games = {}
+        self._lock = threading.Lock()
+
+    def create(self, trivia, answer_seconds=None, intermission_seconds=None):
+        questions = Question.objects.filter(trivia=trivia).prefetch_related('options').order_by('id')
+        questions = PlayerQuestionSerializer(questions, many=True).data
+        # Preguntas y claves de respuesta se copian al crear: durante la partida no se lee la base
+        answer_keys = scoring.get_answer_keys(question['id'] for question in questions)
+        game = Game(
+            trivia.id, questions, answer_keys,
+            answer_seconds or settings.LIVE_GAME_ANSWER_SECONDS,
+            settings.LIVE_GAME_INTERMISSION_SECONDS if intermission_seconds is None else intermission_seconds,
+            self.clock(),
+        )
+        with self._lock:
+            self._expire()
+            self._games[game.id] = game
+        return game
+
+    def _expire(self):
+        limit = self.clock() - settings.LIVE_GAME_RETENTION_S
+        for game_id, game in list(self._games.items()):
+            if game.finished_at is not None and game.finished_at < limit and not game.pending:
+                del self._games[game_id]
+
+    def get(self, game_id):
+        return self._games.get(game_id)
+
+    def all(self):
+        return list(self._games.values())
+
+    def start(self, game):
+        game.start(self.clock())
+        self._schedule(game)
+
+    def tick(self, game):
+        """Avanza la partida según el reloj y guarda las rondas cerradas."""
+        game.sync(self.clock())
+        self.flush(game)
+        self._schedule(game)
+
+    def _schedule(self, game):
+        if not self.timers:
+            return
+        wakeup = game.next_wakeup()
+        if game.failures and game.unsaved():
+            # Un guardado fallido se reintenta aunque la partida ya haya terminado
+            retry = self.clock() + min(RETRY_MAX_SECONDS, 2 ** game.failures)
+            wakeup = retry if wakeup is None else min(wakeup, retry)
+        with self._lock:
+            if game.timer is not None:
+                game.timer.cancel()
+            if wakeup is None:
+                game.timer = None
+                return
+            game.timer = threading.Timer(max(0.0, wakeup - self.clock()), self._on_timer, args=(game,))
+            game.timer.daemon = True
+            game.timer.start()
+
+    def _on_timer(self, game):
+        try:
+            self.tick(game)
+        except Exception:
+            logger.exception('Live game %s tick failed', game.id)
+            game.failures += 1
+            # Se reintenta el guardado con espera creciente, o antes si cierra otra ronda
+            self._schedule(game)
+        finally:
+            # El hilo del temporizador termina aquí: que no deje conexiones abiertas
+            connections.close_all()
+
+    def flush(self, game):
+        """Guarda las rondas cerradas con escrituras por lote en una sola transacción.
+
+        Una ronda de 10.000 jugadores son unas pocas decenas de INSERT/UPDATE de hasta
+        ``LIVE_GAME_BATCH_SIZE`` filas, en vez de una transacción por respuesta.
+        """
+        with game.flush_lock:
+            with game.lock:
+                rounds, game.pending = game.pending, []
+                players = dict(game.players)
+                finished = game.status == FINISHED
+            if not rounds and (not finished or game.completed_saved):
+                return 0
+            try:
+                participation_ids = self._persist(game, rounds, players, finished)
+            except Exception:
+                with game.lock:
+                    game.pending[:0] = rounds
+                raise
+            with game.lock:
+                game.players.update(participation_ids)
+                game.completed_saved = finished
+                game.failures = 0
+            return sum(len(closed.answers) for closed in rounds)
+
+    def _persist(self, game, rounds, players, finished):
+        batch_size = settings.LIVE_GAME_BATCH_SIZE
+        answers = [
+            (user_id, closed.question_id, option_id, points, answered_at)
+            for closed in rounds
+            for user_id, (option_id, points, answered_at) in closed.answers.items()
+        ]
+        deltas = {}
+        for user_id, _, _, points, _ in answers:
+            deltas[user_id] = deltas.get(user_id, 0) + points
+
+        with transaction.atomic():
+            new_players = [user_id for user_id, participation_id in players.items() if participation_id is None]
+            # Quien ya jugó la trivia sigue sumando en su participación (la más reciente), como en el
+            # juego por turnos; solo se crean las que faltan
+            existing = dict(
+                Participation.objects.filter(trivia_id=game.trivia_id, user_id__in=new_players)
+                .order_by('id').values_list('user_id', 'id')
+            )
+            participations = Participation.objects.bulk_create(
+                [Participation(user_id=user_id, trivia_id=game.trivia_id) for user_id in new_players if user_id not in existing],
+                batch_size=batch_size,
+            )
+            participation_ids = {
+                **players, **existing,
+                **{participation.user_id: participation.pk for participation in participations},
+            }
+
+            if packed.stores_rows():
+                UserAnswer.objects.bulk_create([
+                    UserAnswer(
+                        user_id=user_id, trivia_id=game.trivia_id, question_id=question_id,
+                        selected_option_id=option_id, answered_at=answered_at,
+                    )
+                    for user_id, question_id, option_id, _, answered_at in answers
+                ], batch_size=batch_size)
+            if packed.stores_packed():
+                records = {}
+                for user_id, question_id, option_id, points, _ in answers:
+                    records.setdefault(participation_ids[user_id], []).append((question_id, option_id, points > 0))
+                packed.append_many(records, batch_size=batch_size)
+
+            # Se suma lo nuevo de la ronda sobre el puntaje guardado, sin pisar el de una
+            # participación previa. update() no dispara las señales: el ranking se actualiza aparte
+            scored = [(participation_ids[user_id], delta) for user_id, delta in deltas.items() if delta]
+            for start in range(0, len(scored), batch_size):
+                batch = scored[start:start + batch_size]
+                Participation.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+                    score=F('score') + Case(*(When(pk=pk, then=Value(delta)) for pk, delta in batch), default=Value(0))
+                )
+            leaderboard.apply_score_deltas(game.trivia_id, deltas, batch_size=batch_size)
+
+            if finished:
+                Participation.objects.filter(pk__in=list(participation_ids.values())).update(completed=True)
+        return participation_ids
+
+
+registry = GameRegistry()
@@ -0,0 +1,148 @@
+import codecs
+import csv
+import io
+import json
+from itertools import islice
+from django.db import transaction
+from trivia import revisions
+from trivia.models import AnswerOption, Question
+from trivia.serializers import QuestionImportSerializer
+
+FORMATS = ('jsonl', 'csv')
+CSV_CONTENT_TYPES = ('text/csv', 'application/csv')
+
+
+class UploadError(ValueError):
+    """Archivo subido que no se puede leer; las vistas lo responden con 400."""
+
+
+def read_upload(request):
+    """``(stream, file_format)`` de un archivo multipart en ``file`` o del cuerpo crudo.
+
+    En el cuerpo el formato sale del Content-Type (CSV o, si no, JSONL); en multipart, de la
+    extensión del archivo. El texto debe ser UTF-8.
+    """
+    # El Content-Type puede traer parámetros: "text/csv; charset=utf-8"
+    content_type = request.content_type.split(';')[0].strip().lower()
+    if content_type.startswith('multipart/'):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise UploadError('file is required')
+        # Se valida la codificación antes de procesar: con la respuesta ya en stream, un error
+        # a mitad del archivo no podría ser un 400
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            for chunk in upload.chunks():
+                decoder.decode(chunk)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            raise UploadError('The file must be UTF-8 encoded')
+        upload.seek(0)
+        file_format = 'csv' if upload.name.lower().endswith('.csv') else 'jsonl'
+        # newline='': el módulo csv necesita ver los saltos de línea dentro de campos entre comillas
+        return io.TextIOWrapper(upload.file, encoding='utf-8', newline=''), file_format
+    try:
+        text = request.body.decode('utf-8')
+    except UnicodeDecodeError:
+        raise UploadError('The body must be UTF-8 encoded')
+    return io.StringIO(text, newline=''), 'csv' if content_type in CSV_CONTENT_TYPES else 'jsonl'
+
+
+def read_jsonl(stream):
+    """Una pregunta por línea: ``{"question_text": ..., "difficulty": ..., "options": [...]}``."""
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_number, ValueError(f'Invalid JSON: {exc.msg}')
+
+
+def read_csv(stream):
+    """Columnas ``question_text``, ``difficulty``, ``option_1`` ... ``option_n`` y ``correct``.
+
+    ``correct`` es el número (desde 1) de la opción correcta, el de su columna: las columnas de
+    opción vacías se omiten sin correr la numeración de las siguientes.
+    """
+    reader = csv.DictReader(stream)
+    option_columns = sorted(
+        (int(name[len('option_'):]), name)
+        for name in reader.fieldnames or ()
+        if name.startswith('option_') and name[len('option_'):].isdigit()
+    )
+    # Número de la línea donde empieza cada fila: un campo entre comillas puede ocupar varias
+    last_line = reader.line_num
+    for row in reader:
+        line_number, last_line = last_line + 1, reader.line_num
+        correct = (row.get('correct') or '').strip()
+        if not correct.isdigit():
+            yield line_number, ValueError('correct must be the number of the correct option')
+            continue
+        yield line_number, {
+            'question_text': row.get('question_text'),
+            'difficulty': row.get('difficulty'),
+            'options': [
+                {'option_text': row[name], 'is_correct': position == int(correct)}
+                for position, name in option_columns if row.get(name)
+            ],
+        }
+
+
+def import_questions(stream, file_format='jsonl', batch_size=1000):
+    """Importa preguntas en lotes con ``bulk_create``.
+
+    Las filas inválidas o duplicadas (contra la base o dentro del mismo archivo) se
+    reportan y se omiten sin abortar el resto. Devuelve un resumen con los errores por línea.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f'Unsupported format: {file_format}')
+    rows = read_jsonl(stream) if file_format == 'jsonl' else read_csv(stream)
+    summary = {'created': 0, 'duplicates': 0, 'errors': []}
+    seen = set()
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        _import_batch(batch, seen, summary)
+    return summary
+
+
+def _import_batch(batch, seen, summary):
+    valid = []
+    for line_number, row in batch:
+        if isinstance(row, Exception):
+            summary['errors'].append({'line': line_number, 'errors': str(row)})
+            continue
+        serializer = QuestionImportSerializer(data=row)
+        if not serializer.is_valid():
+            summary['errors'].append({'line': line_number, 'errors': serializer.errors})
+            continue
+        valid.append(serializer.validated_data)
+
+    # Una consulta por lote para descartar preguntas ya registradas
+    texts = {data['question_text'] for data in valid}
+    existing = set(Question.objects.filter(question_text__in=texts).values_list('question_text', flat=True))
+    new = []
+    for data in valid:
+        text = data['question_text']
+        if text in existing or text in seen:
+            summary['duplicates'] += 1
+            continue
+        seen.add(text)
+        new.append(data)
+    if not new:
+        return
+
+    with transaction.atomic():
+        questions = Question.objects.bulk_create(
+            [Question(question_text=data['question_text'], difficulty=data['difficulty']) for data in new]
+        )
+        AnswerOption.objects.bulk_create([
+            AnswerOption(question=question, **option)
+            for question, data in zip(questions, new)
+            for option in data['options']
+        ])
+        # bulk_create no emite señales
+        revisions.bump(revisions.QUESTIONS)
+    summary['created'] += len(questions)
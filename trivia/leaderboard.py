@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.db.models import F, Sum
+from trivia import ranking, revisions
+from trivia.models import Participation, TriviaScore, UserScore
+
+
+def apply_score_delta(user_id, trivia_id, delta):
+    """Suma ``delta`` a los totales materializados de (trivia, usuario) y del usuario."""
+    if not delta:
+        return
+    with transaction.atomic():
+        _increment(TriviaScore, {'user_id': user_id, 'trivia_id': trivia_id}, 'score', delta)
+        _increment(UserScore, {'user_id': user_id}, 'total_score', delta)
+        # Al confirmar: suma al ranking en memoria y sube la revisión del ranking de la trivia
+        ranking.registry.record(trivia_id, {user_id: delta})
+
+
+def apply_score_deltas(trivia_id, deltas, batch_size=1000):
+    """Como :func:`apply_score_delta` para muchos usuarios de una trivia, con consultas por lote.
+
+    ``deltas``: ``{user_id: delta}``.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        _bulk_increment(TriviaScore, {'trivia_id': trivia_id}, 'score', deltas, batch_size)
+        _bulk_increment(UserScore, {}, 'total_score', deltas, batch_size)
+        ranking.registry.record(trivia_id, deltas)
+
+
+def _increment(model, lookup, field, delta):
+    updated = model.objects.filter(**lookup).update(**{field: F(field) + delta})
+    if not updated:
+        obj, created = model.objects.get_or_create(**lookup, defaults={field: delta})
+        if not created:
+            model.objects.filter(**lookup).update(**{field: F(field) + delta})
+
+
+def _bulk_increment(model, lookup, field, deltas, batch_size):
+    # Se bloquean las filas existentes para no pisar incrementos concurrentes de otras rutas,
+    # siempre en el mismo orden para que dos lotes que se cruzan no se bloqueen mutuamente
+    rows = list(
+        model.objects.select_for_update().filter(**lookup, user_id__in=list(deltas)).order_by('user_id')
+    )
+    for row in rows:
+        setattr(row, field, getattr(row, field) + deltas[row.user_id])
+    model.objects.bulk_update(rows, [field], batch_size=batch_size)
+    existing = {row.user_id for row in rows}
+    model.objects.bulk_create(
+        [model(**lookup, user_id=user_id, **{field: delta}) for user_id, delta in deltas.items() if user_id not in existing],
+        batch_size=batch_size,
+    )
+
+
+def rebuild():
+    """Recalcula todas las tablas del ranking a partir de Participation."""
+    totals = (
+        Participation.objects.values('user_id', 'trivia_id')
+        .annotate(total=Sum('score'))
+        .order_by()
+    )
+    user_totals = {}
+    trivia_scores = []
+    for row in totals.iterator():
+        trivia_scores.append(TriviaScore(user_id=row['user_id'], trivia_id=row['trivia_id'], score=row['total']))
+        user_totals[row['user_id']] = user_totals.get(row['user_id'], 0) + row['total']
+
+    with transaction.atomic():
+        TriviaScore.objects.all().delete()
+        UserScore.objects.all().delete()
+        TriviaScore.objects.bulk_create(trivia_scores, batch_size=1000)
+        UserScore.objects.bulk_create(
+            [UserScore(user_id=user_id, total_score=total) for user_id, total in user_totals.items()],
+            batch_size=1000,
+        )
+        transaction.on_commit(ranking.registry.rebuild)
+        revisions.bump(revisions.RANKING_EPOCH)
+
+
+def ranking_queryset(trivia_id=None, user_id=None):
+    queryset = TriviaScore.objects.select_related('user', 'trivia')
+    if trivia_id and user_id:
+        return queryset.filter(trivia_id=trivia_id, user_id=user_id)
+    elif trivia_id:
+        return queryset.filter(trivia_id=trivia_id).order_by('-score', 'user_id')
+    elif user_id:
+        return queryset.filter(user_id=user_id).order_by('-score', 'trivia_id')
+    # Ranking global: una sola consulta ordenada por el total del usuario
+    return queryset.order_by('-user__total_score__total_score', 'user_id', '-score')
+
+
+def build_ranking(rows):
+    # Las filas vienen agrupadas por usuario y ordenadas por puntaje, basta una pasada
+    ranking = []
+    current_user_id = None
+    for row in rows:
+        if row.user_id != current_user_id:
+            current_user_id = row.user_id
+            ranking.append({'user': row.user.username, 'total_score': 0, 'trivias': []})
+        ranking[-1]['total_score'] += row.score
+        ranking[-1]['trivias'].append({'trivia_name': row.trivia.name, 'score': row.score})
+    return ranking
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import threading
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from trivia import ranking
+from trivia.models import User
+
+
+def sse_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'.encode()
+
+
+HEARTBEAT = b': ping\n\n'
+
+
+class Subscriber:
+    """Cola acotada de un cliente. Si se llena, se descarta lo pendiente y se reenvía un snapshot."""
+
+    def __init__(self, maxsize, max_resyncs):
+        self.queue = asyncio.Queue(maxsize)
+        self.max_resyncs = max_resyncs
+        self.resyncs = 0
+        self.closed = False
+
+    def offer(self, message, snapshot):
+        if self.closed:
+            return
+        if not self.queue.full():
+            self.queue.put_nowait(message)
+            return
+        # Cliente lento: en vez de acumular deltas se salta al estado actual
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.resyncs += 1
+        if self.resyncs > self.max_resyncs:
+            self.closed = True
+            self.queue.put_nowait(None)
+        else:
+            self.queue.put_nowait(snapshot())
+
+    async def messages(self, heartbeat):
+        while True:
+            try:
+                message = await asyncio.wait_for(self.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield HEARTBEAT
+                continue
+            if message is None:
+                return
+            if self.queue.empty():
+                # Se puso al día: vuelve a tener todo el margen de resincronizaciones
+                self.resyncs = 0
+            yield message
+
+
+class LeaderboardChannel:
+    """Top ``k`` de una trivia: se recalcula una vez por tick, solo si el registro del ranking
+    vio cambios, y se reparte a todos los suscriptores."""
+
+    def __init__(self, hub, trivia_id, k):
+        self.hub = hub
+        self.trivia_id = trivia_id
+        self.k = k
+        self.subscribers = set()
+        self.entries = None
+        self.sequence = 0
+        self.seen_version = None
+        self.usernames = {}
+        self.task = None
+
+    def snapshot_message(self):
+        return sse_event('snapshot', {'trivia_id': self.trivia_id, 'seq': self.sequence, 'entries': self.entries})
+
+    async def refresh(self):
+        """Recalcula el top y devuelve el delta respecto del anterior (``None`` si no cambió)."""
+        # ``engine()`` ya se sincroniza con la base como mucho cada RANKING_SYNC_SECONDS; la
+        # versión del registro sube con cada cambio que ve el proceso, sin consultas ni recargas
+        engine = await sync_to_async(ranking.registry.engine)(self.trivia_id)
+        version = ranking.registry.version(self.trivia_id)
+        if self.entries is not None and version == self.seen_version:
+            return None
+        self.seen_version = version
+        entries = await sync_to_async(engine.top)(self.k)
+
+        missing = [entry['user_id'] for entry in entries if entry['user_id'] not in self.usernames]
+        if missing:
+            async for user_id, username in User.objects.filter(id__in=missing).values_list('id', 'username'):
+                self.usernames[str(user_id)] = username
+        for entry in entries:
+            entry['user'] = self.usernames.get(entry['user_id'])
+
+        previous = {entry['user_id']: entry for entry in self.entries or []}
+        current = {entry['user_id'] for entry in entries}
+        changed = [entry for entry in entries if previous.get(entry['user_id']) != entry]
+        removed = [user_id for user_id in previous if user_id not in current]
+        self.entries = entries
+        if not changed and not removed:
+            return None
+        self.sequence += 1
+        return {'trivia_id': self.trivia_id, 'seq': self.sequence, 'changed': changed, 'removed': removed}
+
+    async def run(self):
+        try:
+            while self.subscribers:
+                await asyncio.sleep(self.hub.tick)
+                delta = await self.refresh()
+                if delta is None:
+                    continue
+                message = sse_event('delta', delta)
+                snapshot = None
+
+                def get_snapshot():
+                    # Se codifica una sola vez por tick y solo si algún cliente lo necesita
+                    nonlocal snapshot
+                    if snapshot is None:
+                        snapshot = self.snapshot_message()
+                    return snapshot
+
+                for subscriber in list(self.subscribers):
+                    subscriber.offer(message, get_snapshot)
+        finally:
+            self.hub.discard(self)
+
+
+class LeaderboardHub:
+    """Canales de ranking en vivo del proceso, uno por (trivia, k) y event loop."""
+
+    def __init__(self, tick=0.25, queue_size=16, max_resyncs=3, heartbeat=15):
+        self.tick = tick
+        self.queue_size = queue_size
+        self.max_resyncs = max_resyncs
+        self.heartbeat = heartbeat
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    async def subscribe(self, trivia_id, k):
+        """Generador de eventos SSE: primero el snapshot actual y luego un delta por tick con cambios."""
+        key = (trivia_id, k, id(asyncio.get_running_loop()))
+        with self._lock:
+            channel = self._channels.get(key)
+            if channel is None:
+                channel = self._channels[key] = LeaderboardChannel(self, trivia_id, k)
+        subscriber = Subscriber(self.queue_size, self.max_resyncs)
+        channel.subscribers.add(subscriber)
+        try:
+            if channel.entries is None:
+                await channel.refresh()
+            yield channel.snapshot_message()
+            if channel.task is None or channel.task.done():
+                channel.task = asyncio.create_task(channel.run())
+            async for message in subscriber.messages(self.heartbeat):
+                yield message
+        finally:
+            channel.subscribers.discard(subscriber)
+
+    def discard(self, channel):
+        with self._lock:
+            for key, value in list(self._channels.items()):
+                if value is channel and not channel.subscribers:
+                    del self._channels[key]
+
+
+hub = LeaderboardHub(
+    tick=getattr(settings, 'LIVE_RANKING_TICK_MS', 250) / 1000,
+    queue_size=getattr(settings, 'LIVE_RANKING_QUEUE_SIZE', 16),
+    max_resyncs=getattr(settings, 'LIVE_RANKING_MAX_RESYNCS', 3),
+    heartbeat=getattr(settings, 'LIVE_RANKING_HEARTBEAT_S', 15),
+)
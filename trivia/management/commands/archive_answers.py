@@ -0,0 +1,45 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from trivia import archival
+from trivia.models import AnswerArchive
+
+
+class Command(BaseCommand):
+    help = 'Move the answers of finished trivias out of USER_ANSWER into compressed NDJSON archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trivia', type=int, nargs='*', help='Archive these trivias instead of the finished ones')
+        parser.add_argument('--older-than', type=int, default=settings.ANSWER_ARCHIVE_AFTER_DAYS,
+                            help='Days without new answers before a finished trivia is archived')
+        parser.add_argument('--directory', default=None, help='Defaults to ANSWER_ARCHIVE_DIR')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true', help='Only list the trivias that would be archived')
+        parser.add_argument('--vacuum', action='store_true', help='VACUUM ANALYZE USER_ANSWER afterwards (Postgres)')
+        parser.add_argument('--restore', type=int, metavar='ARCHIVE_ID', help='Load an archive back into USER_ANSWER')
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            try:
+                archive = AnswerArchive.objects.get(pk=options['restore'])
+            except AnswerArchive.DoesNotExist:
+                raise CommandError(f"Archive {options['restore']} does not exist")
+            restored = archival.restore_archive(archive, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Restored {restored} answers from {archive.path}'))
+            return
+
+        trivia_ids = options['trivia'] or list(archival.archivable_trivias(timedelta(days=options['older_than'])))
+        if options['dry_run']:
+            self.stdout.write(f"Would archive trivias: {', '.join(map(str, trivia_ids)) or 'none'}")
+            return
+
+        total = 0
+        for trivia_id in trivia_ids:
+            archive = archival.archive_trivia(trivia_id, directory=options['directory'], batch_size=options['batch_size'])
+            if archive is None:
+                continue
+            total += archive.rows
+            self.stdout.write(f'Trivia {trivia_id}: {archive.rows} answers -> {archive.path}')
+        if options['vacuum'] and archival.vacuum_answers():
+            self.stdout.write('Vacuumed USER_ANSWER')
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} answers from {len(trivia_ids)} trivias'))
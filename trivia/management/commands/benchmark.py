@@ -0,0 +1,116 @@
+import json
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from trivia import benchmarks, ranking
+from trivia.models import User
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the API endpoints in-process against a seeded throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--questions', type=int, default=500)
+        parser.add_argument('--trivias', type=int, default=20)
+        parser.add_argument('--questions-per-trivia', type=int, default=20)
+        parser.add_argument('--trivias-per-user', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--only', nargs='*', help='Run only these scenarios')
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument('--compare', help='Previous report to compare against')
+        parser.add_argument('--max-regression', type=float, default=0.2,
+                            help='Allowed p95 slowdown before failing, as a fraction')
+        parser.add_argument('--concurrency', type=int, default=0,
+                            help='Also run every endpoint with this many requests in flight through the ASGI handler')
+        parser.add_argument('--connections', type=int, default=0,
+                            help='Also measure database connection setup cost with this many samples')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the benchmark database between runs')
+
+    def handle(self, *args, **options):
+        dataset = {
+            key: options[key]
+            for key in ('users', 'questions', 'trivias', 'questions_per_trivia', 'trivias_per_user', 'seed')
+        }
+
+        # Igual que el runner de tests: nunca se siembra la base configurada
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            if not User.objects.exists():
+                call_command('generate_test_data', attempts=1, stdout=self.stdout, **dataset)
+            # La base temporal de SQLite vive en memoria y rechaza, en vez de esperar, la escritura
+            # del hilo que sube las revisiones del ranking: ahí se suben al confirmar
+            delay = 0 if connection.vendor == 'sqlite' else settings.RANKING_REVISION_DELAY_MS
+            with override_settings(RANKING_REVISION_DELAY_MS=delay):
+                report = self.run_benchmarks(options, dataset)
+            # Las revisiones del ranking que quedaron pendientes van a la base temporal, no después
+            ranking.registry.flush()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        benchmarks.write_report(options['output'], report)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+            regressions = benchmarks.compare(baseline, report, options['max_regression'])
+            if regressions:
+                raise CommandError('Regressions found:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
+        else:
+            failed = benchmarks.failures(report)
+            if failed:
+                raise CommandError('Scenarios with non-2xx responses:\n' + '\n'.join(failed))
+
+    def run_benchmarks(self, options, dataset):
+        runner = benchmarks.BenchmarkRunner(requests=options['requests'], warmup=options['warmup'])
+        results = {}
+        self.stdout.write(f"{'endpoint':<22}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}{'queries':>9}{'peak kb':>10}")
+        for scenario in benchmarks.default_scenarios():
+            if options['only'] and scenario.name not in options['only']:
+                continue
+            result = runner.run(scenario)
+            results[scenario.name] = result
+            self.stdout.write(
+                f"{scenario.name:<22}{result['p50_ms']:>9}{result['p95_ms']:>9}{result['p99_ms']:>9}"
+                f"{result['rps']:>9}{result['queries']:>9}{result['peak_memory_kb']:>10}"
+            )
+        report = {'meta': benchmarks.metadata(dataset), 'results': results}
+        if options['concurrency']:
+            report['concurrency'] = self.run_concurrent(runner, options)
+        if options['connections']:
+            report['connections'] = self.run_connections(options)
+        return report
+
+    def run_connections(self, options):
+        result = benchmarks.connection_setup(samples=options['connections'])
+        self.stdout.write(f"\nconnection setup ({result['mode']})")
+        self.stdout.write(f"{'path':<22}{'p50':>9}{'p95':>9}{'mean':>9}")
+        for name in ('new_connection', 'request_cycle', 'reused'):
+            timing = result[name]
+            self.stdout.write(f"{name:<22}{timing['p50_ms']:>9}{timing['p95_ms']:>9}{timing['mean_ms']:>9}")
+        return result
+
+    def run_concurrent(self, runner, options):
+        concurrent = benchmarks.ConcurrentRunner(
+            runner, requests=options['requests'], concurrency=options['concurrency'], warmup=options['warmup']
+        )
+        results = {}
+        self.stdout.write(f"\nconcurrency {options['concurrency']}")
+        self.stdout.write(f"{'endpoint':<22}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}")
+        for scenario in benchmarks.default_scenarios():
+            if options['only'] and scenario.name not in options['only']:
+                continue
+            result = concurrent.run(scenario)
+            results[scenario.name] = result
+            self.stdout.write(
+                f"{scenario.name:<22}{result['p50_ms']:>9}{result['p95_ms']:>9}{result['p99_ms']:>9}{result['rps']:>9}"
+            )
+        return results
@@ -1,18 +1,55 @@
-from django.core.management.base import BaseCommand
-from trivia.models import User, Entity, Player, Question, AnswerOption, Trivia, Participation, UserAnswer
+import argparse
 import random
+from itertools import islice
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from trivia import leaderboard, packed, revisions
+from trivia.models import User, Entity, Player, Question, AnswerOption, Trivia, Participation, PackedAnswers, UserAnswer
+from trivia.scoring import DIFFICULTY_POINTS
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
 
 class Command(BaseCommand):
     help = 'Generate test data for TalaTrivia'
 
-    def handle(self, *args, **kwargs):
-        self.create_users()
-        self.create_questions()
-        self.create_trivias()
-        self.create_participations()
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--questions', type=int, default=30)
+        parser.add_argument('--options', type=int, default=4, help='Answer options per question')
+        parser.add_argument('--trivias', type=int, default=5)
+        parser.add_argument('--questions-per-trivia', type=int, default=10)
+        parser.add_argument('--trivias-per-user', type=int, default=None, help='Defaults to every trivia')
+        parser.add_argument('--attempts', type=int, default=2, help='Participations per user and trivia')
+        parser.add_argument('--answers', action=argparse.BooleanOptionalAction, default=True,
+                            help='Also write one UserAnswer per answered question')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--force', action='store_true',
+                            help='Generate data even if the database already has trivias')
+
+    def handle(self, *args, **options):
+        # docker-compose lo corre en cada arranque: sin --force no vuelve a agregar datos
+        if Trivia.objects.exists() and not options['force']:
+            self.stdout.write('The database already has data, skipping (use --force to generate more)')
+            return
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.create_users(options['users'])
+        self.create_questions(options['questions'], options['options'])
+        self.create_trivias(options['trivias'], options['questions_per_trivia'])
+        self.create_participations(options['trivias_per_user'], options['attempts'], options['answers'])
+        # bulk_create no emite señales: el ranking se reconstruye al final
+        leaderboard.rebuild()
+        revisions.bump(revisions.QUESTIONS, revisions.TRIVIAS)
         self.stdout.write(self.style.SUCCESS('Successfully generated test data'))
 
-    def create_users(self):
+    def create_users(self, count):
         # Crear usuario administrador
         if not User.objects.filter(email='admin@example.com').exists():
             User.objects.create_superuser(
@@ -22,62 +59,118 @@ class Command(BaseCommand):
                 name='Admin User'
             )
 
-        # Crear usuarios de prueba
-        for i in range(10):
-            username = f'user{i}'
-            email = f'user{i}@example.com'
-            if not User.objects.filter(email=email).exists():
-                user = User.objects.create_user(
-                    username=username,
-                    email=email,
-                    password='password',
-                    name=f'User {i}',
-                    role='player'
-                )
-                if not Entity.objects.filter(user=user).exists():
-                    entity = Entity.objects.create(user=user, name=user.name, email=user.email)
-                    Player.objects.create(entity=entity, role='player')
+        # Crear usuarios de prueba, todos con la misma contraseña hasheada una sola vez
+        password = make_password('password')
+        for batch in batched(range(count), self.batch_size):
+            usernames = [f'user{i}' for i in batch]
+            existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+            users = [
+                User(username=f'user{i}', email=f'user{i}@example.com', name=f'User {i}', password=password, role='player')
+                for i in batch
+                if f'user{i}' not in existing
+            ]
+            entities = [Entity(user=user, name=user.name, email=user.email) for user in users]
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                Entity.objects.bulk_create(entities)
+                Player.objects.bulk_create([Player(entity=entity, role='player') for entity in entities])
 
-    def create_questions(self):
-        difficulties = ['easy', 'medium', 'hard']
-        for i in range(30):
-            question = Question.objects.create(
-                question_text=f'Question {i}',
-                difficulty=random.choice(difficulties)
-            )
-            for j in range(4):
-                AnswerOption.objects.create(
-                    question=question,
-                    option_text=f'Option {j} for Question {i}',
-                    is_correct=(j == 0)
-                )
+    def create_questions(self, count, options):
+        difficulties = [difficulty for difficulty, _ in Question.DIFFICULTY_CHOICES]
+        for batch in batched(range(count), self.batch_size):
+            texts = [f'Question {i}' for i in batch]
+            existing = set(Question.objects.filter(question_text__in=texts).values_list('question_text', flat=True))
+            questions = [
+                Question(question_text=text, difficulty=self.random.choice(difficulties))
+                for text in texts
+                if text not in existing
+            ]
+            with transaction.atomic():
+                Question.objects.bulk_create(questions)
+                AnswerOption.objects.bulk_create([
+                    AnswerOption(
+                        question=question,
+                        option_text=f'Option {j} for {question.question_text}',
+                        is_correct=(j == 0)
+                    )
+                    for question in questions
+                    for j in range(options)
+                ])
 
-    def create_trivias(self):
-        for i in range(5):
-            trivia = Trivia.objects.create(
-                name=f'Trivia {i}',
-                description=f'Description for Trivia {i}'
-            )
-            questions = Question.objects.all().order_by('?')[:10]
-            trivia.questions.set(questions)
+    def create_trivias(self, count, questions_per_trivia):
+        question_ids = list(Question.objects.values_list('id', flat=True))
+        questions_per_trivia = min(questions_per_trivia, len(question_ids))
+        TriviaQuestion = Trivia.questions.through
+        for batch in batched(range(count), self.batch_size):
+            names = [f'Trivia {i}' for i in batch]
+            existing = set(Trivia.objects.filter(name__in=names).values_list('name', flat=True))
+            trivias = [
+                Trivia(name=name, description=f'Description for {name}')
+                for name in names
+                if name not in existing
+            ]
+            with transaction.atomic():
+                Trivia.objects.bulk_create(trivias)
+                TriviaQuestion.objects.bulk_create([
+                    TriviaQuestion(trivia_id=trivia.id, question_id=question_id)
+                    for trivia in trivias
+                    for question_id in self.random.sample(question_ids, questions_per_trivia)
+                ])
 
-    def create_participations(self):
-        users = User.objects.all()
-        trivias = Trivia.objects.all()
-        for user in users:
-            for trivia in trivias:
-                for _ in range(2):  # Cada jugador participa 2 veces en cada trivia
-                    participation = Participation.objects.create(
-                        user=user,
-                        trivia=trivia,
-                        score=random.randint(0, 30),
-                        completed=True
-                    )
-                    questions = trivia.questions.all()
-                    for question in questions:
-                        correct_option = question.options.filter(is_correct=True).first()
-                        UserAnswer.objects.create(
-                            user=user,
-                            question=question,
-                            selected_option=correct_option
-                        )
\ No newline at end of file
+    def create_participations(self, trivias_per_user, attempts, with_answers):
+        # Claves de respuesta precargadas: nada de consultas dentro de los bucles
+        points = dict(Question.objects.values_list('id', 'difficulty'))
+        options = {}
+        correct = {}
+        for question_id, option_id, is_correct in AnswerOption.objects.values_list('question_id', 'id', 'is_correct'):
+            options.setdefault(question_id, []).append(option_id)
+            if is_correct:
+                correct[question_id] = option_id
+        trivia_questions = {}
+        for trivia_id, question_id in Trivia.questions.through.objects.values_list('trivia_id', 'question_id'):
+            trivia_questions.setdefault(trivia_id, []).append(question_id)
+        trivia_ids = sorted(trivia_questions)
+        if not trivia_ids:
+            return
+        per_user = len(trivia_ids) if trivias_per_user is None else min(trivias_per_user, len(trivia_ids))
+
+        store_rows = with_answers and packed.stores_rows()
+        store_packed = with_answers and packed.stores_packed()
+        participations = []
+        answers = []
+        packed_answers = []
+        for user_id in User.objects.values_list('id', flat=True).iterator(chunk_size=self.batch_size):
+            for trivia_id in self.random.sample(trivia_ids, per_user):
+                for _ in range(attempts):  # Cada jugador participa varias veces en cada trivia
+                    score = 0
+                    attempt = []
+                    for question_id in trivia_questions[trivia_id]:
+                        if question_id not in options:
+                            continue
+                        selected = self.random.choice(options[question_id])
+                        is_correct = selected == correct.get(question_id)
+                        if is_correct:
+                            score += DIFFICULTY_POINTS[points[question_id]]
+                        if store_rows:
+                            answers.append(UserAnswer(
+                                user_id=user_id, trivia_id=trivia_id, question_id=question_id, selected_option_id=selected
+                            ))
+                        if store_packed:
+                            attempt.append((question_id, selected, is_correct))
+                    participations.append(Participation(user_id=user_id, trivia_id=trivia_id, score=score, completed=True))
+                    packed_answers.append(attempt)
+            if len(participations) >= self.batch_size or len(answers) >= self.batch_size:
+                self.flush(participations, answers, packed_answers if store_packed else None)
+                participations, answers, packed_answers = [], [], []
+        self.flush(participations, answers, packed_answers if store_packed else None)
+
+    def flush(self, participations, answers, packed_answers=None):
+        with transaction.atomic():
+            Participation.objects.bulk_create(participations, batch_size=self.batch_size)
+            UserAnswer.objects.bulk_create(answers, batch_size=self.batch_size)
+            if packed_answers is not None:
+                # bulk_create ya asignó los ids de las participaciones
+                PackedAnswers.objects.bulk_create([
+                    PackedAnswers(participation_id=participation.id, data=packed.pack(attempt))
+                    for participation, attempt in zip(participations, packed_answers)
+                ], batch_size=self.batch_size)
@@ -0,0 +1,30 @@
+import json
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from trivia import importers
+
+
+class Command(BaseCommand):
+    help = 'Bulk import questions from a JSONL or CSV file ("-" reads from stdin)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', dest='file_format', choices=importers.FORMATS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        try:
+            stream = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+        except OSError as exc:
+            raise CommandError(exc)
+        with stream:
+            summary = importers.import_questions(stream, file_format=file_format, batch_size=options['batch_size'])
+
+        for error in summary['errors']:
+            self.stderr.write(f"Line {error['line']}: {json.dumps(error['errors'], ensure_ascii=False)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {summary['created']} questions "
+            f"({summary['duplicates']} duplicates, {len(summary['errors'])} errors)"
+        ))
@@ -0,0 +1,35 @@
+import json
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from trivia import provisioning
+
+
+class Command(BaseCommand):
+    help = 'Bulk create users from a JSONL or CSV file ("-" reads from stdin)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', dest='file_format', choices=('jsonl', 'csv'))
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, help='Password hashing processes (defaults to one per CPU)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        try:
+            stream = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+        except OSError as exc:
+            raise CommandError(exc)
+
+        created = errors = 0
+        with stream:
+            results = provisioning.provision_users(
+                stream, file_format=file_format, batch_size=options['batch_size'], workers=options['workers']
+            )
+            for result in results:
+                if result['status'] == 'created':
+                    created += 1
+                else:
+                    errors += 1
+                    self.stderr.write(f"Line {result['line']}: {json.dumps(result['errors'], ensure_ascii=False)}")
+        self.stdout.write(self.style.SUCCESS(f'Created {created} users ({errors} errors)'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from trivia import leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized leaderboard tables from Participation'
+
+    def handle(self, *args, **kwargs):
+        leaderboard.rebuild()
+        self.stdout.write(self.style.SUCCESS('Successfully rebuilt leaderboard'))
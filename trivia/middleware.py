@@ -0,0 +1,105 @@
+import heapq
+import json
+import logging
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('trivia.requests')
+
+
+class QueryTimer:
+    """``execute_wrapper`` que cuenta y cronometra las consultas, guardando solo las más lentas."""
+
+    def __init__(self, keep=5):
+        self.keep = keep
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, (duration, sql))
+            elif duration > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (duration, sql))
+
+
+class RequestInstrumentationMiddleware:
+    """Mide tiempo total, consultas y tiempo de base por request.
+
+    Agrega un header ``Server-Timing`` y registra en ``trivia.requests`` los requests más
+    lentos que ``SLOW_REQUEST_MS`` junto con sus consultas más costosas. Se activa con
+    ``REQUEST_INSTRUMENTATION=True``. Funciona en la cadena sync y en la async, como el
+    middleware de Django.
+    """
+
+    sync_capable = True
+    async_capable = True
+    max_sql_length = 1000
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_request_ms = getattr(settings, 'SLOW_REQUEST_MS', 500)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with self.instrument(timer):
+            response = self.get_response(request)
+        return self.finish(request, response, timer, start)
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+        # Las conexiones son por hilo: el wrapper se instala en el hilo donde corren las vistas
+        # sync y el ORM async de este request, y se quita en ese mismo hilo
+        stack = await sync_to_async(self.instrument)(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, timer, start)
+
+    def instrument(self, timer):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timer))
+        return stack
+
+    def finish(self, request, response, timer, start):
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = timer.duration * 1000
+
+        response['Server-Timing'] = (
+            f'app;dur={total_ms:.1f}, db;dur={db_ms:.1f};desc="{timer.count} queries"'
+        )
+        if total_ms >= self.slow_request_ms:
+            match = request.resolver_match
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'total_ms': round(total_ms, 1),
+                'db_ms': round(db_ms, 1),
+                'queries': timer.count,
+                'top_queries': [
+                    {'ms': round(duration * 1000, 1), 'sql': sql[:self.max_sql_length]}
+                    for duration, sql in sorted(timer.slowest, reverse=True)
+                ],
+            }))
+        return response
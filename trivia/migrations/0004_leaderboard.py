@@ -0,0 +1,60 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_leaderboard(apps, schema_editor):
+    Participation = apps.get_model('trivia', 'Participation')
+    TriviaScore = apps.get_model('trivia', 'TriviaScore')
+    UserScore = apps.get_model('trivia', 'UserScore')
+
+    totals = Participation.objects.values('user_id', 'trivia_id').annotate(total=Sum('score')).order_by()
+    user_totals = {}
+    trivia_scores = []
+    for row in totals.iterator():
+        trivia_scores.append(TriviaScore(user_id=row['user_id'], trivia_id=row['trivia_id'], score=row['total']))
+        user_totals[row['user_id']] = user_totals.get(row['user_id'], 0) + row['total']
+    TriviaScore.objects.bulk_create(trivia_scores, batch_size=1000)
+    UserScore.objects.bulk_create(
+        [UserScore(user_id=user_id, total_score=total) for user_id, total in user_totals.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trivia', '0003_user_role'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserScore',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='total_score', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_score', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'USER_SCORE',
+                'indexes': [models.Index(fields=['-total_score'], name='user_score_rank_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TriviaScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.IntegerField(default=0)),
+                ('trivia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scores', to='trivia.trivia')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trivia_scores', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'TRIVIA_SCORE',
+                'indexes': [models.Index(fields=['trivia', '-score'], name='trivia_score_rank_idx')],
+                'constraints': [models.UniqueConstraint(fields=('trivia', 'user'), name='trivia_score_trivia_user_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_leaderboard, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:29
+
+from django.db import migrations, models
+from trivia.operations import AddIndexConcurrently, create_table_index_concurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY no puede correr dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('trivia', '0004_leaderboard'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='participation',
+            index=models.Index(fields=['trivia', 'user'], name='participation_trivia_user_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='participation',
+            index=models.Index(fields=['trivia', '-score'], include=('user',), name='participation_score_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='useranswer',
+            index=models.Index(fields=['user', 'question'], name='user_answer_user_question_idx'),
+        ),
+        # Trivias de una pregunta (Question.trivia_set, claves de respuesta) sin leer la tabla
+        create_table_index_concurrently('TRIVIA_questions', 'trivia_questions_question_trivia_idx', ['question_id', 'trivia_id']),
+    ]
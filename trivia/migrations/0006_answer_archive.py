@@ -0,0 +1,69 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Min
+from trivia.operations import AddIndexConcurrently
+
+
+def backfill_answer_trivia(apps, schema_editor):
+    # Misma atribución que al puntuar: la primera trivia que contiene la pregunta
+    Question = apps.get_model('trivia', 'Question')
+    UserAnswer = apps.get_model('trivia', 'UserAnswer')
+    questions_by_trivia = {}
+    first_trivias = (
+        Question.objects.annotate(first_trivia=Min('trivia__id'))
+        .filter(first_trivia__isnull=False)
+        .values_list('id', 'first_trivia')
+    )
+    for question_id, trivia_id in first_trivias.iterator():
+        questions_by_trivia.setdefault(trivia_id, []).append(question_id)
+    for trivia_id, question_ids in questions_by_trivia.items():
+        UserAnswer.objects.filter(question_id__in=question_ids, trivia__isnull=True).update(trivia_id=trivia_id)
+
+
+class Migration(migrations.Migration):
+    # El índice sobre USER_ANSWER se crea con CREATE INDEX CONCURRENTLY
+    atomic = False
+
+    dependencies = [
+        ('trivia', '0005_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500)),
+                ('rows', models.IntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('restored_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'ANSWER_ARCHIVE',
+            },
+        ),
+        migrations.AddField(
+            model_name='useranswer',
+            name='answered_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='useranswer',
+            name='trivia',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='trivia.trivia'),
+        ),
+        migrations.RunPython(backfill_answer_trivia, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='useranswer',
+            index=models.Index(fields=['trivia', 'answered_at'], name='user_answer_trivia_time_idx'),
+        ),
+        migrations.AddField(
+            model_name='answerarchive',
+            name='trivia',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='answer_archives', to='trivia.trivia'),
+        ),
+    ]
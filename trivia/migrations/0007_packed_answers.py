@@ -0,0 +1,24 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trivia', '0006_answer_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackedAnswers',
+            fields=[
+                ('participation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='packed_answers', serialize=False, to='trivia.participation')),
+                ('data', models.BinaryField(default=bytes)),
+            ],
+            options={
+                'db_table': 'PARTICIPATION_ANSWERS',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trivia', '0007_packed_answers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trivia',
+            name='revision',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
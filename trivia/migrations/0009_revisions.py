@@ -0,0 +1,29 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trivia', '0008_trivia_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Revision',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'REVISION',
+            },
+        ),
+        migrations.AddField(
+            model_name='trivia',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 import uuid
-from django.db import models
+from django.db import models, router, transaction
+from django.utils import timezone
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, username, email, password=None, role='player', **extra_fields):
@@ -110,6 +111,9 @@ class Trivia(models.Model):
     description = models.TextField()
     questions = models.ManyToManyField(Question)
     users = models.ManyToManyField('User', through='Participation')
+    # Sube con cada cambio de la trivia, sus preguntas u opciones (ver trivia.payloads)
+    revision = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'TRIVIA'
@@ -117,6 +121,17 @@ class Trivia(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, update_fields=None, **kwargs):
+        # revision solo sube con un UPDATE atómico (payloads.bump_revision): un save no debe
+        # escribir de vuelta el valor que se leyó antes
+        if update_fields is None and not self._state.adding:
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'revision' and field.attname not in deferred
+            ]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
 
 class Participation(models.Model):
     user = models.ForeignKey('User', on_delete=models.CASCADE)
@@ -126,15 +141,115 @@ class Participation(models.Model):
 
     class Meta:
         db_table = 'PARTICIPATION'
+        indexes = [
+            # Participación de un usuario en una trivia (respuestas, lote de respuestas)
+            models.Index(fields=['trivia', 'user'], name='participation_trivia_user_idx'),
+            # Participaciones de una trivia por puntaje; en Postgres cubre también al usuario
+            models.Index(fields=['trivia', '-score'], include=['user'], name='participation_score_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.name} - {self.trivia.name}"
+
+    def save(self, *args, using=None, **kwargs):
+        # trivia.signals bloquea la fila en pre_save para calcular el delta del ranking: el bloqueo
+        # tiene que durar hasta que se escribe el puntaje nuevo
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, using=using, **kwargs)
+
+
+class TriviaScore(models.Model):
+    # Total acumulado de un usuario en una trivia, mantenido por trivia.leaderboard
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='trivia_scores')
+    trivia = models.ForeignKey('Trivia', on_delete=models.CASCADE, related_name='scores')
+    score = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'TRIVIA_SCORE'
+        constraints = [
+            models.UniqueConstraint(fields=['trivia', 'user'], name='trivia_score_trivia_user_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['trivia', '-score'], name='trivia_score_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.trivia_id}: {self.score}"
+
+
+class UserScore(models.Model):
+    # Total acumulado de un usuario en todas las trivias
+    user = models.OneToOneField('User', on_delete=models.CASCADE, primary_key=True, related_name='total_score')
+    total_score = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'USER_SCORE'
+        indexes = [
+            models.Index(fields=['-total_score'], name='user_score_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.total_score}"
    
 
 class UserAnswer(models.Model):
     user = models.ForeignKey('User', on_delete=models.CASCADE)
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     selected_option = models.ForeignKey(AnswerOption, on_delete=models.CASCADE)
+    # Trivia a la que se sumó el puntaje; las respuestas se archivan por trivia
+    # (su índice propio sobra: lo cubre user_answer_trivia_time_idx)
+    trivia = models.ForeignKey(
+        'Trivia', on_delete=models.CASCADE, null=True, blank=True, related_name='answers', db_index=False
+    )
+    answered_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         db_table = 'USER_ANSWER'
+        indexes = [
+            models.Index(fields=['user', 'question'], name='user_answer_user_question_idx'),
+            models.Index(fields=['trivia', 'answered_at'], name='user_answer_trivia_time_idx'),
+        ]
+
+
+class PackedAnswers(models.Model):
+    # Respuestas de una participación en formato compacto (ver trivia.packed)
+    participation = models.OneToOneField(
+        'Participation', on_delete=models.CASCADE, primary_key=True, related_name='packed_answers'
+    )
+    data = models.BinaryField(default=bytes)
+
+    class Meta:
+        db_table = 'PARTICIPATION_ANSWERS'
+
+    def __str__(self):
+        return f"{self.participation_id}: {len(self.data)} bytes"
+
+
+class Revision(models.Model):
+    # Contador de cambios de un recurso compartido (banco de preguntas, rankings), ver trivia.revisions
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'REVISION'
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class AnswerArchive(models.Model):
+    # Respuestas de una trivia movidas de USER_ANSWER a un archivo NDJSON comprimido
+    trivia = models.ForeignKey('Trivia', on_delete=models.SET_NULL, null=True, related_name='answer_archives')
+    path = models.CharField(max_length=500)
+    rows = models.IntegerField()
+    sha256 = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+    restored_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'ANSWER_ARCHIVE'
+
+    def __str__(self):
+        return f"{self.trivia_id}: {self.path} ({self.rows})"
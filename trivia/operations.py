@@ -0,0 +1,36 @@
+from django.contrib.postgres.operations import AddIndexConcurrently as PostgresAddIndexConcurrently
+from django.db.migrations.operations import AddIndex, RunPython
+
+
+class AddIndexConcurrently(PostgresAddIndexConcurrently):
+    """``CREATE INDEX CONCURRENTLY`` en Postgres (sin bloquear escrituras); un ``AddIndex`` común en otras bases.
+
+    Como el original, requiere una migración con ``atomic = False``.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+def create_table_index_concurrently(table, name, columns):
+    """Índice sobre una tabla sin modelo propio en el estado de migraciones (p. ej. la intermedia de un M2M)."""
+    column_list = ', '.join(f'"{column}"' for column in columns)
+
+    def forwards(apps, schema_editor):
+        concurrently = 'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql' else ''
+        schema_editor.execute(f'CREATE INDEX {concurrently}IF NOT EXISTS "{name}" ON "{table}" ({column_list})')
+
+    def backwards(apps, schema_editor):
+        concurrently = 'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql' else ''
+        schema_editor.execute(f'DROP INDEX {concurrently}IF EXISTS "{name}"')
+
+    return RunPython(forwards, backwards)
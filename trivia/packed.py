@@ -0,0 +1,118 @@
+import struct
+from collections import namedtuple
+from django.conf import settings
+from django.db import transaction
+from trivia import archival
+from trivia.models import PackedAnswers, UserAnswer
+
+# Cada respuesta ocupa 17 bytes: question_id (uint64), option_id (uint64) y si fue correcta (uint8).
+# Los ids son BigAutoField: con 32 bits se desbordarían pasado 2**32
+RECORD = struct.Struct('<QQB')
+
+PackedAnswer = namedtuple('PackedAnswer', ['question_id', 'option_id', 'correct'])
+
+
+def stores_rows():
+    return settings.ANSWER_STORAGE in ('rows', 'both')
+
+
+def stores_packed():
+    return settings.ANSWER_STORAGE in ('packed', 'both')
+
+
+def pack(answers):
+    """``answers``: iterable de (question_id, option_id, correct)."""
+    return b''.join(RECORD.pack(question_id, option_id, bool(correct)) for question_id, option_id, correct in answers)
+
+
+def unpack(data):
+    return [
+        PackedAnswer(question_id, option_id, bool(correct))
+        for question_id, option_id, correct in RECORD.iter_unpack(bytes(data))
+    ]
+
+
+def answered_questions(participation_id):
+    """Ids de las preguntas que ya tienen respuesta en el registro compacto de una participación."""
+    data = PackedAnswers.objects.filter(participation_id=participation_id).values_list('data', flat=True).first()
+    return {question_id for question_id, _, _ in RECORD.iter_unpack(bytes(data))} if data else set()
+
+
+def answered_in(participation, user_id, question_ids):
+    """Cuáles de ``question_ids`` ya se respondieron en la participación: del registro compacto si
+    se guarda, si no de USER_ANSWER. ``None`` si las filas de la trivia se archivaron y no se sabe.
+
+    Para que dos envíos simultáneos no pasen los dos, llamarla con la participación bloqueada.
+    """
+    question_ids = set(question_ids)
+    if stores_packed():
+        return answered_questions(participation.pk) & question_ids
+    answered = set(
+        UserAnswer.objects.filter(
+            user_id=user_id, trivia_id=participation.trivia_id, question_id__in=question_ids,
+        ).values_list('question_id', flat=True)
+    )
+    # Se mira después de las filas porque el archivo y el borrado se confirman juntos
+    if not answered and archival.is_archived(participation.trivia_id):
+        return None
+    return answered
+
+
+def append_answers(participation_id, answers):
+    """Agrega respuestas al registro compacto de una participación (una fila por participación).
+
+    Cada llamada vuelve a escribir el registro entero (Postgres reescribe la fila igual aunque se
+    concatene en SQL), así que responder de a una cuesta O(n²) bytes en total. Está acotado: una
+    pregunta no se responde dos veces en la participación, así que el registro no pasa de 17
+    bytes por pregunta de la trivia (3,4 kB con 200 preguntas). Para cargar muchas respuestas
+    juntas, usar un solo llamado o :func:`append_many`.
+    """
+    data = pack(answers)
+    if not data:
+        return
+    with transaction.atomic():
+        PackedAnswers.objects.get_or_create(participation_id=participation_id)
+        # El bloqueo evita perder respuestas si llegan dos a la vez para la misma participación
+        packed = PackedAnswers.objects.select_for_update().get(participation_id=participation_id)
+        packed.data = bytes(packed.data) + data
+        packed.save(update_fields=['data'])
+
+
+def append_many(answers_by_participation, batch_size=1000):
+    """:func:`append_answers` para muchas participaciones a la vez, con escrituras por lote.
+
+    ``answers_by_participation``: ``{participation_id: [(question_id, option_id, correct), ...]}``.
+    """
+    data = {participation_id: pack(answers) for participation_id, answers in answers_by_participation.items()}
+    data = {participation_id: blob for participation_id, blob in data.items() if blob}
+    if not data:
+        return
+    with transaction.atomic():
+        rows = list(PackedAnswers.objects.select_for_update().filter(participation_id__in=list(data)))
+        for row in rows:
+            row.data = bytes(row.data) + data[row.participation_id]
+        PackedAnswers.objects.bulk_update(rows, ['data'], batch_size=batch_size)
+        existing = {row.participation_id for row in rows}
+        PackedAnswers.objects.bulk_create(
+            [PackedAnswers(participation_id=participation_id, data=blob)
+             for participation_id, blob in data.items() if participation_id not in existing],
+            batch_size=batch_size,
+        )
+
+
+def summarize(data):
+    answered = len(data) // RECORD.size
+    correct = sum(record[2] for record in RECORD.iter_unpack(bytes(data)))
+    return {'answered': answered, 'correct': correct}
+
+
+def question_stats(trivia_id):
+    """Respuestas y aciertos por pregunta de una trivia, leyendo una fila por participación."""
+    stats = {}
+    rows = PackedAnswers.objects.filter(participation__trivia_id=trivia_id).values_list('data', flat=True)
+    for data in rows.iterator(chunk_size=1000):
+        for question_id, _, correct in RECORD.iter_unpack(bytes(data)):
+            entry = stats.setdefault(question_id, {'question': question_id, 'answered': 0, 'correct': 0})
+            entry['answered'] += 1
+            entry['correct'] += correct
+    return sorted(stats.values(), key=lambda entry: entry['question'])
@@ -0,0 +1,8 @@
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    # Paginación por cursor sobre la clave primaria: cada página es un WHERE id > cursor LIMIT n
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,64 @@
+import threading
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from trivia import renderers, revisions
+from trivia.models import Trivia
+from trivia.serializers import PlayerTriviaSerializer
+
+# Un lock por franja de ids: si muchos jugadores abren una trivia sin cache, solo uno la arma
+_build_locks = [threading.Lock() for _ in range(64)]
+
+
+def payload_key(trivia_id, revision):
+    # Con la revisión en la clave no hace falta borrar nada: al cambiar la trivia todos los
+    # procesos pasan a otra clave, aunque cada uno tenga su propia cache
+    return f'trivia:payload:{trivia_id}:{revision}'
+
+
+def current_revision(trivia_id):
+    """Revisión actual de la trivia; lanza ``Trivia.DoesNotExist`` si no existe."""
+    revision = Trivia.objects.filter(pk=trivia_id).values_list('revision', flat=True).first()
+    if revision is None:
+        raise Trivia.DoesNotExist(f'Trivia {trivia_id} does not exist')
+    return revision
+
+
+def build_payload(trivia_id):
+    """JSON ya renderizado de la trivia para jugadores (sin ``is_correct``) y su revisión."""
+    trivia = PlayerTriviaSerializer.setup_eager_loading(Trivia.objects.all()).get(pk=trivia_id)
+    return trivia.revision, renderers.dumps(PlayerTriviaSerializer(trivia).data)
+
+
+def get_payload(trivia_id, revision=None):
+    """``(revision, body)`` desde la cache; se arma una sola vez por revisión.
+
+    ``revision``: la ya leída con :func:`current_revision` en este request, para no volver a
+    consultarla. Lanza ``Trivia.DoesNotExist`` si la trivia no existe.
+    """
+    if revision is None:
+        revision = current_revision(trivia_id)
+    key = payload_key(trivia_id, revision)
+    payload = cache.get(key)
+    if payload is None:
+        with _build_locks[trivia_id % len(_build_locks)]:
+            payload = cache.get(key)
+            if payload is None:
+                payload = build_payload(trivia_id)
+                # Se guarda bajo la revisión que realmente se leyó, que puede ser más nueva
+                cache.set(payload_key(trivia_id, payload[0]), payload, getattr(settings, 'TRIVIA_PAYLOAD_TTL', 3600))
+    return payload
+
+
+def bump_revision(trivia_ids):
+    """Sube la revisión de las trivias; sus payloads anteriores dejan de usarse."""
+    trivia_ids = list(trivia_ids)
+    if not trivia_ids:
+        return
+    Trivia.objects.filter(pk__in=trivia_ids).update(revision=F('revision') + 1, updated_at=timezone.now())
+    revisions.bump(revisions.TRIVIAS)
+
+
+def trivias_with_question(question_id):
+    return Trivia.questions.through.objects.filter(question_id=question_id).values_list('trivia_id', flat=True)
@@ -0,0 +1,173 @@
+import csv
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.db.models import CharField, Q, Value
+from trivia.importers import read_jsonl
+from trivia.models import Entity, Player, User
+from trivia.serializers import UserProvisionSerializer
+
+
+def read_csv(stream):
+    """Columnas ``username``, ``email``, ``name``, ``password`` y opcionalmente ``role``."""
+    for line_number, row in enumerate(csv.DictReader(stream), start=2):
+        yield line_number, {key: value for key, value in row.items() if value not in (None, '')}
+
+
+def _init_worker():
+    # Con "spawn" los procesos hijos arrancan sin Django configurado
+    if not apps.ready:
+        django.setup()
+
+
+def _mp_context():
+    # Nunca "fork": el hijo heredaría los hilos y las conexiones abiertas del servidor
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+def _process_pool(workers):
+    return ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context(), initializer=_init_worker)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    """Pool de procesos del proceso, creado en el primer uso y compartido por todos los requests."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = getattr(settings, 'PROVISIONING_WORKERS', None) or os.cpu_count()
+            _executor = _process_pool(workers)
+        return _executor
+
+
+def provision_users(stream, file_format='jsonl', batch_size=1000, workers=None):
+    """Crea usuarios (y su Entity/Player si son jugadores) en lotes.
+
+    Las contraseñas de cada lote se hashean en paralelo en un pool de procesos y la
+    unicidad de username/email se comprueba con una consulta por lote. Genera un
+    resultado por fila a medida que se procesa cada lote.
+
+    Sin ``workers`` se usa el pool compartido (:func:`executor`); con ``workers`` se crea uno
+    propio para esta carga, como hace el comando ``provision_users --workers``.
+    """
+    rows = read_jsonl(stream) if file_format == 'jsonl' else read_csv(stream)
+    seen_usernames = set()
+    seen_emails = set()
+    if workers:
+        pool_context = _process_pool(workers)
+    else:
+        pool_context = nullcontext(executor())
+    with pool_context as pool:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            yield from _provision_batch(batch, pool, seen_usernames, seen_emails)
+
+
+def _provision_batch(batch, pool, seen_usernames, seen_emails):
+    results = {}
+    valid = []
+    for line_number, row in batch:
+        if isinstance(row, Exception):
+            results[line_number] = {'line': line_number, 'status': 'error', 'errors': str(row)}
+            continue
+        serializer = UserProvisionSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((line_number, serializer.validated_data))
+        else:
+            results[line_number] = {'line': line_number, 'status': 'error', 'errors': serializer.errors}
+
+    usernames = [data['username'] for _, data in valid]
+    emails = [User.objects.normalize_email(data['email']) for _, data in valid]
+    taken_usernames, taken_emails = _taken(usernames, emails)
+    taken_usernames |= seen_usernames
+    taken_emails |= seen_emails
+
+    new = []
+    for (line_number, data), email in zip(valid, emails):
+        errors = {}
+        if data['username'] in taken_usernames:
+            errors['username'] = ["El username ya está registrado"]
+        if email in taken_emails:
+            errors['email'] = ["El email ya está registrado"]
+        if errors:
+            results[line_number] = {'line': line_number, 'status': 'error', 'errors': errors}
+            continue
+        taken_usernames.add(data['username'])
+        taken_emails.add(email)
+        seen_usernames.add(data['username'])
+        seen_emails.add(email)
+        new.append((line_number, data, email))
+
+    if new:
+        passwords = list(pool.map(make_password, [data['password'] for _, data, _ in new], chunksize=64))
+        users = [
+            User(username=data['username'], email=email, name=data['name'], role=data['role'], password=password)
+            for (_, data, email), password in zip(new, passwords)
+        ]
+        created = list(zip(new, users))
+        try:
+            # Un savepoint por lote: si otra carga registró el mismo username o email después de la
+            # consulta, solo se deshace este lote y no la respuesta que ya está en stream
+            with transaction.atomic():
+                _create_users(users)
+        except IntegrityError:
+            created = []
+            for (line_number, data, email), user in zip(new, users):
+                try:
+                    with transaction.atomic():
+                        _create_users([user])
+                except IntegrityError:
+                    results[line_number] = {'line': line_number, 'status': 'error', 'errors': _taken_errors(data['username'], email)}
+                else:
+                    created.append(((line_number, data, email), user))
+        for (line_number, data, _), user in created:
+            results[line_number] = {'line': line_number, 'status': 'created', 'id': str(user.id), 'username': user.username}
+
+    for line_number, _ in batch:
+        yield results[line_number]
+
+
+def _taken(usernames, emails):
+    """Usernames y emails ya usados (por usuarios o entidades), con una sola consulta."""
+    taken = (
+        User.objects.filter(Q(username__in=usernames) | Q(email__in=emails)).values_list('username', 'email')
+        .union(Entity.objects.filter(email__in=emails).values_list(Value('', output_field=CharField()), 'email'))
+    )
+    taken_usernames = set()
+    taken_emails = set()
+    for username, email in taken:
+        taken_usernames.add(username)
+        taken_emails.add(email)
+    return taken_usernames, taken_emails
+
+
+def _taken_errors(username, email):
+    taken_usernames, taken_emails = _taken([username], [email])
+    errors = {}
+    if username in taken_usernames:
+        errors['username'] = ["El username ya está registrado"]
+    if email in taken_emails:
+        errors['email'] = ["El email ya está registrado"]
+    return errors or {'non_field_errors': ["No se pudo registrar el usuario"]}
+
+
+def _create_users(users):
+    """Inserta los usuarios y, para los jugadores, su Entity y Player."""
+    entities = [Entity(user=user, name=user.name, email=user.email) for user in users if user.role == 'player']
+    User.objects.bulk_create(users)
+    Entity.objects.bulk_create(entities)
+    Player.objects.bulk_create([Player(entity=entity, role='player') for entity in entities])
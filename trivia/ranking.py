@@ -0,0 +1,523 @@
+import atexit
+import logging
+import random
+import threading
+import time
+from functools import partial
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, transaction
+from django.db.models import Sum
+from trivia import revisions
+from trivia.models import Participation, TriviaScore, UserScore
+
+logger = logging.getLogger('trivia.ranking')
+
+try:
+    import redis
+except ImportError:  # Redis es opcional, por defecto se usa el motor en memoria
+    redis = None
+
+
+class _Node:
+    __slots__ = ('key', 'forward', 'span')
+
+    def __init__(self, key, level):
+        self.key = key
+        self.forward = [None] * level
+        self.span = [0] * level
+
+
+class SkipList:
+    """Skip list indexable (con spans por nivel, como los zset de Redis).
+
+    Inserción, borrado, rango de una clave y acceso por posición en O(log n).
+    Las posiciones son 1-based.
+    """
+    MAX_LEVEL = 32
+    P = 0.25
+
+    def __init__(self):
+        self.head = _Node(None, self.MAX_LEVEL)
+        self.level = 1
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def _random_level(self):
+        level = 1
+        while level < self.MAX_LEVEL and random.random() < self.P:
+            level += 1
+        return level
+
+    def insert(self, key):
+        update = [None] * self.MAX_LEVEL
+        rank = [0] * self.MAX_LEVEL
+        x = self.head
+        for i in reversed(range(self.level)):
+            rank[i] = 0 if i == self.level - 1 else rank[i + 1]
+            while x.forward[i] is not None and x.forward[i].key < key:
+                rank[i] += x.span[i]
+                x = x.forward[i]
+            update[i] = x
+
+        level = self._random_level()
+        if level > self.level:
+            for i in range(self.level, level):
+                rank[i] = 0
+                update[i] = self.head
+                update[i].span[i] = self.length
+            self.level = level
+
+        node = _Node(key, level)
+        for i in range(level):
+            node.forward[i] = update[i].forward[i]
+            update[i].forward[i] = node
+            node.span[i] = update[i].span[i] - (rank[0] - rank[i])
+            update[i].span[i] = (rank[0] - rank[i]) + 1
+        for i in range(level, self.level):
+            update[i].span[i] += 1
+        self.length += 1
+
+    def remove(self, key):
+        update = [None] * self.MAX_LEVEL
+        x = self.head
+        for i in reversed(range(self.level)):
+            while x.forward[i] is not None and x.forward[i].key < key:
+                x = x.forward[i]
+            update[i] = x
+        x = x.forward[0]
+        if x is None or x.key != key:
+            return False
+
+        for i in range(self.level):
+            if update[i].forward[i] is x:
+                update[i].span[i] += x.span[i] - 1
+                update[i].forward[i] = x.forward[i]
+            else:
+                update[i].span[i] -= 1
+        while self.level > 1 and self.head.forward[self.level - 1] is None:
+            self.level -= 1
+        self.length -= 1
+        return True
+
+    def rank(self, key):
+        traversed = 0
+        x = self.head
+        for i in reversed(range(self.level)):
+            while x.forward[i] is not None and x.forward[i].key <= key:
+                traversed += x.span[i]
+                x = x.forward[i]
+            if x.key == key:
+                return traversed
+        return None
+
+    def range(self, start, stop):
+        """Claves entre las posiciones ``start`` y ``stop`` (ambas incluidas)."""
+        start = max(start, 1)
+        stop = min(stop, self.length)
+        if start > stop:
+            return []
+        traversed = 0
+        x = self.head
+        for i in reversed(range(self.level)):
+            while x.forward[i] is not None and traversed + x.span[i] <= start:
+                traversed += x.span[i]
+                x = x.forward[i]
+        keys = []
+        for _ in range(stop - start + 1):
+            keys.append(x.key)
+            x = x.forward[0]
+        return keys
+
+
+class LocalSortedSet:
+    """Sorted set en memoria: puntaje descendente y, en empate, id de usuario ascendente."""
+
+    def __init__(self):
+        self._scores = {}
+        self._index = SkipList()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._scores)
+
+    def _key(self, member, score):
+        return (-score, member)
+
+    def set(self, member, score):
+        member = str(member)
+        with self._lock:
+            previous = self._scores.get(member)
+            if previous is not None:
+                self._index.remove(self._key(member, previous))
+            self._scores[member] = score
+            self._index.insert(self._key(member, score))
+
+    def incr(self, member, delta):
+        member = str(member)
+        with self._lock:
+            previous = self._scores.get(member)
+            score = (previous or 0) + delta
+            if previous is not None:
+                self._index.remove(self._key(member, previous))
+            self._scores[member] = score
+            self._index.insert(self._key(member, score))
+            return score
+
+    def remove(self, member):
+        member = str(member)
+        with self._lock:
+            previous = self._scores.pop(member, None)
+            if previous is not None:
+                self._index.remove(self._key(member, previous))
+
+    def score(self, member):
+        return self._scores.get(str(member))
+
+    def rank(self, member):
+        member = str(member)
+        with self._lock:
+            score = self._scores.get(member)
+            if score is None:
+                return None
+            return self._index.rank(self._key(member, score))
+
+    def range(self, start, stop):
+        with self._lock:
+            return [(member, -score) for score, member in self._index.range(start, stop)]
+
+
+class RedisSortedSet:
+    """Mismo contrato que ``LocalSortedSet`` sobre un ZSET de Redis."""
+
+    def __init__(self, client, key):
+        self._client = client
+        self._key = key
+
+    def __len__(self):
+        return self._client.zcard(self._key)
+
+    def set(self, member, score):
+        self._client.zadd(self._key, {str(member): score})
+
+    def incr(self, member, delta):
+        return int(self._client.zincrby(self._key, delta, str(member)))
+
+    def remove(self, member):
+        self._client.zrem(self._key, str(member))
+
+    def score(self, member):
+        score = self._client.zscore(self._key, str(member))
+        return None if score is None else int(score)
+
+    def rank(self, member):
+        rank = self._client.zrevrank(self._key, str(member))
+        return None if rank is None else rank + 1
+
+    def range(self, start, stop):
+        start = max(start, 1)
+        if start > stop:
+            return []
+        rows = self._client.zrevrange(self._key, start - 1, stop - 1, withscores=True)
+        return [(member.decode(), int(score)) for member, score in rows]
+
+
+class RankingEngine:
+    """Consultas de ranking sobre un sorted set (global o de una trivia)."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def top(self, k):
+        return self._entries(1, k)
+
+    def rank(self, user_id):
+        return self.store.rank(user_id)
+
+    def around(self, user_id, n):
+        rank = self.store.rank(user_id)
+        if rank is None:
+            return []
+        return self._entries(rank - n, rank + n)
+
+    def _entries(self, start, stop):
+        start = max(start, 1)
+        return [
+            {'rank': position, 'user_id': member, 'score': score}
+            for position, (member, score) in enumerate(self.store.range(start, stop), start=start)
+        ]
+
+
+class RankingRegistry:
+    """Un motor global y uno por trivia.
+
+    Con Redis todos los procesos comparten los mismos ZSET, construidos desde Participation en
+    el primer uso. En memoria cada proceso tiene su copia, cargada desde ``TRIVIA_SCORE`` /
+    ``USER_SCORE`` en la primera consulta: los puntajes que escribe el propio proceso se suman
+    con ``incr`` y se lleva la cuenta de la revisión que eso deja en la base. Como mucho cada
+    ``RANKING_SYNC_SECONDS`` se compara esa revisión con la de la base, y solo si difiere (otro
+    proceso escribió) se vuelve a cargar la copia.
+    """
+
+    GLOBAL = 'global'
+
+    def __init__(self, redis_url=None, sync_seconds=1):
+        if redis_url and redis is None:
+            raise ImproperlyConfigured('RANKING_REDIS_URL requires the redis package (pip install redis)')
+        self._client = redis.Redis.from_url(redis_url) if redis_url else None
+        self.sync_seconds = sync_seconds
+        self._stores = {}
+        self._built = False
+        self._lock = threading.RLock()
+        # nombre -> revisión (epoch, valor) que refleja la copia; None si hay que recargarla
+        self._revisions = {}
+        # nombre -> momento de la última comparación con la base
+        self._checked = {}
+        # nombre -> (inicio, fin) de la última carga; fin es None mientras está en curso
+        self._loads = {}
+        # nombre -> cambios que llegaron durante una carga sin saber si quedaron incluidos
+        self._ambiguous = {}
+        # Trivias con puntajes confirmados cuya revisión todavía no se subió
+        self._pending = set()
+        self._flush_timer = None
+        # nombre -> contador que sube con cada cambio visto en el proceso (ver ``version``)
+        self._versions = {}
+        self._epoch = 0
+
+    @staticmethod
+    def _name(trivia_id):
+        return RankingRegistry.GLOBAL if trivia_id is None else trivia_id
+
+    def _store(self, name):
+        store = self._stores.get(name)
+        if store is None:
+            if self._client is not None:
+                store = RedisSortedSet(self._client, f'talatrivia:ranking:{name}')
+            else:
+                store = LocalSortedSet()
+            self._stores[name] = store
+        return store
+
+    def _ensure_built(self):
+        if self._built:
+            return
+        with self._lock:
+            if self._built:
+                return
+            if not self._client.exists(f'talatrivia:ranking:{self.GLOBAL}'):
+                self._load()
+            self._built = True
+
+    def _load(self):
+        keys = list(self._client.scan_iter('talatrivia:ranking:*'))
+        if keys:
+            self._client.delete(*keys)
+        self._stores = {}
+        totals = (
+            Participation.objects.values('user_id', 'trivia_id')
+            .annotate(total=Sum('score'))
+            .order_by()
+        )
+        user_totals = {}
+        for row in totals.iterator():
+            self._store(row['trivia_id']).set(row['user_id'], row['total'])
+            user_totals[row['user_id']] = user_totals.get(row['user_id'], 0) + row['total']
+        global_store = self._store(self.GLOBAL)
+        for user_id, total in user_totals.items():
+            global_store.set(user_id, total)
+
+    def _touch(self, name):
+        self._versions[name] = self._versions.get(name, 0) + 1
+
+    def _watch(self, trivia_id):
+        """Con Redis los ZSET ya están al día; solo se mira la revisión de la base (como mucho
+        cada ``sync_seconds``) para que ``version`` note lo que escribieron otros procesos."""
+        name = self._name(trivia_id)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked.get(name, -self.sync_seconds) < self.sync_seconds:
+                return
+            self._checked[name] = now
+        revision = revisions.ranking_revision(trivia_id)
+        with self._lock:
+            if self._revisions.get(name) != revision:
+                self._revisions[name] = revision
+                self._touch(name)
+
+    def _sync(self, trivia_id):
+        name = self._name(trivia_id)
+        now = time.monotonic()
+        with self._lock:
+            loaded = name in self._stores and self._revisions.get(name) is not None
+            if loaded and now - self._checked.get(name, 0) < self.sync_seconds:
+                return
+        revision = revisions.ranking_revision(trivia_id)
+        with self._lock:
+            if loaded and self._revisions.get(name) == revision:
+                self._checked[name] = now
+                return
+        self._reload(trivia_id)
+
+    def _reload(self, trivia_id):
+        name = self._name(trivia_id)
+        with self._lock:
+            started = time.monotonic()
+            self._loads[name] = (started, None)
+            ambiguous = self._ambiguous.get(name, 0)
+        # La revisión se lee antes que los puntajes: si cambia en el medio, la próxima
+        # comparación vuelve a cargar
+        revision = revisions.ranking_revision(trivia_id)
+        if trivia_id is None:
+            rows = UserScore.objects.values_list('user_id', 'total_score')
+        else:
+            rows = TriviaScore.objects.filter(trivia_id=trivia_id).values_list('user_id', 'score')
+        store = LocalSortedSet()
+        for user_id, score in rows.iterator():
+            store.set(user_id, score)
+        with self._lock:
+            finished = time.monotonic()
+            self._stores[name] = store
+            self._touch(name)
+            self._loads[name] = (started, finished)
+            self._checked[name] = finished
+            # Un cambio confirmado durante la carga puede estar o no en lo leído: se recarga
+            self._revisions[name] = revision if self._ambiguous.get(name, 0) == ambiguous else None
+
+    def rebuild(self):
+        with self._lock:
+            self._epoch += 1
+            if self._client is not None:
+                self._load()
+                self._built = True
+            else:
+                self._stores = {}
+                self._revisions = {}
+                self._loads = {}
+
+    def engine(self, trivia_id=None):
+        """Motor del ranking global o de una trivia."""
+        if self._client is not None:
+            self._ensure_built()
+            self._watch(trivia_id)
+        else:
+            self._sync(trivia_id)
+        with self._lock:
+            return RankingEngine(self._store(self._name(trivia_id)))
+
+    def version(self, trivia_id=None):
+        """Cambia cada vez que el proceso ve un cambio en el ranking (puntajes propios, recargas
+        o, con Redis, la revisión de la base). Sin consultas: sirve para saber, tras
+        ``engine()``, si vale la pena recalcular el top."""
+        with self._lock:
+            return self._epoch, self._versions.get(self._name(trivia_id), 0)
+
+    def record(self, trivia_id, deltas):
+        """Registra puntajes escritos en la transacción en curso: al confirmarse se suman al
+        ranking y se sube su revisión. ``deltas``: ``{user_id: delta}``."""
+        written_at = time.monotonic()
+        transaction.on_commit(partial(self._committed, trivia_id, deltas, written_at))
+
+    def _committed(self, trivia_id, deltas, written_at):
+        self.apply_score_deltas(trivia_id, deltas, written_at)
+        delay = getattr(settings, 'RANKING_REVISION_DELAY_MS', 500) / 1000
+        with self._lock:
+            self._pending.add(trivia_id)
+            if delay > 0:
+                # Una sola escritura de la revisión por trivia cada ``delay``, no una por respuesta
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(delay, self._on_flush_timer)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+                return
+        self.flush()
+
+    def _on_flush_timer(self):
+        with self._lock:
+            self._flush_timer = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Could not bump ranking revisions')
+            # Se reintenta con el próximo puntaje; lo pendiente se conserva
+        finally:
+            # El hilo del temporizador termina aquí: que no deje conexiones abiertas
+            connections.close_all()
+
+    def flush(self):
+        """Sube, con un solo UPDATE, la revisión del ranking de las trivias con puntajes nuevos."""
+        with self._lock:
+            if self._flush_timer is not None:
+                # Se sube todo ahora: el temporizador ya no tiene nada que hacer
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            pending, self._pending = self._pending, set()
+            if not pending:
+                return
+            names = (*pending, self.GLOBAL)
+            loads = {name: self._loads.get(name) for name in names}
+        try:
+            revisions.bump_now(*(revisions.ranking_name(trivia_id) for trivia_id in pending))
+        except Exception:
+            with self._lock:
+                self._pending |= pending
+            raise
+        with self._lock:
+            for name in names:
+                revision = self._revisions.get(name)
+                if revision is None:
+                    continue
+                if self._loads.get(name) is not loads[name]:
+                    # Una carga leyó la revisión mientras se subía: no se sabe si la incluye
+                    self._revisions[name] = None
+                else:
+                    # Los dos números solo crecen: si nadie más escribió, la base quedó en lo esperado
+                    step = len(pending) if name == self.GLOBAL else 1
+                    self._revisions[name] = (revision[0], revision[1] + step)
+
+    def apply_score_deltas(self, trivia_id, deltas, written_at=None):
+        """Suma los deltas a los motores ya cargados. ``written_at``: ``time.monotonic()`` dentro
+        de la transacción que los escribió, antes de confirmarla."""
+        if self._client is not None:
+            if not self._built:
+                # Otro proceso pudo haberlo construido; una vez que existe no se vuelve a consultar
+                self._built = bool(self._client.exists(f'talatrivia:ranking:{self.GLOBAL}'))
+            if not self._built:
+                # La carga inicial ya leerá el cambio desde la base
+                return
+            with self._lock:
+                for user_id, delta in deltas.items():
+                    self._store(trivia_id).incr(user_id, delta)
+                    self._store(self.GLOBAL).incr(user_id, delta)
+                self._touch(trivia_id)
+                self._touch(self.GLOBAL)
+            return
+
+        committed_at = time.monotonic()
+        with self._lock:
+            for name in (trivia_id, self.GLOBAL):
+                if name not in self._loads:
+                    # Sin cargar: la primera consulta lo leerá de la base
+                    continue
+                started, finished = self._loads[name]
+                if committed_at < started:
+                    # Confirmado antes de empezar la carga: ya está en lo leído
+                    continue
+                if written_at is None or finished is None or written_at <= finished:
+                    # No se sabe si la carga lo leyó: la próxima consulta recarga
+                    self._ambiguous[name] = self._ambiguous.get(name, 0) + 1
+                    self._revisions[name] = None
+                    continue
+                store = self._stores[name]
+                for user_id, delta in deltas.items():
+                    store.incr(user_id, delta)
+                self._touch(name)
+
+
+registry = RankingRegistry(
+    redis_url=getattr(settings, 'RANKING_REDIS_URL', None),
+    sync_seconds=getattr(settings, 'RANKING_SYNC_SECONDS', 1),
+)
+# Que las revisiones pendientes no se pierdan al apagar el proceso
+atexit.register(registry.flush)
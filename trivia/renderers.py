@@ -0,0 +1,33 @@
+import json
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - sin orjson se usa el encoder de la librería estándar
+    orjson = None
+
+# El encoder de DRF sabe convertir lo que orjson no maneja (Decimal, textos lazy, timedelta...)
+_encoder = encoders.JSONEncoder()
+
+
+def dumps(data, indent=False):
+    """Serializa ``data`` a bytes JSON compacto, con orjson si está instalado."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(data, default=_encoder.default, option=option)
+    return json.dumps(
+        data, cls=encoders.JSONEncoder, ensure_ascii=False, allow_nan=False,
+        indent=2 if indent else None, separators=None if indent else (',', ':'),
+    ).encode()
+
+
+class ORJSONRenderer(JSONRenderer):
+    # Mismo media type y formato que el JSONRenderer de DRF; solo cambia el encoder
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        # orjson solo indenta con dos espacios: cualquier indent pedido se respeta así
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        return dumps(data, indent=bool(indent))
@@ -0,0 +1,181 @@
+import contextvars
+import logging
+import random
+import time
+from contextlib import contextmanager
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger('trivia.replicas')
+
+# Solo leen de réplicas las vistas marcadas con @reads; todo lo demás va a la primaria
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+# Estado del request en curso (lo instala ReplicaPinningMiddleware)
+_request_state = contextvars.ContextVar('replica_request_state', default=None)
+
+# En la réplica: segundos desde la última transacción aplicada, o 0 si ya aplicó todo lo recibido
+LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() IS NULL OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class RequestState:
+    __slots__ = ('wrote',)
+
+    def __init__(self):
+        self.wrote = False
+
+
+class LagMonitor:
+    """Retraso de cada réplica, medido como mucho una vez cada ``REPLICA_LAG_CHECK_SECONDS``."""
+
+    def __init__(self):
+        self._observed = {}
+
+    def observe(self, alias, seconds):
+        self._observed[alias] = (time.monotonic(), seconds)
+
+    def measure(self, alias):
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0.0
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                return float(cursor.fetchone()[0])
+        except DatabaseError:
+            # Una réplica caída se trata como infinitamente atrasada hasta la próxima medición
+            logger.warning('Could not measure lag of replica %s', alias, exc_info=True)
+            return float('inf')
+
+    def lag(self, alias):
+        observed = self._observed.get(alias)
+        if observed is None or time.monotonic() - observed[0] >= settings.REPLICA_LAG_CHECK_SECONDS:
+            self.observe(alias, self.measure(alias))
+        return self._observed[alias][1]
+
+    def healthy(self):
+        return [alias for alias in settings.DATABASE_REPLICAS if self.lag(alias) <= settings.REPLICA_MAX_LAG_SECONDS]
+
+
+monitor = LagMonitor()
+
+
+PIN_COOKIE = 'replica_pin'
+PIN_SALT = 'trivia.replicas.pin'
+
+
+def pin(response, user_id):
+    """Manda las lecturas del usuario a la primaria durante ``REPLICA_PIN_SECONDS``.
+
+    La marca viaja en una cookie firmada y no en la cache, así que la respeta cualquier
+    proceso que atienda el próximo request.
+    """
+    response.set_signed_cookie(
+        PIN_COOKIE, str(user_id), salt=PIN_SALT, max_age=settings.REPLICA_PIN_SECONDS,
+        httponly=True, samesite='Lax',
+    )
+
+
+def is_pinned(request, user_id):
+    value = request.get_signed_cookie(PIN_COOKIE, default=None, salt=PIN_SALT, max_age=settings.REPLICA_PIN_SECONDS)
+    return value == str(user_id)
+
+
+@contextmanager
+def use_replicas():
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def reads(method):
+    """Decorador para el ``get`` de una APIView: sus consultas de lectura van a una réplica,
+    salvo que el usuario haya escrito hace menos de ``REPLICA_PIN_SECONDS``."""
+    @wraps(method)
+    def wrapper(view, request, *args, **kwargs):
+        user_id = getattr(request.user, 'id', None)
+        if not settings.DATABASE_REPLICAS or (user_id is not None and is_pinned(request, user_id)):
+            return method(view, request, *args, **kwargs)
+        with use_replicas():
+            return method(view, request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get():
+            return None
+        state = _request_state.get()
+        if state is not None and state.wrote:
+            # Lo que se escribió en este mismo request todavía puede no estar en la réplica
+            return None
+        healthy = monitor.healthy()
+        # None: todas atrasadas o caídas, se lee de la primaria
+        return random.choice(healthy) if healthy else None
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas y primaria tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por replicación
+        return False if db in settings.DATABASE_REPLICAS else None
+
+
+class ReplicaPinningMiddleware:
+    """Si un request autenticado escribió en la base, fija al usuario a la primaria por un rato
+    para que lea lo que acaba de escribir. Funciona en la cadena sync y en la async."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RequestState()
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state.wrote:
+            self.pin_user(request, response)
+        return response
+
+    async def __acall__(self, request):
+        # El estado viaja en el contexto: las vistas sync y el ORM async lo ven desde su hilo
+        state = RequestState()
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state.wrote:
+            # request.user puede ser perezoso y consultar la base
+            await sync_to_async(self.pin_user)(request, response)
+        return response
+
+    def pin_user(self, request, response):
+        # DRF deja en el request el usuario que autenticó con el token
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            pin(response, user.id)
@@ -0,0 +1,129 @@
+import hashlib
+from functools import partial, wraps
+from django.db import transaction
+from django.db.models import F, Max, Q, Sum
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from trivia.models import Revision
+
+QUESTIONS = 'questions'
+TRIVIAS = 'trivias'
+# Nombres visibles de los usuarios (los rankings los muestran)
+USERS = 'users'
+RANKING = 'ranking'
+# Sube al reconstruir el ranking completo, que cambia todas las trivias a la vez
+RANKING_EPOCH = 'ranking-epoch'
+
+
+def ranking_name(trivia_id=None):
+    return RANKING if trivia_id is None else f'{RANKING}:{trivia_id}'
+
+
+def bump(*names):
+    """Incrementa las revisiones al confirmar la transacción (o ya, si no hay una abierta)."""
+    transaction.on_commit(partial(_bump, names))
+
+
+def bump_now(*names):
+    """Incrementa las revisiones ya, fuera de ``on_commit`` (quien llama ya confirmó sus cambios)."""
+    _bump(names)
+
+
+def _bump(names):
+    now = timezone.now()
+    updated = Revision.objects.filter(name__in=names).update(value=F('value') + 1, updated_at=now)
+    if updated < len(names):
+        existing = set(Revision.objects.filter(name__in=names).values_list('name', flat=True))
+        Revision.objects.bulk_create(
+            [Revision(name=name, value=1, updated_at=now) for name in names if name not in existing],
+            ignore_conflicts=True,
+        )
+
+
+def current(*names):
+    """``(token, last_modified)`` de un conjunto de revisiones, con una sola consulta."""
+    rows = {
+        name: (value, updated_at)
+        for name, value, updated_at in Revision.objects.filter(name__in=names).values_list('name', 'value', 'updated_at')
+    }
+    token = ','.join(f'{name}={rows.get(name, (0, None))[0]}' for name in names)
+    last_modified = max((updated_at for _, updated_at in rows.values()), default=None)
+    return token, last_modified
+
+
+def current_ranking(trivia_id=None, *names):
+    """``(token, last_modified)`` del ranking de una trivia, o del global, junto con ``names``.
+
+    El ranking global no tiene fila propia: sería una fila escrita por cada respuesta de
+    cualquier trivia. Su revisión es la suma de las revisiones por trivia, que solo crecen.
+    """
+    names = (RANKING_EPOCH, *names)
+    if trivia_id is not None:
+        return current(ranking_name(trivia_id), *names)
+    per_trivia = Q(name__startswith=f'{RANKING}:')
+    row = Revision.objects.aggregate(
+        total=Sum('value', filter=per_trivia),
+        last_modified=Max('updated_at', filter=per_trivia | Q(name__in=names)),
+        **{f'value{index}': Max('value', filter=Q(name=name)) for index, name in enumerate(names)},
+    )
+    token = ','.join(
+        [f'{RANKING}=*{row["total"] or 0}']
+        + [f'{name}={row[f"value{index}"] or 0}' for index, name in enumerate(names)]
+    )
+    return token, row['last_modified']
+
+
+def ranking_revision(trivia_id=None):
+    """``(epoch, valor)`` del ranking de una trivia, o ``(epoch, suma)`` del global, con una consulta.
+
+    Los dos números solo crecen, así que quien aplicó ``n`` cambios propios sabe qué valor
+    esperar y cualquier diferencia indica cambios de otro proceso.
+    """
+    if trivia_id is not None:
+        rows = dict(
+            Revision.objects.filter(name__in=[RANKING_EPOCH, ranking_name(trivia_id)]).values_list('name', 'value')
+        )
+        return rows.get(RANKING_EPOCH, 0), rows.get(ranking_name(trivia_id), 0)
+    row = Revision.objects.aggregate(
+        epoch=Max('value', filter=Q(name=RANKING_EPOCH)),
+        total=Sum('value', filter=Q(name__startswith=f'{RANKING}:')),
+    )
+    return row['epoch'] or 0, row['total'] or 0
+
+
+def conditional(version):
+    """Decorador para el ``get`` de una APIView: agrega ``ETag``/``Last-Modified`` y responde 304
+    sin ejecutar la vista si el cliente ya tiene la versión actual.
+
+    ``version(request, *args, **kwargs)`` devuelve ``(token, last_modified)`` o ``None`` para
+    responder sin validación (por ejemplo, si el recurso no existe).
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            result = version(request, *args, **kwargs)
+            if result is None:
+                return method(view, request, *args, **kwargs)
+            token, last_modified = result
+            # El formato de respuesta (JSON, API navegable) también define la representación
+            digest = hashlib.sha1(f"{token}|{request.META.get('HTTP_ACCEPT', '')}".encode()).hexdigest()
+            etag = f'"{digest}"'
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = method(view, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                if timestamp is not None:
+                    response['Last-Modified'] = http_date(timestamp)
+                # Que el cliente revalide siempre en vez de usar una copia por heurística
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def revisions(*names):
+    """``version`` para :func:`conditional` a partir de revisiones con nombre fijo."""
+    return lambda request, *args, **kwargs: current(*names)
@@ -0,0 +1,75 @@
+from collections import namedtuple
+from django.conf import settings
+from django.db.models import F
+from trivia import leaderboard
+from trivia.cache import LRUCache
+from trivia.models import AnswerOption, Participation, Question
+
+DIFFICULTY_POINTS = {
+    'easy': 1,
+    'medium': 2,
+    'hard': 3,
+}
+
+AnswerKey = namedtuple('AnswerKey', ['correct_option_ids', 'points', 'trivia_ids'])
+
+
+def load_answer_keys(question_ids):
+    """Opciones correctas, puntaje y trivias de cada pregunta (dos consultas en total)."""
+    question_ids = set(question_ids)
+    points = {}
+    trivias = {}
+    rows = Question.objects.filter(id__in=question_ids).values_list('id', 'difficulty', 'trivia__id')
+    for question_id, difficulty, trivia_id in rows:
+        points[question_id] = DIFFICULTY_POINTS.get(difficulty, 0)
+        trivias.setdefault(question_id, set())
+        if trivia_id is not None:
+            trivias[question_id].add(trivia_id)
+
+    correct = {}
+    options = AnswerOption.objects.filter(question_id__in=list(points), is_correct=True).values_list('question_id', 'id')
+    for question_id, option_id in options:
+        correct.setdefault(question_id, set()).add(option_id)
+
+    return {
+        question_id: AnswerKey(
+            frozenset(correct.get(question_id, ())),
+            points[question_id],
+            frozenset(trivias[question_id]),
+        )
+        for question_id in points
+    }
+
+
+# Las claves de respuesta casi no cambian; se invalidan por señales en trivia.signals
+answer_keys = LRUCache(load_answer_keys, maxsize=getattr(settings, 'ANSWER_KEY_CACHE_SIZE', 10000))
+
+
+def get_answer_keys(question_ids):
+    return answer_keys.get_many(question_ids)
+
+
+def score_answer(key, option_id):
+    if key is None or option_id not in key.correct_option_ids:
+        return 0
+    return key.points
+
+
+def score_answers(answers, keys=None):
+    """Puntaje total de un conjunto de pares ``(question_id, option_id)``."""
+    answers = list(answers)
+    if keys is None:
+        keys = get_answer_keys(question_id for question_id, _ in answers)
+    return sum(score_answer(keys.get(question_id), option_id) for question_id, option_id in answers)
+
+
+def add_participation_score(participation, points):
+    """Suma ``points`` a la participación con un UPDATE atómico y actualiza el ranking.
+
+    El incremento se resuelve en la base (``score = score + n``), así que respuestas
+    concurrentes del mismo jugador no pisan el puntaje de las otras.
+    """
+    if not points:
+        return
+    Participation.objects.filter(pk=participation.pk).update(score=F('score') + points)
+    leaderboard.apply_score_delta(participation.user_id, participation.trivia_id, points)
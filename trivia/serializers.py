@@ -1,6 +1,22 @@
 from rest_framework import serializers
 from trivia.models import AnswerOption, Participation, Player, Question, Trivia, User, Entity, UserAnswer
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from trivia import scoring
+
+
+class EagerLoadingMixin:
+    # Relaciones que el serializer recorre; las vistas las cargan de antemano con setup_eager_loading
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
@@ -34,6 +50,14 @@ class UserCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("El email ya está registrado")
         return value
 
+class UserProvisionSerializer(serializers.Serializer):
+    # Valida una fila de alta masiva; la unicidad se resuelve por lote en trivia.provisioning
+    username = serializers.CharField(max_length=12)
+    email = serializers.EmailField()
+    name = serializers.CharField(max_length=100)
+    password = serializers.CharField(write_only=True)
+    role = serializers.ChoiceField(choices=Player.ROLE_CHOICES, default='player')
+
 class UserListSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -55,7 +79,8 @@ class PlayerCreateSerializer(serializers.ModelSerializer):
         )
         return player
 
-class PlayerListSerializer(serializers.ModelSerializer):
+class PlayerListSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('entity',)
     name = serializers.CharField(source='entity.name')
     email = serializers.EmailField(source='entity.email')
     class Meta:
@@ -68,7 +93,8 @@ class AnswerOptionSerializer(serializers.ModelSerializer):
         model = AnswerOption
         fields = ['id', 'option_text', 'is_correct']
 
-class QuestionCreateSerializer(serializers.ModelSerializer):
+class QuestionCreateSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    prefetch_related_fields = ('options',)
     options = AnswerOptionSerializer(many=True)
 
     class Meta:
@@ -78,8 +104,9 @@ class QuestionCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         options_data = validated_data.pop('options')
         question = Question.objects.create(**validated_data)
-        for option_data in options_data:
-            AnswerOption.objects.create(question=question, **option_data)
+        AnswerOption.objects.bulk_create(
+            [AnswerOption(question=question, **option_data) for option_data in options_data]
+        )
         return question
 
     def validate_question_text(self, value):
@@ -87,26 +114,99 @@ class QuestionCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("La pregunta ya está registrada")
         return value
 
-class QuestionListSerializer(serializers.ModelSerializer):
+class QuestionListSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    prefetch_related_fields = ('options',)
     options = AnswerOptionSerializer(many=True)
 
     class Meta:
         model = Question
         fields = ['id', 'question_text', 'options']
 
+class QuestionImportSerializer(serializers.Serializer):
+    # Valida una fila de importación masiva; los duplicados se resuelven por lote en trivia.importers
+    question_text = serializers.CharField(max_length=255)
+    difficulty = serializers.ChoiceField(choices=Question.DIFFICULTY_CHOICES)
+    options = AnswerOptionSerializer(many=True)
+
+    def validate_options(self, value):
+        if len(value) < 2:
+            raise serializers.ValidationError("La pregunta debe tener al menos dos opciones")
+        if not any(option.get('is_correct') for option in value):
+            raise serializers.ValidationError("La pregunta debe tener al menos una opción correcta")
+        return value
+
 class UserAnswerSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserAnswer
         fields = ['id', 'user', 'question', 'selected_option']
+        # El usuario siempre es el del request
+        read_only_fields = ['user']
+
+    def validate(self, attrs):
+        if attrs['selected_option'].question_id != attrs['question'].id:
+            raise serializers.ValidationError({'selected_option': "La opción no pertenece a la pregunta"})
+        return attrs
+
+class AnswerBatchItemSerializer(serializers.Serializer):
+    question = serializers.IntegerField()
+    selected_option = serializers.IntegerField()
+
+
+class AnswerBatchSerializer(serializers.Serializer):
+    participation = serializers.IntegerField()
+    answers = AnswerBatchItemSerializer(many=True, allow_empty=False, max_length=500)
+
+    def validate(self, attrs):
+        user = self.context['request'].user
+        participation = Participation.objects.filter(pk=attrs['participation'], user_id=user.id).first()
+        if participation is None:
+            raise serializers.ValidationError({'participation': "La participación no existe"})
+
+        answers = attrs['answers']
+        question_ids = [answer['question'] for answer in answers]
+        if len(set(question_ids)) != len(question_ids):
+            raise serializers.ValidationError({'answers': "Hay preguntas repetidas en el lote"})
+
+        # Todas las opciones en una sola consulta; la pertenencia a la trivia sale de la cache de claves
+        option_questions = dict(
+            AnswerOption.objects.filter(id__in=[answer['selected_option'] for answer in answers])
+            .values_list('id', 'question_id')
+        )
+        answer_keys = scoring.get_answer_keys(question_ids)
+        errors = {}
+        for index, answer in enumerate(answers):
+            key = answer_keys.get(answer['question'])
+            if key is None or participation.trivia_id not in key.trivia_ids:
+                errors[index] = "La pregunta no pertenece a la trivia"
+            elif option_questions.get(answer['selected_option']) != answer['question']:
+                errors[index] = "La opción no corresponde a la pregunta"
+        if errors:
+            raise serializers.ValidationError({'answers': errors})
+
+        attrs['participation'] = participation
+        attrs['answer_keys'] = answer_keys
+        return attrs
 
-class ParticipationSerializer(serializers.ModelSerializer):
+class GameCreateSerializer(serializers.Serializer):
+    trivia = serializers.PrimaryKeyRelatedField(queryset=Trivia.objects.all())
+    answer_seconds = serializers.FloatField(required=False, min_value=1, max_value=300)
+    intermission_seconds = serializers.FloatField(required=False, min_value=0, max_value=300)
+
+
+class GameAnswerSerializer(serializers.Serializer):
+    selected_option = serializers.IntegerField()
+
+
+class ParticipationSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('trivia',)
     trivia_name = serializers.CharField(source='trivia.name', read_only=True)
     
     class Meta:
         model = Participation
         fields = ['id', 'user', 'trivia', 'trivia_name', 'score', 'completed']
         
-class TriviaCreateSerializer(serializers.ModelSerializer):
+class TriviaCreateSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    prefetch_related_fields = ('questions__options',)
     questions = QuestionListSerializer(many=True)
 
     class Meta:
@@ -121,7 +221,32 @@ class TriviaCreateSerializer(serializers.ModelSerializer):
             trivia.questions.add(question)
         return trivia
 
-class TriviaListSerializer(serializers.ModelSerializer):
+class PlayerAnswerOptionSerializer(serializers.ModelSerializer):
+    # Sin is_correct: es lo que ve el jugador
+    class Meta:
+        model = AnswerOption
+        fields = ['id', 'option_text']
+
+
+class PlayerQuestionSerializer(serializers.ModelSerializer):
+    options = PlayerAnswerOptionSerializer(many=True)
+
+    class Meta:
+        model = Question
+        fields = ['id', 'question_text', 'difficulty', 'options']
+
+
+class PlayerTriviaSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    prefetch_related_fields = ('questions__options',)
+    questions = PlayerQuestionSerializer(many=True)
+
+    class Meta:
+        model = Trivia
+        fields = ['id', 'name', 'description', 'revision', 'questions']
+
+
+class TriviaListSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    prefetch_related_fields = ('questions__options',)
     questions = QuestionListSerializer(many=True)
 
     class Meta:
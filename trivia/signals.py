@@ -0,0 +1,144 @@
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from trivia import authentication, dbpool, leaderboard, payloads, revisions, scoring
+from trivia.models import AnswerOption, Participation, Question, Trivia, User
+
+
+def _locked_participation_state(instance, using):
+    # La fila tal como está en la base, bloqueada: el valor cargado en la instancia puede ser
+    # viejo si otro request sumó puntos después (scoring.add_participation_score)
+    return (
+        Participation.objects.using(using).select_for_update()
+        .filter(pk=instance.pk).values_list('user_id', 'trivia_id', 'score').first()
+    )
+
+
+@receiver(pre_save, sender=Participation)
+def lock_saved_participation(sender, instance, using, **kwargs):
+    # Participation.save corre en una transacción, así que el bloqueo dura hasta post_save
+    adding = instance._state.adding or instance.pk is None
+    instance._leaderboard_state = None if adding else _locked_participation_state(instance, using)
+
+
+@receiver(post_save, sender=Participation)
+def update_leaderboard_on_save(sender, instance, created, update_fields=None, **kwargs):
+    previous, instance._leaderboard_state = instance._leaderboard_state, None
+    if created or previous is None:
+        leaderboard.apply_score_delta(instance.user_id, instance.trivia_id, instance.score)
+        return
+    user_id, trivia_id, score = previous
+    # Con update_fields, lo que no se escribió sigue como estaba en la base
+    written = update_fields or {'user', 'trivia', 'score'}
+    new_user_id = instance.user_id if written & {'user', 'user_id'} else user_id
+    new_trivia_id = instance.trivia_id if written & {'trivia', 'trivia_id'} else trivia_id
+    new_score = instance.score if 'score' in written else score
+    if (user_id, trivia_id) != (new_user_id, new_trivia_id):
+        leaderboard.apply_score_delta(user_id, trivia_id, -score)
+        leaderboard.apply_score_delta(new_user_id, new_trivia_id, new_score)
+    else:
+        leaderboard.apply_score_delta(user_id, trivia_id, new_score - score)
+
+
+@receiver(pre_delete, sender=Participation)
+def lock_deleted_participation(sender, instance, using, **kwargs):
+    # El borrado ya corre en una transacción (Collector.delete)
+    instance._leaderboard_state = _locked_participation_state(instance, using)
+
+
+@receiver(post_delete, sender=Participation)
+def update_leaderboard_on_delete(sender, instance, **kwargs):
+    previous, instance._leaderboard_state = instance._leaderboard_state, None
+    if previous is not None:
+        user_id, trivia_id, score = previous
+        leaderboard.apply_score_delta(user_id, trivia_id, -score)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_answer_key(sender, instance, **kwargs):
+    scoring.answer_keys.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=AnswerOption)
+@receiver(post_delete, sender=AnswerOption)
+def invalidate_option_answer_key(sender, instance, **kwargs):
+    scoring.answer_keys.invalidate(instance.question_id)
+
+
+@receiver(m2m_changed, sender=Trivia.questions.through)
+def invalidate_trivia_answer_keys(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        scoring.answer_keys.invalidate(*(pk_set if not reverse else [instance.pk]))
+    elif action == 'post_clear':
+        # En un clear no llegan los ids afectados
+        scoring.answer_keys.clear()
+
+
+@receiver(post_delete, sender=Trivia)
+def invalidate_deleted_trivia_answer_keys(sender, instance, **kwargs):
+    # El borrado en cascada de la tabla intermedia no emite m2m_changed
+    scoring.answer_keys.clear()
+
+
+@receiver(post_save, sender=Trivia)
+def bump_saved_trivia_revision(sender, instance, created, **kwargs):
+    if created:
+        revisions.bump(revisions.TRIVIAS)
+    else:
+        payloads.bump_revision([instance.pk])
+
+
+@receiver(post_delete, sender=Trivia)
+def bump_deleted_trivia_revision(sender, instance, **kwargs):
+    revisions.bump(revisions.TRIVIAS)
+
+
+@receiver(post_save, sender=Question)
+@receiver(pre_delete, sender=Question)
+def bump_question_trivias_revision(sender, instance, **kwargs):
+    # pre_delete: después del borrado ya no quedan filas en la tabla intermedia
+    payloads.bump_revision(payloads.trivias_with_question(instance.pk))
+    revisions.bump(revisions.QUESTIONS)
+
+
+@receiver(post_save, sender=AnswerOption)
+@receiver(post_delete, sender=AnswerOption)
+def bump_option_trivias_revision(sender, instance, **kwargs):
+    payloads.bump_revision(payloads.trivias_with_question(instance.question_id))
+    revisions.bump(revisions.QUESTIONS)
+
+
+@receiver(m2m_changed, sender=Trivia.questions.through)
+def bump_trivia_questions_revision(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        payloads.bump_revision([instance.pk])
+    elif reverse and action in ('post_add', 'post_remove'):
+        payloads.bump_revision(pk_set)
+    elif reverse and action == 'pre_clear':
+        payloads.bump_revision(payloads.trivias_with_question(instance.pk))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_active_cache(sender, instance, **kwargs):
+    cache.delete(authentication.active_cache_key(instance.pk))
+
+
+@receiver(post_save, sender=User)
+def bump_saved_user_revision(sender, instance, created, update_fields=None, **kwargs):
+    # Un usuario nuevo todavía no aparece en ningún ranking; un login o cambio de clave no cambia lo que se muestra
+    if created or (update_fields and set(update_fields) <= {'last_login', 'password'}):
+        return
+    revisions.bump(revisions.USERS)
+
+
+@receiver(post_delete, sender=User)
+def bump_deleted_user_revision(sender, instance, **kwargs):
+    revisions.bump(revisions.USERS)
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    dbpool.connection_opened(connection.alias)
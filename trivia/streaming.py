@@ -0,0 +1,48 @@
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from trivia import renderers
+
+
+def requested(request):
+    return request.query_params.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def iter_json_array(queryset, serializer_class, chunk_size):
+    """Un arreglo JSON armado por tandas de ``chunk_size`` filas.
+
+    ``iterator()`` lee con un cursor del lado del servidor en Postgres, así que en memoria
+    solo hay una tanda a la vez, sin importar cuántas filas tenga el resultado.
+    """
+    yield b'['
+    rows = queryset.iterator(chunk_size=chunk_size)
+    separator = b''
+    while batch := list(islice(rows, chunk_size)):
+        # Se quitan los corchetes del arreglo de la tanda para pegarla al anterior
+        yield separator + renderers.dumps(serializer_class(batch, many=True).data)[1:-1]
+        separator = b','
+    yield b']'
+
+
+async def aiter_json_array(queryset, serializer_class, chunk_size):
+    """:func:`iter_json_array` para ASGI, que con un iterador sync junta todo el cuerpo antes de
+    enviarlo. Cada tanda se arma con ``sync_to_async`` en el hilo de las vistas sync, el mismo
+    siempre, porque el cursor del lado del servidor pertenece a su conexión."""
+    chunks = iter_json_array(queryset, serializer_class, chunk_size)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    def __init__(self, queryset, serializer_class, chunk_size=None, **kwargs):
+        chunk_size = chunk_size or settings.STREAM_CHUNK_SIZE
+        if hasattr(serializer_class, 'setup_eager_loading'):
+            queryset = serializer_class.setup_eager_loading(queryset)
+        # El cuerpo se genera después de que la vista retorna: la base (réplica o primaria) se fija ahora
+        queryset = queryset.using(queryset.db)
+        chunks = aiter_json_array if settings.DJANGO_ASGI else iter_json_array
+        super().__init__(
+            chunks(queryset, serializer_class, chunk_size), content_type='application/json', **kwargs
+        )
@@ -1,3 +1,938 @@
-from django.test import TestCase
+import io
+import json
+import re
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from unittest import mock, skipUnless
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, router
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from trivia import archival, benchmarks, dbpool, games, importers, leaderboard, live, packed, payloads, provisioning, ranking, replicas, revisions, scoring, views
+from trivia.authentication import StatelessJWTAuthentication
+from trivia.middleware import RequestInstrumentationMiddleware
+from trivia.models import AnswerOption, Participation, Question, Revision, Trivia, TriviaScore, User, UserAnswer, UserScore
 
-# Create your tests here.
+
+class QueryBudgetMixin:
+    """Helpers para comprobar que un endpoint no hace más consultas a medida que crece el resultado."""
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(context.captured_queries)
+
+    def assertQueryBudget(self, url, grow, budget):
+        """Llama a ``url``, ejecuta ``grow()`` y vuelve a llamarla: el número de consultas no debe cambiar."""
+        before = self.count_queries(url)
+        grow()
+        after = self.count_queries(url)
+        self.assertEqual(before, after, f'{url} went from {before} to {after} queries after growing the data')
+        self.assertLessEqual(after, budget, f'{url} made {after} queries, budget is {budget}')
+
+
+def create_questions(count, options=4):
+    offset = Question.objects.count()
+    questions = Question.objects.bulk_create(
+        [Question(question_text=f'Question {offset + i}', difficulty='easy') for i in range(count)]
+    )
+    AnswerOption.objects.bulk_create([
+        AnswerOption(question=question, option_text=f'Option {j}', is_correct=(j == 0))
+        for question in questions
+        for j in range(options)
+    ])
+    return questions
+
+
+def create_trivias(count, questions_per_trivia):
+    for i in range(count):
+        trivia = Trivia.objects.create(name=f'Trivia {i}', description='')
+        trivia.questions.set(create_questions(questions_per_trivia))
+
+
+class TriviaQuestionQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpassword', name='Admin'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_trivia_list(self):
+        create_trivias(2, 2)
+        self.assertQueryBudget('/api/trivias/?page_size=500', lambda: create_trivias(10, 5), budget=4)
+
+    def test_trivia_detail(self):
+        create_trivias(1, 2)
+        trivia = Trivia.objects.get()
+        # El presupuesto incluye la consulta de la revisión usada para el ETag
+        self.assertQueryBudget(
+            f'/api/trivias/{trivia.pk}/', lambda: trivia.questions.add(*create_questions(20)), budget=4
+        )
+
+    def test_question_list(self):
+        create_questions(2)
+        self.assertQueryBudget('/api/questions/?page_size=500', lambda: create_questions(50), budget=3)
+
+    def test_question_detail(self):
+        question = create_questions(1, options=2)[0]
+        AnswerOption.objects.bulk_create([AnswerOption(question=question, option_text='more') for _ in range(10)])
+        self.assertLessEqual(self.count_queries(f'/api/questions/{question.pk}/'), 2)
+
+
+class StreamingListTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpassword', name='Admin'
+        )
+        User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com', name=f'User {i}') for i in range(6)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    @override_settings(STREAM_CHUNK_SIZE=2)
+    def test_streamed_list_matches_paginated_list(self):
+        response = self.client.get('/api/users/?stream=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        streamed = json.loads(b''.join(response.streaming_content))
+        paginated = self.client.get('/api/users/?page_size=500').json()['results']
+        self.assertEqual(streamed, paginated)
+
+    @override_settings(STREAM_CHUNK_SIZE=2, DJANGO_ASGI=True)
+    async def test_streamed_list_is_async_under_asgi(self):
+        admin = await User.objects.aget(username='admin')
+        token = await sync_to_async(lambda: str(AccessToken.for_user(admin)))()
+        response = await AsyncClient().get('/api/users/?stream=1', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        # Una tanda por chunk: el cuerpo no se junta antes de enviarlo
+        self.assertGreater(len(chunks), 3)
+        self.assertEqual(len(json.loads(b''.join(chunks))), 7)
+
+
+class TriviaPayloadTests(TestCase):
+    def test_save_keeps_concurrent_revision_bump(self):
+        trivia = Trivia.objects.create(name='Trivia', description='')
+        stale = Trivia.objects.get(pk=trivia.pk)
+        payloads.bump_revision([trivia.pk])
+        stale.name = 'Renamed'
+        stale.save()
+        # El bump concurrente y el del propio save
+        self.assertEqual(Trivia.objects.get(pk=trivia.pk).revision, 3)
+
+    def test_payload_is_keyed_by_revision(self):
+        trivia = Trivia.objects.create(name='Trivia', description='')
+        self.assertEqual(payloads.get_payload(trivia.pk)[0], 1)
+        # Sin borrar la cache: la nueva revisión se lee de la base y usa otra clave
+        Trivia.objects.filter(pk=trivia.pk).update(name='Renamed', revision=2)
+        revision, body = payloads.get_payload(trivia.pk)
+        self.assertEqual(revision, 2)
+        self.assertEqual(json.loads(body)['name'], 'Renamed')
+
+    def test_play_reads_the_revision_once(self):
+        trivia = Trivia.objects.create(name='Trivia', description='')
+        trivia.questions.set(create_questions(2))
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create(username='player', email='player@example.com', name='Player'))
+        etag = client.get(f'/api/trivias/{trivia.pk}/play/')['ETag']
+        # Con el JSON en cache, la revisión es la única consulta: da el ETag y la clave
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(f'/api/trivias/{trivia.pk}/play/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(context.captured_queries), 1)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(f'/api/trivias/{trivia.pk}/play/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(context.captured_queries), 1)
+
+
+@override_settings(RANKING_REVISION_DELAY_MS=0)
+class RankingETagTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='player', email='player@example.com', password='password', name='Player')
+        self.trivia = Trivia.objects.create(name='Trivia', description='')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_etag_follows_scores_and_names(self):
+        urls = [f'/api/rankings/{self.trivia.id}/', '/api/rankings/']
+        before = [self.etag(url) for url in urls]
+        with self.captureOnCommitCallbacks(execute=True):
+            leaderboard.apply_score_delta(self.user.id, self.trivia.id, 3)
+        # Las respuestas solo escriben la revisión de su trivia, no una fila global
+        self.assertFalse(Revision.objects.filter(name=revisions.RANKING).exists())
+        after_score = [self.etag(url) for url in urls]
+        self.assertTrue(all(a != b for a, b in zip(before, after_score)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.name = 'Renamed'
+            self.user.save()
+        after_user = [self.etag(url) for url in urls]
+        self.assertTrue(all(a != b for a, b in zip(after_score, after_user)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trivia.name = 'Renamed'
+            self.trivia.save()
+        self.assertTrue(all(a != b for a, b in zip(after_user, [self.etag(url) for url in urls])))
+
+
+@override_settings(RANKING_REVISION_DELAY_MS=0)
+class AnswerBatchTests(TestCase):
+    def test_repeated_batch_is_rejected(self):
+        user = User.objects.create_user(
+            username='player', email='player@example.com', password='password', name='Player', role='player'
+        )
+        trivia = Trivia.objects.create(name='Trivia', description='')
+        questions = create_questions(2)
+        trivia.questions.set(questions)
+        participation = Participation.objects.create(user=user, trivia=trivia)
+        client = APIClient()
+        client.force_authenticate(user=user)
+        answers = [
+            {'question': question.id, 'selected_option': question.options.get(is_correct=True).id}
+            for question in questions
+        ]
+        for storage in ('rows', 'packed'):
+            with self.subTest(storage=storage), override_settings(ANSWER_STORAGE=storage):
+                Participation.objects.filter(pk=participation.pk).update(score=0)
+                body = {'participation': participation.id, 'answers': answers}
+                response = client.post('/api/answers/batch/', body, format='json')
+                self.assertEqual(response.status_code, 201, response.content)
+                # Reintentar el mismo lote no vuelve a sumar puntos
+                response = client.post('/api/answers/batch/', body, format='json')
+                self.assertEqual(response.status_code, 409)
+                self.assertEqual(set(response.json()['answers']), {'0', '1'})
+                self.assertEqual(Participation.objects.get(pk=participation.pk).score, 2)
+
+    @override_settings(ANSWER_STORAGE='rows')
+    def test_archived_trivia_rejects_answers(self):
+        user = User.objects.create_user(
+            username='player', email='player@example.com', password='password', name='Player', role='player'
+        )
+        trivia = Trivia.objects.create(name='Trivia', description='')
+        question = create_questions(1)[0]
+        trivia.questions.set([question])
+        participation = Participation.objects.create(user=user, trivia=trivia)
+        client = APIClient()
+        client.force_authenticate(user=user)
+        body = {'participation': participation.id, 'answers': [
+            {'question': question.id, 'selected_option': question.options.get(is_correct=True).id},
+        ]}
+        self.assertEqual(client.post('/api/answers/batch/', body, format='json').status_code, 201)
+        with tempfile.TemporaryDirectory() as directory:
+            archive = archival.archive_trivia(trivia.id, directory)
+            # Las filas ya no están: sin el rechazo, el mismo lote volvería a sumar puntos
+            self.assertFalse(UserAnswer.objects.filter(trivia=trivia).exists())
+            self.assertEqual(client.post('/api/answers/batch/', body, format='json').status_code, 409)
+            archival.restore_archive(archive)
+        self.assertEqual(client.post('/api/answers/batch/', body, format='json').status_code, 409)
+        self.assertEqual(Participation.objects.get(pk=participation.pk).score, 1)
+
+
+@override_settings(RANKING_REVISION_DELAY_MS=0)
+class ParticipationSignalTests(TestCase):
+    def test_saved_score_delta_uses_the_stored_row(self):
+        user = User.objects.create(username='player', email='player@example.com', name='Player')
+        trivia = Trivia.objects.create(name='Trivia', description='')
+        participation = Participation.objects.create(user=user, trivia=trivia)
+        # Otro request suma puntos con un UPDATE: la instancia cargada queda con el puntaje viejo
+        scoring.add_participation_score(Participation.objects.get(pk=participation.pk), 3)
+        participation.completed = True
+        participation.save(update_fields=['completed'])
+        self.assertEqual(TriviaScore.objects.get(user=user, trivia=trivia).score, 3)
+        participation.score = 10
+        participation.save()
+        self.assertEqual(TriviaScore.objects.get(user=user, trivia=trivia).score, 10)
+        self.assertEqual(UserScore.objects.get(user=user).total_score, 10)
+        Participation.objects.filter(pk=participation.pk).update(score=F('score') + 2)
+        leaderboard.apply_score_delta(user.id, trivia.id, 2)
+        participation.delete()
+        self.assertEqual(TriviaScore.objects.get(user=user, trivia=trivia).score, 0)
+
+
+class QuestionImportTests(TestCase):
+    def test_csv_options_keep_their_column_number(self):
+        stream = io.StringIO(
+            'question_text,difficulty,option_1,option_2,option_3,correct\r\n'
+            'First,easy,A,,"C\r\nsecond line",3\r\n'
+            'Second,easy,A,B,C,\r\n',
+            newline='',
+        )
+        summary = importers.import_questions(stream, 'csv')
+        self.assertEqual(summary['created'], 1)
+        self.assertEqual([error['line'] for error in summary['errors']], [4])
+        options = AnswerOption.objects.filter(question__question_text='First').order_by('id')
+        # La columna vacía no corre la opción correcta a otra
+        self.assertEqual([(option.option_text, option.is_correct) for option in options], [
+            ('A', False), ('C\r\nsecond line', True),
+        ])
+
+
+class ProvisioningTests(TestCase):
+    def test_rows_taken_by_a_concurrent_upload_are_reported(self):
+        User.objects.create(username='taken', email='taken@example.com', name='Taken')
+        batch = [
+            (line, {'username': username, 'email': f'{username}@example.com', 'name': 'Player', 'password': 'pw12345678'})
+            for line, username in ((2, 'first'), (3, 'taken'), (4, 'second'))
+        ]
+        # Otra carga registró "taken" entre la consulta de usados y el insert del lote
+        taken = provisioning._taken
+        checks = iter([lambda usernames, emails: (set(), set())])
+        with mock.patch.object(provisioning, '_taken', lambda *args: next(checks, taken)(*args)), ThreadPoolExecutor(2) as pool:
+            results = list(provisioning._provision_batch(batch, pool, set(), set()))
+        self.assertEqual([result['status'] for result in results], ['created', 'error', 'created'])
+        self.assertEqual(set(results[1]['errors']), {'username', 'email'})
+        self.assertEqual(User.objects.filter(username__in=['first', 'second']).count(), 2)
+
+    def test_pool_never_forks(self):
+        self.assertIn(provisioning._mp_context().get_start_method(), ('forkserver', 'spawn'))
+
+
+class ParticipationViewTests(TestCase):
+    def setUp(self):
+        # Los ids se reutilizan entre tests: que no queden claves de preguntas de otro test
+        scoring.answer_keys.clear()
+
+    def post(self, trivia, user, body):
+        request = RequestFactory().post('/', body, content_type='application/json')
+        return views.ParticipationView.as_view()(request, trivia_id=trivia.id, user_id=user.id)
+
+    def test_only_questions_of_the_trivia_are_scored(self):
+        user = User.objects.create(username='player', email='player@example.com', name='Player')
+        trivia = Trivia.objects.create(name='Trivia', description='')
+        question, foreign = create_questions(2)
+        trivia.questions.set([question])
+        self.assertEqual(self.post(trivia, user, b'{not json').status_code, 400)
+
+        correct = {str(q.id): q.options.get(is_correct=True).id for q in (question, foreign)}
+        response = self.post(trivia, user, {'answers': correct})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content)['questions'], [foreign.id])
+
+        response = self.post(trivia, user, {'answers': {str(question.id): correct[str(question.id)]}})
+        self.assertEqual(json.loads(response.content), {'score': 1})
+
+
+@override_settings(RANKING_REVISION_DELAY_MS=0)
+class AnswerCreateTests(TestCase):
+    def test_answer_is_validated_and_not_repeated(self):
+        user = User.objects.create_user(
+            username='player', email='player@example.com', password='password', name='Player', role='player'
+        )
+        token = APIClient().post('/api/token/', {'username': 'player', 'password': 'password'}, format='json').data['access']
+        for path in ('/api/answers/', '/api/async/answers/'):
+            with self.subTest(path=path):
+                trivia = Trivia.objects.create(name=path, description='')
+                question, other = create_questions(2)
+                trivia.questions.set([question, other])
+
+                def answer(option):
+                    return self.client.post(
+                        path, {'question': question.id, 'selected_option': option.id},
+                        content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {token}',
+                    )
+
+                correct = question.options.get(is_correct=True)
+                self.assertEqual(answer(correct).status_code, 400)
+                participation = Participation.objects.create(user=user, trivia=trivia)
+                response = answer(other.options.get(is_correct=True))
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('selected_option', response.json())
+                self.assertEqual(answer(correct).status_code, 201)
+                # Responder otra vez la misma pregunta no vuelve a sumar puntos
+                self.assertEqual(answer(correct).status_code, 409)
+                self.assertEqual(Participation.objects.get(pk=participation.pk).score, 1)
+
+
+@override_settings(RANKING_REVISION_DELAY_MS=0)
+class PackedAnswerTests(TestCase):
+    def test_records_fit_big_ids(self):
+        answers = [(2 ** 40, 2 ** 33 + 1, True), (1, 2, False)]
+        self.assertEqual(packed.unpack(packed.pack(answers)), [packed.PackedAnswer(*answer) for answer in answers])
+
+    @override_settings(ANSWER_STORAGE='packed')
+    def test_packed_only_answer_returns_participation(self):
+        user = User.objects.create_user(username='player', email='player@example.com', password='password', name='Player')
+        trivia = Trivia.objects.create(name='Trivia', description='')
+        question = create_questions(1)[0]
+        trivia.questions.set([question])
+        participation = Participation.objects.create(user=user, trivia=trivia)
+        client = APIClient()
+        client.force_authenticate(user=user)
+        option = question.options.get(is_correct=True).id
+        response = client.post('/api/answers/', {'question': question.id, 'selected_option': option}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['participation'], participation.id)
+        self.assertNotIn('id', response.json())
+        self.assertEqual(packed.answered_questions(participation.id), {question.id})
+
+
+@override_settings(RANKING_REVISION_DELAY_MS=0)
+class RankingRegistryTests(TestCase):
+    def test_local_engine_applies_own_writes_and_reloads_foreign_ones(self):
+        users = User.objects.bulk_create([
+            User(username=f'ranked{i}', email=f'ranked{i}@example.com', name='Player') for i in range(2)
+        ])
+        trivia = Trivia.objects.create(name='Trivia', description='')
+        registry = ranking.RankingRegistry(sync_seconds=0)
+        with mock.patch.object(ranking, 'registry', registry):
+            with self.captureOnCommitCallbacks(execute=True):
+                leaderboard.apply_score_delta(users[0].id, trivia.id, 2)
+            self.assertEqual(registry.engine(trivia.id).rank(users[0].id), 1)
+            with self.captureOnCommitCallbacks(execute=True):
+                leaderboard.apply_score_delta(users[0].id, trivia.id, 1)
+            # Lo que escribe este proceso se suma en memoria: solo se compara la revisión
+            with CaptureQueriesContext(connection) as context:
+                top = registry.engine(trivia.id).top(2)
+            self.assertEqual(len(context.captured_queries), 1)
+            self.assertEqual([entry['score'] for entry in top], [3])
+
+        # Otro proceso suma puntos: este registro no recibe el delta, solo ve la revisión nueva
+        with self.captureOnCommitCallbacks(execute=True):
+            TriviaScore.objects.create(user=users[1], trivia=trivia, score=5)
+            UserScore.objects.create(user=users[1], total_score=5)
+            revisions.bump(revisions.ranking_name(trivia.id))
+        for engine in (registry.engine(trivia.id), registry.engine()):
+            self.assertEqual([entry['score'] for entry in engine.top(2)], [5, 3])
+
+    @override_settings(RANKING_REVISION_DELAY_MS=500)
+    def test_revision_bumps_are_coalesced(self):
+        user = User.objects.create(username='ranked', email='ranked@example.com', name='Player')
+        trivia = Trivia.objects.create(name='Trivia', description='')
+        name = revisions.ranking_name(trivia.id)
+        registry = ranking.RankingRegistry(sync_seconds=0)
+        with mock.patch.object(ranking, 'registry', registry), mock.patch.object(ranking.threading, 'Timer') as timer:
+            for _ in range(3):
+                with self.captureOnCommitCallbacks(execute=True):
+                    leaderboard.apply_score_delta(user.id, trivia.id, 1)
+            # Las respuestas no tocan la revisión: queda un solo temporizador pendiente
+            self.assertEqual(timer.call_count, 1)
+            self.assertFalse(Revision.objects.filter(name=name).exists())
+            with CaptureQueriesContext(connection) as context:
+                registry.flush()
+        self.assertEqual(Revision.objects.get(name=name).value, 1)
+        self.assertEqual(sum(query['sql'].startswith('UPDATE') for query in context.captured_queries), 1)
+
+    async def test_live_channel_only_recomputes_when_the_registry_changes(self):
+        user = await User.objects.acreate(username='live', email='live@example.com', name='Player')
+        trivia = await Trivia.objects.acreate(name='Trivia', description='')
+        registry = ranking.RankingRegistry(sync_seconds=60)
+        channel = live.LeaderboardChannel(live.LeaderboardHub(), trivia.id, 10)
+        with mock.patch.object(ranking, 'registry', registry):
+            await channel.refresh()
+            # Sin cambios un tick no consulta la base ni recarga el ranking
+            with mock.patch.object(registry, '_reload') as reload, mock.patch.object(revisions, 'ranking_revision') as read:
+                self.assertIsNone(await channel.refresh())
+            reload.assert_not_called()
+            read.assert_not_called()
+            registry.apply_score_deltas(trivia.id, {user.id: 4}, time.monotonic())
+            delta = await channel.refresh()
+        self.assertEqual([entry['score'] for entry in delta['changed']], [4])
+        self.assertEqual(delta['changed'][0]['user'], 'live')
+
+    def test_redis_url_without_package_is_a_configuration_error(self):
+        with mock.patch.object(ranking, 'redis', None), self.assertRaises(ImproperlyConfigured):
+            ranking.RankingRegistry(redis_url='redis://localhost:6379/0')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_MAX_LAG_SECONDS=2, REPLICA_LAG_CHECK_SECONDS=60)
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        replicas.monitor.observe('replica', 0.0)
+
+    def test_only_marked_reads_go_to_replica(self):
+        self.assertEqual(router.db_for_read(Trivia), 'default')
+        with replicas.use_replicas():
+            self.assertEqual(router.db_for_read(Trivia), 'replica')
+            self.assertEqual(router.db_for_write(Trivia), 'default')
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        replicas.monitor.observe('replica', 5.0)
+        with replicas.use_replicas():
+            self.assertEqual(router.db_for_read(Trivia), 'default')
+
+    def test_writes_pin_reads_to_primary(self):
+        user = User.objects.create_user(username='player', email='player@example.com', password='password', name='Player')
+        client = APIClient()
+        client.force_authenticate(user=user)
+        trivia = Trivia.objects.create(name='Trivia', description='')
+        response = client.post('/api/participations/', {'user': str(user.id), 'trivia': trivia.id}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        # La marca viaja en una cookie firmada, válida en cualquier proceso y solo para ese usuario
+        request = RequestFactory().get('/')
+        request.COOKIES[replicas.PIN_COOKIE] = response.cookies[replicas.PIN_COOKIE].value
+        self.assertTrue(replicas.is_pinned(request, user.id))
+        self.assertFalse(replicas.is_pinned(request, uuid.uuid4()))
+        self.assertFalse(replicas.is_pinned(RequestFactory().get('/'), user.id))
+
+
+@override_settings(RANKING_REVISION_DELAY_MS=0)
+class LiveGameTests(TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.registry = games.GameRegistry(clock=lambda: self.now, timers=False)
+
+    def play_round(self, players):
+        trivia = Trivia.objects.create(name=f'Live {players}', description='')
+        trivia.questions.set(create_questions(2))
+        users = User.objects.bulk_create([
+            User(username=f'live{players}-{i}', email=f'live{players}-{i}@example.com', name='Player')
+            for i in range(players)
+        ])
+        game = self.registry.create(trivia, answer_seconds=10, intermission_seconds=5)
+        for user in users:
+            game.join(user.id)
+        self.registry.start(game)
+        question = game.round.question_id
+        correct = AnswerOption.objects.get(question_id=question, is_correct=True).id
+        wrong = AnswerOption.objects.filter(question_id=question, is_correct=False).first().id
+        for i, user in enumerate(users):
+            game.submit(user.id, correct if i % 2 == 0 else wrong, self.now)
+        # Las respuestas se puntúan en memoria; nada se escribe hasta que cierra la ronda
+        self.assertFalse(UserAnswer.objects.filter(trivia=trivia).exists())
+
+        self.now += 10
+        with self.assertRaises(games.GameError):
+            game.submit(users[0].id, correct, self.now)
+        with CaptureQueriesContext(connection) as context:
+            self.registry.tick(game)
+        self.assertEqual(game.status, games.INTERMISSION)
+        self.assertEqual(UserAnswer.objects.filter(trivia=trivia).count(), players)
+        winners = (players + 1) // 2
+        self.assertEqual(Participation.objects.filter(trivia=trivia, score=1).count(), winners)
+        self.assertEqual(TriviaScore.objects.filter(trivia=trivia, score=1).count(), winners)
+        return len(context.captured_queries)
+
+    def test_round_is_saved_in_bulk_when_it_closes(self):
+        self.assertEqual(self.play_round(3), self.play_round(30))
+
+    def test_existing_participation_is_reused(self):
+        trivia = Trivia.objects.create(name='Live again', description='')
+        trivia.questions.set(create_questions(1))
+        user = User.objects.create(username='again', email='again@example.com', name='Player')
+        previous = Participation.objects.create(user=user, trivia=trivia, score=3)
+        game = self.registry.create(trivia, answer_seconds=10)
+        game.join(user.id)
+        self.registry.start(game)
+        correct = AnswerOption.objects.get(question_id=game.round.question_id, is_correct=True).id
+        game.submit(user.id, correct, self.now)
+        self.now += 10
+        self.registry.tick(game)
+        self.assertEqual(game.status, games.FINISHED)
+        self.assertEqual(list(Participation.objects.filter(trivia=trivia).values_list('id', 'score', 'completed')), [(previous.id, 4, True)])
+
+
+@override_settings(RANKING_REVISION_DELAY_MS=0)
+class LeaderboardTests(TestCase):
+    def test_ranking_follows_participations_and_can_be_rebuilt(self):
+        users = [User.objects.create(username=f'player{i}', email=f'player{i}@example.com', name='Player') for i in range(2)]
+        trivias = [Trivia.objects.create(name=f'Trivia {i}', description='') for i in range(2)]
+        Participation.objects.create(user=users[0], trivia=trivias[0], score=2)
+        Participation.objects.create(user=users[1], trivia=trivias[0], score=5)
+        participation = Participation.objects.create(user=users[0], trivia=trivias[1], score=1)
+        participation.score = 4
+        participation.save()
+        client = APIClient()
+        client.force_authenticate(user=users[0])
+        expected = [
+            {'user': 'player0', 'total_score': 6, 'trivias': [
+                {'trivia_name': 'Trivia 1', 'score': 4}, {'trivia_name': 'Trivia 0', 'score': 2},
+            ]},
+            {'user': 'player1', 'total_score': 5, 'trivias': [{'trivia_name': 'Trivia 0', 'score': 5}]},
+        ]
+        self.assertEqual(client.get('/api/rankings/').json(), expected)
+        self.assertEqual(UserScore.objects.get(user=users[0]).total_score, 6)
+
+        # Las escrituras en masa no emiten señales: rebuild_leaderboard vuelve a calcular todo
+        TriviaScore.objects.all().delete()
+        UserScore.objects.all().delete()
+        call_command('rebuild_leaderboard', stdout=io.StringIO())
+        self.assertEqual(client.get('/api/rankings/').json(), expected)
+        self.assertEqual(client.get(f'/api/rankings/{trivias[0].id}/').json(), [
+            {'user': 'player1', 'total_score': 5, 'trivias': [{'trivia_name': 'Trivia 0', 'score': 5}]},
+            {'user': 'player0', 'total_score': 2, 'trivias': [{'trivia_name': 'Trivia 0', 'score': 2}]},
+        ])
+
+
+class AnswerKeyCacheTests(TestCase):
+    def setUp(self):
+        scoring.answer_keys.clear()
+
+    def key(self, question):
+        return scoring.get_answer_keys([question.id])[question.id]
+
+    def test_keys_are_cached_until_the_question_changes(self):
+        question = create_questions(1)[0]
+        self.assertEqual(self.key(question).points, 1)
+        with self.assertNumQueries(0):
+            self.key(question)
+
+        question.difficulty = 'hard'
+        question.save()
+        self.assertEqual(self.key(question).points, 3)
+
+        option = question.options.filter(is_correct=False).first()
+        option.is_correct = True
+        option.save()
+        self.assertEqual(len(self.key(question).correct_option_ids), 2)
+
+        trivia = Trivia.objects.create(name='Trivia', description='')
+        trivia.questions.add(question)
+        self.assertEqual(self.key(question).trivia_ids, {trivia.id})
+        trivia.delete()
+        self.assertEqual(self.key(question).trivia_ids, set())
+
+
+class KeysetPaginationTests(TestCase):
+    def test_pages_do_not_overlap_when_rows_are_added(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpassword', name='Admin'
+        )
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        create_questions(5)
+        page = client.get('/api/questions/?page_size=2').json()
+        seen = [question['id'] for question in page['results']]
+        # Las filas nuevas quedan después del cursor: no corren las páginas siguientes
+        create_questions(1)
+        while page['next']:
+            with CaptureQueriesContext(connection) as context:
+                page = client.get(page['next']).json()
+            self.assertFalse(any('OFFSET' in query['sql'] for query in context.captured_queries))
+            seen += [question['id'] for question in page['results']]
+        self.assertEqual(seen, sorted(set(seen)))
+        self.assertEqual(len(seen), 6)
+
+
+@override_settings(RANKING_REVISION_DELAY_MS=0)
+class GenerateTestDataTests(TestCase):
+    def generate(self, **options):
+        stdout = io.StringIO()
+        call_command(
+            'generate_test_data', users=3, questions=6, trivias=2, questions_per_trivia=3,
+            batch_size=2, seed=1, stdout=stdout, **options,
+        )
+        return stdout.getvalue()
+
+    def test_existing_data_is_kept_unless_forced(self):
+        self.generate()
+        self.assertEqual(Trivia.objects.count(), 2)
+        # 3 usuarios más el administrador, 2 trivias y 2 intentos por trivia
+        self.assertEqual(Participation.objects.count(), 16)
+        self.assertEqual(
+            sum(TriviaScore.objects.values_list('score', flat=True)),
+            sum(Participation.objects.values_list('score', flat=True)),
+        )
+
+        self.assertIn('skipping', self.generate())
+        self.assertEqual(Participation.objects.count(), 16)
+
+        self.generate(force=True)
+        self.assertEqual(User.objects.count(), 4)
+        self.assertEqual(Trivia.objects.count(), 2)
+        self.assertEqual(Participation.objects.count(), 32)
+
+
+class BenchmarkReportTests(TestCase):
+    def test_percentile(self):
+        self.assertIsNone(benchmarks.percentile([], 95))
+        self.assertEqual(benchmarks.percentile([7], 99), 7)
+        self.assertEqual(benchmarks.percentile(range(100, 0, -1), 95), 95)
+
+    def test_failed_requests_and_regressions_are_reported(self):
+        baseline = {'results': {'ranking': {'p95_ms': 10, 'queries': 3, 'statuses': [200]}}}
+        current = {'results': {'ranking': {'p95_ms': 10.5, 'queries': 3, 'statuses': [200]}}}
+        self.assertEqual(benchmarks.compare(baseline, current, 0.1), [])
+        current['results']['ranking'].update(p95_ms=12, queries=4, statuses=[200, 500])
+        self.assertEqual(benchmarks.compare(baseline, current, 0.1), [
+            'ranking: results got status 500',
+            'ranking: p95 10ms -> 12ms',
+            'ranking: queries 3 -> 4',
+        ])
+
+
+@override_settings(SLOW_REQUEST_MS=0)
+class RequestInstrumentationTests(TestCase):
+    def assertInstrumented(self, response, logs):
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="1 queries"$')
+        event = json.loads(logs.records[0].getMessage())
+        self.assertEqual((event['event'], event['path'], event['queries']), ('slow_request', '/api/users/', 1))
+        self.assertIn('COUNT', event['top_queries'][0]['sql'])
+
+    def test_sync_request(self):
+        def view(request):
+            User.objects.count()
+            return HttpResponse()
+
+        middleware = RequestInstrumentationMiddleware(view)
+        with self.assertLogs('trivia.requests', 'WARNING') as logs:
+            response = middleware(RequestFactory().get('/api/users/'))
+        self.assertInstrumented(response, logs)
+
+    async def test_async_request(self):
+        async def view(request):
+            await User.objects.acount()
+            return HttpResponse()
+
+        middleware = RequestInstrumentationMiddleware(view)
+        with self.assertLogs('trivia.requests', 'WARNING') as logs:
+            response = await middleware(RequestFactory().get('/api/users/'))
+        self.assertInstrumented(response, logs)
+
+
+@override_settings(JWT_CHECK_ACTIVE=True)
+class StatelessJWTTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_user_comes_from_the_token_claims(self):
+        user = User.objects.create_user(
+            username='player', email='player@example.com', password='password', name='Player', role='player'
+        )
+        token = APIClient().post('/api/token/', {'username': 'player', 'password': 'password'}, format='json').data['access']
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        backend = StatelessJWTAuthentication()
+        # Solo la primera vez se consulta is_active; después sale de la cache
+        with self.assertNumQueries(1):
+            authenticated, _ = backend.authenticate(request)
+        self.assertEqual((authenticated.id, authenticated.username, authenticated.role), (user.id, 'player', 'player'))
+        with self.assertNumQueries(0):
+            backend.authenticate(request)
+
+        user.is_active = False
+        user.save()
+        with self.assertRaises(AuthenticationFailed):
+            backend.authenticate(request)
+
+
+@override_settings(RANKING_REVISION_DELAY_MS=0)
+class AsyncViewTests(TestCase):
+    def test_async_views_match_the_sync_ones(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpassword', name='Admin'
+        )
+        player = User.objects.create_user(
+            username='player', email='player@example.com', password='password', name='Player', role='player'
+        )
+        trivia = Trivia.objects.create(name='Trivia', description='')
+        trivia.questions.set(create_questions(2))
+        Participation.objects.create(user=player, trivia=trivia, score=3)
+        headers = {user.username: {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'} for user in (admin, player)}
+
+        self.assertEqual(self.client.get('/api/async/rankings/').status_code, 401)
+        self.assertEqual(self.client.get(f'/api/async/trivias/{trivia.id}/', **headers['player']).status_code, 403)
+        for path, username in (
+            ('rankings/', 'player'),
+            (f'rankings/{trivia.id}/', 'player'),
+            (f'rankings/user/{player.id}/', 'player'),
+            (f'trivias/{trivia.id}/', 'admin'),
+        ):
+            with self.subTest(path=path):
+                expected = self.client.get(f'/api/{path}', **headers[username])
+                response = self.client.get(f'/api/async/{path}', **headers[username])
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), expected.json())
+
+
+class LiveSubscriberTests(TestCase):
+    def drain(self, subscriber):
+        messages = []
+        while not subscriber.queue.empty():
+            messages.append(subscriber.queue.get_nowait())
+        return messages
+
+    def test_slow_subscriber_is_resynced_and_then_dropped(self):
+        subscriber = live.Subscriber(maxsize=2, max_resyncs=1)
+        snapshot = mock.Mock(return_value=b'snapshot')
+        for message in (b'1', b'2', b'3'):
+            subscriber.offer(message, snapshot)
+        # La cola llena se reemplaza por el estado actual en lugar de seguir acumulando deltas
+        self.assertEqual(self.drain(subscriber), [b'snapshot'])
+        # Si vuelve a quedarse atrás sin haberse puesto al día, se cierra la conexión
+        for message in (b'4', b'5', b'6'):
+            subscriber.offer(message, snapshot)
+        self.assertTrue(subscriber.closed)
+        self.assertEqual(self.drain(subscriber), [None])
+        subscriber.offer(b'7', snapshot)
+        self.assertEqual(self.drain(subscriber), [])
+
+
+class ArchivalTests(TestCase):
+    def test_answers_are_archived_and_restored(self):
+        user = User.objects.create(username='player', email='player@example.com', name='Player')
+        trivia = Trivia.objects.create(name='Trivia', description='')
+        questions = create_questions(2)
+        trivia.questions.set(questions)
+        UserAnswer.objects.bulk_create([
+            UserAnswer(user=user, trivia=trivia, question=question, selected_option=question.options.first())
+            for question in questions
+        ])
+        UserAnswer.objects.update(answered_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(list(archival.archivable_trivias(timedelta(days=1))), [trivia.id])
+        self.assertEqual(list(archival.archivable_trivias(timedelta(days=3))), [])
+        answers = list(UserAnswer.objects.order_by('id').values('id', 'question_id', 'selected_option_id', 'answered_at'))
+
+        with tempfile.TemporaryDirectory() as directory:
+            archive = archival.archive_trivia(trivia.id, directory, batch_size=1)
+            self.assertEqual(archive.rows, 2)
+            self.assertFalse(UserAnswer.objects.exists())
+            self.assertTrue(archival.is_archived(trivia.id))
+            self.assertIsNone(archival.archive_trivia(trivia.id, directory))
+            self.assertEqual([answer['id'] for answer in archival.iter_archive(archive)], [answer['id'] for answer in answers])
+
+            self.assertEqual(archival.restore_archive(archive), 2)
+            self.assertFalse(archival.is_archived(trivia.id))
+            self.assertEqual(
+                list(UserAnswer.objects.order_by('id').values('id', 'question_id', 'selected_option_id', 'answered_at')),
+                answers,
+            )
+
+            # Un archivo que no coincide con su checksum no se restaura
+            archive = archival.archive_trivia(trivia.id, directory)
+            with open(archive.path, 'ab') as archive_file:
+                archive_file.write(b'\0')
+            with self.assertRaises(ValueError):
+                archival.restore_archive(archive)
+            self.assertFalse(UserAnswer.objects.exists())
+
+
+class DatabasePoolStatsTests(TestCase):
+    def test_stats_are_only_for_admins(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpassword', name='Admin'
+        )
+        player = User.objects.create(username='player', email='player@example.com', name='Player', role='player')
+        client = APIClient()
+        client.force_authenticate(user=player)
+        self.assertEqual(client.get('/api/db/pool/').status_code, 403)
+        client.force_authenticate(user=admin)
+        response = client.get('/api/db/pool/')
+        self.assertEqual(response.status_code, 200)
+        stats = {entry['alias']: entry for entry in response.json()}
+        self.assertEqual(stats['default']['mode'], dbpool.mode(connection))
+        self.assertGreaterEqual(stats['default']['connections_opened'], 1)
+
+
+class QueryPlanTests(TestCase):
+    """Las consultas calientes de las vistas deben resolverse con índices, nunca recorriendo la tabla."""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_trivias(5, 10)
+        users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='password', name=f'User {i}')
+            for i in range(20)
+        ]
+        trivias = list(Trivia.objects.prefetch_related('questions__options'))
+        participations = []
+        answers = []
+        for user in users:
+            for trivia in trivias:
+                participations += [Participation(user=user, trivia=trivia, score=i) for i in range(2)]
+                for question in trivia.questions.all():
+                    answers.append(UserAnswer(user=user, question=question, selected_option=question.options.all()[0]))
+        Participation.objects.bulk_create(participations)
+        UserAnswer.objects.bulk_create(answers)
+        leaderboard.rebuild()
+        cls.user = users[0]
+        cls.trivia = trivias[0]
+        cls.question = trivias[0].questions.all()[0]
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            # Con tablas chicas el planner prefiere recorrerlas: se penaliza el seq scan para que
+            # solo aparezca si no hay un índice utilizable
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def assertNoSequentialScan(self, queryset, table):
+        plan = self.explain(queryset)
+        if connection.vendor == 'postgresql':
+            pattern = rf'Seq Scan on "?{table}"?'
+        else:
+            pattern = rf'\bSCAN "?{table}"?(?! USING)'
+        self.assertIsNone(re.search(pattern, plan), f'Sequential scan on {table}:\n{plan}')
+
+    def test_participation_by_trivia_and_user(self):
+        queryset = Participation.objects.filter(user_id=self.user.id, trivia_id=self.trivia.id).order_by('-id')[:1]
+        self.assertNoSequentialScan(queryset, 'PARTICIPATION')
+
+    def test_participation_by_trivia_ordered_by_score(self):
+        queryset = Participation.objects.filter(trivia_id=self.trivia.id).order_by('-score').values('user_id', 'score')
+        self.assertNoSequentialScan(queryset, 'PARTICIPATION')
+
+    def test_participations_of_user(self):
+        self.assertNoSequentialScan(Participation.objects.filter(user_id=self.user.id).order_by('id'), 'PARTICIPATION')
+
+    def test_user_answer_by_user_and_question(self):
+        queryset = UserAnswer.objects.filter(user_id=self.user.id, question_id=self.question.id)
+        self.assertNoSequentialScan(queryset, 'USER_ANSWER')
+
+    def test_trivias_of_question(self):
+        queryset = Question.objects.filter(id__in=[self.question.id]).values_list('id', 'difficulty', 'trivia__id')
+        self.assertNoSequentialScan(queryset, 'TRIVIA_questions')
+        self.assertNoSequentialScan(queryset, 'QUESTION')
+
+    def test_trivia_ranking(self):
+        self.assertNoSequentialScan(leaderboard.ranking_queryset(trivia_id=self.trivia.id), 'TRIVIA_SCORE')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'SQLite rejects concurrent writers instead of waiting')
+@override_settings(RANKING_REVISION_DELAY_MS=0)
+class ConcurrentScoreTests(TransactionTestCase):
+    # Cada hilo usa su propia conexión, así que hace falta commit real entre ellos
+    answers = 60
+    workers = 8
+
+    def test_concurrent_answers_do_not_lose_increments(self):
+        user = User.objects.create_user(username='player', email='player@example.com', password='password', name='Player')
+        # Una pregunta distinta por respuesta: repetir una pregunta se rechaza
+        questions = create_questions(self.answers)
+        trivia = Trivia.objects.create(name='Trivia', description='')
+        trivia.questions.set(questions)
+        participation = Participation.objects.create(user=user, trivia=trivia)
+        options = dict(AnswerOption.objects.filter(question__in=questions, is_correct=True).values_list('question_id', 'id'))
+
+        def answer(question):
+            try:
+                client = APIClient()
+                client.force_authenticate(user=user)
+                response = client.post(
+                    '/api/answers/',
+                    {'user': str(user.id), 'question': question.id, 'selected_option': options[question.id]},
+                    format='json',
+                )
+                return response.status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            statuses = list(pool.map(answer, questions))
+
+        self.assertEqual(statuses, [201] * self.answers)
+        participation.refresh_from_db()
+        self.assertEqual(participation.score, self.answers)
+        self.assertEqual(TriviaScore.objects.get(user=user, trivia=trivia).score, self.answers)
+        self.assertEqual(UserScore.objects.get(user=user).total_score, self.answers)
@@ -1,21 +1,48 @@
 # trivia/urls.py
 from django.urls import path
-from trivia.views import ParticipationDetailAPIView, ParticipationListCreateAPIView, PlayerDetailAPIView, PlayerListCreateAPIView, QuestionDetailAPIView, QuestionListCreateAPIView, TriviaDetailAPIView, RankingView, TriviaListCreateAPIView, UserAnswerCreateAPIView, UserDetailAPIView, UserListCreateAPIView
+from trivia.async_views import AsyncRankingTopView, AsyncRankingView, AsyncTriviaDetailView, AsyncUserAnswerCreateView, LiveRankingView
+from trivia.views import AnswerKeyCacheStatsView, DatabasePoolStatsView, GameAnswerAPIView, GameDetailAPIView, GameJoinAPIView, GameListCreateAPIView, GameStartAPIView, ParticipationAnswersAPIView, ParticipationDetailAPIView, ParticipationListCreateAPIView, PlayerDetailAPIView, PlayerListCreateAPIView, QuestionDetailAPIView, QuestionImportAPIView, QuestionListCreateAPIView, TriviaDetailAPIView, RankingPositionView, RankingTopView, RankingView, TriviaAnswerStatsAPIView, TriviaListCreateAPIView, TriviaPlayAPIView, UserAnswerBatchCreateAPIView, UserAnswerCreateAPIView, UserBulkCreateAPIView, UserDetailAPIView, UserListCreateAPIView
 
 urlpatterns = [
     path('users/', UserListCreateAPIView.as_view(), name='user-list-create'),
+    path('users/bulk/', UserBulkCreateAPIView.as_view(), name='user-bulk-create'),
     path('users/<uuid:pk>/', UserDetailAPIView.as_view(), name='user-detail'),
     path('players/', PlayerListCreateAPIView.as_view(), name='player-list-create'),
     path('players/<uuid:pk>/', PlayerDetailAPIView.as_view(), name='player-detail'),
     path('questions/', QuestionListCreateAPIView.as_view(), name='question_list'),
+    path('questions/import/', QuestionImportAPIView.as_view(), name='question_import'),
     path('questions/<int:pk>/', QuestionDetailAPIView.as_view(), name='question_detail'),
     path('trivias/', TriviaListCreateAPIView.as_view(), name='trivia_list'),
-    path('trivias/<uuid:pk>/', TriviaDetailAPIView.as_view(), name='trivia_detail'),
+    path('trivias/<int:pk>/', TriviaDetailAPIView.as_view(), name='trivia_detail'),
+    path('trivias/<int:pk>/play/', TriviaPlayAPIView.as_view(), name='trivia_play'),
+    path('trivias/<int:pk>/answer-stats/', TriviaAnswerStatsAPIView.as_view(), name='trivia_answer_stats'),
     path('answers/', UserAnswerCreateAPIView.as_view(), name='user-answer-create'),
+    path('answers/batch/', UserAnswerBatchCreateAPIView.as_view(), name='user-answer-batch-create'),
+    path('answers/cache/', AnswerKeyCacheStatsView.as_view(), name='answer-key-cache-stats'),
+    path('db/pool/', DatabasePoolStatsView.as_view(), name='db-pool-stats'),
+    path('games/', GameListCreateAPIView.as_view(), name='game-list-create'),
+    path('games/<uuid:game_id>/', GameDetailAPIView.as_view(), name='game-detail'),
+    path('games/<uuid:game_id>/start/', GameStartAPIView.as_view(), name='game-start'),
+    path('games/<uuid:game_id>/join/', GameJoinAPIView.as_view(), name='game-join'),
+    path('games/<uuid:game_id>/answers/', GameAnswerAPIView.as_view(), name='game-answer'),
     path('participations/', ParticipationListCreateAPIView.as_view(), name='participation-list-create'),
     path('participations/<int:pk>/', ParticipationDetailAPIView.as_view(), name='participation-detail'),
+    path('participations/<int:pk>/answers/', ParticipationAnswersAPIView.as_view(), name='participation-answers'),
     path('rankings/', RankingView.as_view(), name='ranking'),
     path('rankings/<int:trivia_id>/', RankingView.as_view(), name='ranking_by_trivia'),
     path('rankings/<int:trivia_id>/<uuid:user_id>/', RankingView.as_view(), name='ranking_by_trivia_and_user'),
     path('rankings/user/<uuid:user_id>/', RankingView.as_view(), name='ranking_by_user'),
-]
\ No newline at end of file
+    path('rankings/top/', RankingTopView.as_view(), name='ranking_top'),
+    path('rankings/<int:trivia_id>/top/', RankingTopView.as_view(), name='ranking_top_by_trivia'),
+    path('rankings/position/<uuid:user_id>/', RankingPositionView.as_view(), name='ranking_position'),
+    path('rankings/<int:trivia_id>/position/<uuid:user_id>/', RankingPositionView.as_view(), name='ranking_position_by_trivia'),
+    path('rankings/<int:trivia_id>/live/', LiveRankingView.as_view(), name='ranking_live'),
+    # Versiones async de las rutas más usadas, para servir con ASGI
+    path('async/trivias/<int:pk>/', AsyncTriviaDetailView.as_view(), name='async_trivia_detail'),
+    path('async/answers/', AsyncUserAnswerCreateView.as_view(), name='async-user-answer-create'),
+    path('async/rankings/', AsyncRankingView.as_view(), name='async_ranking'),
+    path('async/rankings/<int:trivia_id>/', AsyncRankingView.as_view(), name='async_ranking_by_trivia'),
+    path('async/rankings/user/<uuid:user_id>/', AsyncRankingView.as_view(), name='async_ranking_by_user'),
+    path('async/rankings/top/', AsyncRankingTopView.as_view(), name='async_ranking_top'),
+    path('async/rankings/<int:trivia_id>/top/', AsyncRankingTopView.as_view(), name='async_ranking_top_by_trivia'),
+]
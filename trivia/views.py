@@ -1,15 +1,20 @@
 import json
-from django.http import JsonResponse
+import uuid
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView, Response
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from trivia.models import Player, User, Question, Trivia, Participation, UserAnswer
+from trivia import dbpool, games, importers, leaderboard, packed, payloads, provisioning, ranking, replicas, revisions, scoring, streaming
+from trivia.models import PackedAnswers, Player, User, Question, Trivia, Participation, UserAnswer
+from trivia.pagination import KeysetPagination
 from trivia.permissions import IsAdminUser, IsPlayerUser
-from trivia.serializers import CustomTokenObtainPairSerializer, ParticipationSerializer, PlayerCreateSerializer, PlayerListSerializer, QuestionCreateSerializer, QuestionListSerializer, TriviaCreateSerializer, TriviaListSerializer, UserAnswerSerializer, UserCreateSerializer, UserListSerializer
+from trivia.serializers import AnswerBatchSerializer, CustomTokenObtainPairSerializer, GameAnswerSerializer, GameCreateSerializer, ParticipationSerializer, PlayerCreateSerializer, PlayerListSerializer, QuestionCreateSerializer, QuestionListSerializer, TriviaCreateSerializer, TriviaListSerializer, UserAnswerSerializer, UserCreateSerializer, UserListSerializer
 
 class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
@@ -19,16 +24,20 @@ class MyTokenRefreshView(TokenRefreshView):
 
 class PlayerListCreateAPIView(APIView):
     queryset = Player.objects.all()
+    pagination_class = KeysetPagination
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return PlayerCreateSerializer
         return PlayerListSerializer
     
+    @replicas.reads
     def get(self, request):
-        players = self.queryset.all()
-        serializer = self.get_serializer_class()(players, many=True)
-        return Response(serializer.data)
+        paginator = self.pagination_class()
+        serializer_class = self.get_serializer_class()
+        players = paginator.paginate_queryset(serializer_class.setup_eager_loading(self.queryset.all()), request, view=self)
+        serializer = serializer_class(players, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     def post(self, request):
         serializer = self.get_serializer_class()(data=request.data)
@@ -56,6 +65,7 @@ class PlayerDetailAPIView(APIView):
     
 class UserListCreateAPIView(APIView):
     queryset = User.objects.all()
+    pagination_class = KeysetPagination
     permission_classes = [IsAdminUser]
 
     def get_serializer_class(self):
@@ -63,10 +73,15 @@ class UserListCreateAPIView(APIView):
             return UserCreateSerializer
         return UserListSerializer
 
+    @replicas.reads
     def get(self, request):
-        users = self.queryset.all()
+        if streaming.requested(request):
+            # Listado completo sin paginar, serializado por tandas
+            return streaming.StreamingJSONResponse(self.queryset.order_by('id'), self.get_serializer_class())
+        paginator = self.pagination_class()
+        users = paginator.paginate_queryset(self.queryset.all(), request, view=self)
         serializer = self.get_serializer_class()(users, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
         serializer = self.get_serializer_class()(data=request.data)
@@ -75,6 +90,23 @@ class UserListCreateAPIView(APIView):
             return Response(serializer.data, status=201)
         return Response(serializer.errors, status=400)
 
+class UserBulkCreateAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        # Igual que la importación de preguntas: archivo multipart en "file" o cuerpo JSONL/CSV
+        try:
+            stream, file_format = importers.read_upload(request)
+        except importers.UploadError as exc:
+            return Response({'error': str(exc)}, status=400)
+        # Un resultado por línea (NDJSON) a medida que se procesa cada lote
+        results = provisioning.provision_users(stream, file_format=file_format)
+        return StreamingHttpResponse(
+            (json.dumps(result, ensure_ascii=False) + '\n' for result in results),
+            content_type='application/x-ndjson',
+        )
+
+
 class UserDetailAPIView(APIView):
     queryset = User.objects.all()
     permission_classes = [IsAdminUser]
@@ -95,6 +127,7 @@ class UserDetailAPIView(APIView):
 
 class TriviaListCreateAPIView(APIView):
     queryset = Trivia.objects.all()
+    pagination_class = KeysetPagination
     permission_classes = [IsAdminUser]
 
     def get_serializer_class(self):
@@ -102,10 +135,14 @@ class TriviaListCreateAPIView(APIView):
             return TriviaCreateSerializer
         return TriviaListSerializer
     
+    @replicas.reads
+    @revisions.conditional(revisions.revisions(revisions.TRIVIAS))
     def get(self, request):
-        trivias = self.queryset.all()
-        serializer = self.get_serializer_class()(trivias, many=True)
-        return Response(serializer.data)
+        paginator = self.pagination_class()
+        serializer_class = self.get_serializer_class()
+        trivias = paginator.paginate_queryset(serializer_class.setup_eager_loading(self.queryset.all()), request, view=self)
+        serializer = serializer_class(trivias, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     def post(self, request):
         serializer = self.get_serializer_class()(data=request.data)
@@ -114,13 +151,31 @@ class TriviaListCreateAPIView(APIView):
             return Response(serializer.data, status=201)
         return Response(serializer.errors, status=400)
 
+def trivia_version(pk):
+    row = Trivia.objects.filter(pk=pk).values_list('revision', 'updated_at').first()
+    if row is None:
+        return None
+    return f'trivia:{pk}={row[0]}', row[1]
+
+
+def play_version(pk, revision):
+    return f'play:{pk}={revision}', None
+
+
+def ranking_version(trivia_id=None):
+    # Sin trivia (ranking global o de un usuario en todas las trivias) se usa la revisión global.
+    # El cuerpo también muestra nombres de trivias y usuarios
+    return revisions.current_ranking(trivia_id, revisions.TRIVIAS, revisions.USERS)
+
+
 class TriviaDetailAPIView(APIView):
     queryset = Trivia.objects.all()
     permission_classes = [IsAdminUser]
     serializer_class = TriviaCreateSerializer
     
+    @revisions.conditional(lambda request, pk: trivia_version(pk))
     def get(self, request, pk):
-        trivia = self.queryset.get(pk=pk)
+        trivia = self.serializer_class.setup_eager_loading(self.queryset).get(pk=pk)
         serializer = self.serializer_class(trivia)
         return Response(serializer.data)
     
@@ -133,6 +188,30 @@ class TriviaDetailAPIView(APIView):
         return Response(serializer.errors, status=400)
 
 
+class TriviaPlayAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @replicas.reads
+    def get(self, request, pk):
+        # Una sola lectura de la revisión por request: da el ETag y la clave de la cache
+        try:
+            revision = payloads.current_revision(pk)
+        except Trivia.DoesNotExist:
+            return Response({'error': 'Trivia not found'}, status=404)
+        return self.get_current(request, pk, revision)
+
+    @revisions.conditional(lambda request, pk, revision: play_version(pk, revision))
+    def get_current(self, request, pk, revision):
+        # JSON pre-renderizado y cacheado por revisión: sin ORM ni serializers en el camino caliente
+        try:
+            revision, body = payloads.get_payload(pk, revision)
+        except Trivia.DoesNotExist:
+            return Response({'error': 'Trivia not found'}, status=404)
+        response = HttpResponse(body, content_type='application/json')
+        response['X-Trivia-Revision'] = revision
+        return response
+
+
 class ParticipationView(View):
     permission_classes = [IsAuthenticated, IsPlayerUser]
 
@@ -149,74 +228,93 @@ class ParticipationView(View):
 
     @method_decorator(csrf_exempt)
     def post(self, request, trivia_id, user_id):
-        data = json.loads(request.body)
         try:
-            participation = Participation.objects.get(trivia_id=trivia_id, user_id=user_id)
-        except Participation.DoesNotExist:
-            participation = Participation.objects.create(trivia_id=trivia_id, user_id=user_id)
-        
-        # Calculate score based on correct answers
-        score = 0
-        for question_id, answer in data['answers'].items():
-            question = Question.objects.get(id=question_id)
-            if question.answer_text == answer:
-                if question.difficulty == 'easy':
-                    score += 1
-                elif question.difficulty == 'medium':
-                    score += 2
-                elif question.difficulty == 'hard':
-                    score += 3
-        
-        participation.score = score
-        participation.save()
+            data = json.loads(request.body)
+            answers = [(int(question_id), int(option_id)) for question_id, option_id in data['answers'].items()]
+        except (KeyError, AttributeError, TypeError, ValueError):
+            return JsonResponse({'error': 'answers must map question ids to option ids'}, status=400)
+
+        # Calcular el puntaje de todas las respuestas con una sola consulta (o ninguna, con la cache)
+        keys = scoring.get_answer_keys(question_id for question_id, _ in answers)
+        foreign = sorted(
+            question_id for question_id, _ in answers
+            if question_id not in keys or int(trivia_id) not in keys[question_id].trivia_ids
+        )
+        if foreign:
+            return JsonResponse({'error': 'questions do not belong to this trivia', 'questions': foreign}, status=400)
+        score = scoring.score_answers(answers, keys)
+
+        participation = Participation.objects.filter(trivia_id=trivia_id, user_id=user_id).first()
+        if participation is None:
+            participation = Participation.objects.create(trivia_id=trivia_id, user_id=user_id, score=score)
+        else:
+            participation.score = score
+            participation.save(update_fields=['score'])
         return JsonResponse({'score': participation.score})
     
 
 class RankingView(APIView):
     permission_classes = [IsAuthenticated]
-    serializer_class = ParticipationSerializer
 
     def get_queryset(self):
         trivia_id = self.kwargs.get('trivia_id')
         user_id = self.kwargs.get('user_id')
-        if trivia_id and user_id:
-            return Participation.objects.filter(trivia_id=trivia_id, user_id=user_id)
-        elif trivia_id:
-            return Participation.objects.filter(trivia_id=trivia_id)
-        elif user_id:
-            return Participation.objects.filter(user_id=user_id)
-        else:
-            return Participation.objects.all()
+        return leaderboard.ranking_queryset(trivia_id=trivia_id, user_id=user_id)
 
+    @replicas.reads
+    @revisions.conditional(lambda request, trivia_id=None, user_id=None: ranking_version(trivia_id))
     def get(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.serializer_class(queryset, many=True)
-        response_data = serializer.data
-
-        # Calcular el puntaje total por usuario
-        user_scores = {}
-        for participation in queryset:
-            user_id = participation.user.id
-            if user_id not in user_scores:
-                user_scores[user_id] = {
-                    'user': participation.user.username,
-                    'total_score': 0,
-                    'trivias': []
-                }
-            user_scores[user_id]['total_score'] += participation.score
-            user_scores[user_id]['trivias'].append({
-                'trivia_name': participation.trivia.name,
-                'score': participation.score
-            })
+        # Se lee de la tabla materializada del ranking, ya ordenada por puntaje
+        ranking = leaderboard.build_ranking(self.get_queryset())
+        return Response(ranking)
+    
 
-        # Convertir el diccionario a una lista ordenada por puntaje total
-        ranking = sorted(user_scores.values(), key=lambda x: x['total_score'], reverse=True)
+class RankingTopView(APIView):
+    permission_classes = [IsAuthenticated]
+    max_k = 100
 
-        return Response(ranking)
+    def get(self, request, trivia_id=None):
+        try:
+            k = min(int(request.query_params.get('k', 10)), self.max_k)
+        except ValueError:
+            return Response({'error': 'k must be an integer'}, status=400)
+        entries = ranking.registry.engine(trivia_id).top(k)
+        return Response(_with_usernames(entries))
+
+
+class RankingPositionView(APIView):
+    permission_classes = [IsAuthenticated]
+    max_n = 50
+
+    def get(self, request, user_id, trivia_id=None):
+        try:
+            n = min(int(request.query_params.get('n', 5)), self.max_n)
+        except ValueError:
+            return Response({'error': 'n must be an integer'}, status=400)
+        engine = ranking.registry.engine(trivia_id)
+        position = engine.rank(user_id)
+        if position is None:
+            return Response({'error': 'User not ranked'}, status=404)
+        return Response({
+            'user_id': str(user_id),
+            'rank': position,
+            'score': engine.store.score(user_id),
+            'around': _with_usernames(engine.around(user_id, n)),
+        })
+
+
+def _with_usernames(entries):
+    usernames = dict(
+        User.objects.filter(id__in=[entry['user_id'] for entry in entries]).values_list('id', 'username')
+    )
+    for entry in entries:
+        entry['user'] = usernames.get(uuid.UUID(entry['user_id']))
+    return entries
     
 
 class QuestionListCreateAPIView(APIView):
     queryset = Question.objects.all()
+    pagination_class = KeysetPagination
     permission_classes = [IsAdminUser]
 
     def get_serializer_class(self):
@@ -224,10 +322,14 @@ class QuestionListCreateAPIView(APIView):
             return QuestionCreateSerializer
         return QuestionListSerializer
     
+    @replicas.reads
+    @revisions.conditional(revisions.revisions(revisions.QUESTIONS))
     def get(self, request):
-        questions = self.queryset.all()
-        serializer = self.get_serializer_class()(questions, many=True)
-        return Response(serializer.data)
+        paginator = self.pagination_class()
+        serializer_class = self.get_serializer_class()
+        questions = paginator.paginate_queryset(serializer_class.setup_eager_loading(self.queryset.all()), request, view=self)
+        serializer = serializer_class(questions, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     def post(self, request):
         serializer = self.get_serializer_class()(data=request.data)
@@ -237,13 +339,26 @@ class QuestionListCreateAPIView(APIView):
         return Response(serializer.errors, status=400)
 
 
+class QuestionImportAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        # Acepta un archivo multipart en "file" o el cuerpo crudo (JSONL o CSV según el Content-Type)
+        try:
+            stream, file_format = importers.read_upload(request)
+        except importers.UploadError as exc:
+            return Response({'error': str(exc)}, status=400)
+        summary = importers.import_questions(stream, file_format=file_format)
+        return Response(summary)
+
+
 class QuestionDetailAPIView(APIView):
     queryset = Question.objects.all()
     permission_classes = [IsAdminUser]
     serializer_class = QuestionCreateSerializer
     
     def get(self, request, pk):
-        question = self.queryset.get(pk=pk)
+        question = self.serializer_class.setup_eager_loading(self.queryset).get(pk=pk)
         serializer = self.serializer_class(question)
         return Response(serializer.data)
     
@@ -256,8 +371,20 @@ class QuestionDetailAPIView(APIView):
         return Response(serializer.errors, status=400)
 
 
+ARCHIVED_TRIVIA = "La trivia fue archivada y no acepta respuestas"
+
+
+class AnswerConflict(Exception):
+    """La respuesta no se puede guardar en la participación; ``errors`` va en el cuerpo del 409."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
 class UserAnswerCreateAPIView(APIView):
     queryset = UserAnswer.objects.all()
+    pagination_class = KeysetPagination
     serializer_class = UserAnswerSerializer
     permission_classes = [IsPlayerUser]
     
@@ -265,48 +392,218 @@ class UserAnswerCreateAPIView(APIView):
         user = self.request.user
         question = serializer.validated_data['question']
         selected_option = serializer.validated_data['selected_option']
-        is_correct = selected_option.is_correct
-
-        # Calcular el puntaje basado en la dificultad de la pregunta
-        if is_correct:
-            if question.difficulty == 'easy':
-                score = 1
-            elif question.difficulty == 'medium':
-                score = 2
-            elif question.difficulty == 'hard':
-                score = 3
-        else:
-            score = 0
 
-        # Actualizar la participación del usuario
-        participation = Participation.objects.get(user=user, trivia=question.trivia_set.first())
-        participation.score += score
-        participation.save()
+        # Calcular el puntaje basado en la dificultad de la pregunta (clave de respuesta en cache)
+        answer_key = scoring.answer_keys.get(question.id)
+        score = scoring.score_answer(answer_key, selected_option.id)
 
-        serializer.save(user=user)
+        # Actualizar la participación del usuario con un incremento atómico en la base
+        trivia_id = min(answer_key.trivia_ids) if answer_key and answer_key.trivia_ids else None
+        try:
+            participation = Participation.objects.filter(user_id=user.id, trivia_id=trivia_id).latest('id')
+        except Participation.DoesNotExist:
+            raise ValidationError({'error': 'No participation for this question'})
+        with transaction.atomic():
+            # Con la participación bloqueada, un reintento de la misma respuesta no puede colarse en paralelo
+            Participation.objects.select_for_update().get(pk=participation.pk)
+            answered = packed.answered_in(participation, user.id, [question.id])
+            if answered is None:
+                raise AnswerConflict({'participation': ARCHIVED_TRIVIA})
+            if answered:
+                raise AnswerConflict({'question': ["La pregunta ya fue respondida"]})
+            scoring.add_participation_score(participation, score)
+            if packed.stores_packed():
+                packed.append_answers(participation.id, [(question.id, selected_option.id, score > 0)])
+            if packed.stores_rows():
+                serializer.save(user_id=user.id, trivia_id=participation.trivia_id)
+        return participation
+
+    def handle_exception(self, exc):
+        if isinstance(exc, AnswerConflict):
+            return Response(exc.errors, status=409)
+        return super().handle_exception(exc)
     
+    @replicas.reads
     def get(self, request):
-        user_answers = self.queryset.all()
+        if streaming.requested(request):
+            return streaming.StreamingJSONResponse(self.queryset.order_by('id'), self.serializer_class)
+        paginator = self.pagination_class()
+        user_answers = paginator.paginate_queryset(self.queryset.all(), request, view=self)
         serializer = self.serializer_class(user_answers, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
-            self.perform_create(serializer)
-            return Response(serializer.data, status=201)
+            participation = self.perform_create(serializer)
+            if packed.stores_rows():
+                return Response(serializer.data, status=201)
+            # Solo formato compacto: no hay fila de UserAnswer, la respuesta queda en la participación
+            return Response({
+                'participation': participation.pk,
+                'user': str(request.user.id),
+                'question': serializer.validated_data['question'].id,
+                'selected_option': serializer.validated_data['selected_option'].id,
+            }, status=201)
         return Response(serializer.errors, status=400)
     
 
+class UserAnswerBatchCreateAPIView(APIView):
+    permission_classes = [IsPlayerUser]
+    serializer_class = AnswerBatchSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        participation = serializer.validated_data['participation']
+        answers = serializer.validated_data['answers']
+        answer_keys = serializer.validated_data['answer_keys']
+        points = sum(
+            scoring.score_answer(answer_keys.get(answer['question']), answer['selected_option'])
+            for answer in answers
+        )
+
+        # Todas las respuestas y un único incremento de puntaje en la misma transacción
+        with transaction.atomic():
+            # Con la participación bloqueada, un reintento del mismo lote no puede colarse en paralelo
+            Participation.objects.select_for_update().get(pk=participation.pk)
+            question_ids = [answer['question'] for answer in answers]
+            answered = packed.answered_in(participation, request.user.id, question_ids)
+            if answered is None:
+                # Sin las filas archivadas no se sabe qué se respondió: la trivia ya no acepta respuestas
+                return Response({'participation': ARCHIVED_TRIVIA}, status=409)
+            if answered:
+                errors = {
+                    index: "La pregunta ya fue respondida"
+                    for index, question_id in enumerate(question_ids) if question_id in answered
+                }
+                return Response({'answers': errors}, status=409)
+
+            if packed.stores_rows():
+                UserAnswer.objects.bulk_create([
+                    UserAnswer(
+                        user_id=request.user.id, trivia_id=participation.trivia_id,
+                        question_id=answer['question'], selected_option_id=answer['selected_option'],
+                    )
+                    for answer in answers
+                ])
+            if packed.stores_packed():
+                packed.append_answers(participation.id, [
+                    (answer['question'], answer['selected_option'],
+                     scoring.score_answer(answer_keys.get(answer['question']), answer['selected_option']) > 0)
+                    for answer in answers
+                ])
+            scoring.add_participation_score(participation, points)
+            score = Participation.objects.values_list('score', flat=True).get(pk=participation.pk)
+
+        return Response({
+            'participation': participation.pk,
+            'answered': len(answers),
+            'score_delta': points,
+            'score': score,
+        }, status=201)
+
+
+class AnswerKeyCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(scoring.answer_keys.stats())
+
+
+class GameListCreateAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response([game.state(None, games.registry.clock()) for game in games.registry.all()])
+
+    def post(self, request):
+        serializer = GameCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        game = games.registry.create(
+            serializer.validated_data['trivia'],
+            answer_seconds=serializer.validated_data.get('answer_seconds'),
+            intermission_seconds=serializer.validated_data.get('intermission_seconds'),
+        )
+        return Response(game.state(None, games.registry.clock()), status=201)
+
+
+class GameAPIView(APIView):
+    # Las partidas viven en memoria: estas vistas no tocan la base
+    def get_game(self, game_id):
+        game = games.registry.get(game_id)
+        if game is None:
+            raise games.GameNotFound('Game not found')
+        return game
+
+    def handle_exception(self, exc):
+        if isinstance(exc, games.GameNotFound):
+            return Response({'error': str(exc)}, status=404)
+        if isinstance(exc, games.GameError):
+            return Response({'error': str(exc)}, status=409)
+        return super().handle_exception(exc)
+
+
+class GameDetailAPIView(GameAPIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, game_id):
+        return Response(self.get_game(game_id).state(request.user.id, games.registry.clock()))
+
+
+class GameStartAPIView(GameAPIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, game_id):
+        game = self.get_game(game_id)
+        games.registry.start(game)
+        return Response(game.state(None, games.registry.clock()))
+
+
+class GameJoinAPIView(GameAPIView):
+    permission_classes = [IsPlayerUser]
+
+    def post(self, request, game_id):
+        game = self.get_game(game_id)
+        game.join(request.user.id)
+        return Response(game.state(request.user.id, games.registry.clock()))
+
+
+class GameAnswerAPIView(GameAPIView):
+    permission_classes = [IsPlayerUser]
+
+    def post(self, request, game_id):
+        serializer = GameAnswerSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        game = self.get_game(game_id)
+        # Se puntúa en memoria; se guarda en la base junto con el resto al cerrar la ronda
+        round_number = game.submit(request.user.id, serializer.validated_data['selected_option'], games.registry.clock())
+        return Response({'round': round_number, 'accepted': True}, status=202)
+
+
+class DatabasePoolStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(dbpool.all_stats())
+
+
 class ParticipationListCreateAPIView(APIView):
     queryset = Participation.objects.all()
+    pagination_class = KeysetPagination
     permission_classes = [IsPlayerUser]
     serializer_class = ParticipationSerializer
 
+    @replicas.reads
     def get(self, request):
-        participations = self.queryset.filter(user=request.user)
+        paginator = self.pagination_class()
+        participations = paginator.paginate_queryset(self.serializer_class.setup_eager_loading(self.queryset.filter(user_id=request.user.id)), request, view=self)
         serializer = self.serializer_class(participations, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
     
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
@@ -321,12 +618,12 @@ class ParticipationDetailAPIView(APIView):
     serializer_class = ParticipationSerializer
 
     def get(self, request, pk):
-        participation = self.queryset.get(pk=pk, user=request.user)
+        participation = self.serializer_class.setup_eager_loading(self.queryset).get(pk=pk, user_id=request.user.id)
         serializer = self.serializer_class(participation)
         return Response(serializer.data)
 
     def put(self, request, pk):
-        participation = self.queryset.get(pk=pk, user=request.user)
+        participation = self.queryset.get(pk=pk, user_id=request.user.id)
         serializer = self.serializer_class(participation, data=request.data)
         if serializer.is_valid():
             serializer.save()
@@ -334,4 +631,28 @@ class ParticipationDetailAPIView(APIView):
         return Response(serializer.errors, status=400)
 
 
-    
\ No newline at end of file
+class ParticipationAnswersAPIView(APIView):
+    permission_classes = [IsPlayerUser]
+
+    def get(self, request, pk):
+        participation = Participation.objects.filter(pk=pk, user_id=request.user.id).first()
+        if participation is None:
+            return Response({'error': 'Participation not found'}, status=404)
+        # Respuestas guardadas en formato compacto, expandidas a una lista
+        data = PackedAnswers.objects.filter(participation_id=pk).values_list('data', flat=True).first() or b''
+        return Response({
+            'participation': participation.pk,
+            **packed.summarize(data),
+            'answers': [
+                {'question': answer.question_id, 'selected_option': answer.option_id, 'correct': answer.correct}
+                for answer in packed.unpack(data)
+            ],
+        })
+
+
+class TriviaAnswerStatsAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, pk):
+        return Response(packed.question_stats(pk))
+